@@ -11,4 +11,5 @@ from .custom_overlay import (
 from .game import Game, RobotType
 from .game_io import GameIO, ScoreType, SortOrder
 from .network.ge_api_client import ApiClient, GEConnectionError
+from .network.message_sender import SendPolicy
 from .network.socket_handler import Message
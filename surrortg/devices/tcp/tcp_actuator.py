@@ -67,14 +67,7 @@ class TcpActuator(LinearActuator, TcpInput):
             f"with pwm={actuator_val} value={val}"
         )
         if not endpoint.closed:
-            try:
-                await endpoint.send(struct.pack("BB", self._cmd, actuator_val))
-
-            except OSError as e:
-                logging.warning(
-                    f"Failed to send value {val} to seat {seat} "
-                    f"command {self._cmd}: {e}"
-                )
+            endpoint.send_nowait(struct.pack("BB", self._cmd, actuator_val))
         else:
             logging.debug(
                 f"Did not send value {val} to seat {seat} "
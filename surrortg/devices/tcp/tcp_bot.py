@@ -4,7 +4,15 @@ import struct
 
 from surrortg import ConfigType
 
-from .tcp_protocol import open_tcp_endpoint
+from .tcp_heartbeat import (
+    DEAD_TIMEOUT,
+    DEGRADED_RTT,
+    HEARTBEAT_INTERVAL,
+    LINK_DEAD,
+    TcpHeartbeat,
+)
+from .tcp_pool import TcpEndpointPool
+from .tcp_protocol import TcpCommandId
 
 BOT_TCP_PORT = 31338
 CONFIG_IP_ADDR_NAME = "microcontroller_ip_addr"
@@ -14,6 +22,10 @@ set_file_name = "/var/lib/srtg/current_set"
 class TcpBot:
     """Base class for all bots that are controlled with TCP commands
 
+    The connections to the bots are kept open between games. Bots which
+    can't be reached during handle_config are connected in the background,
+    and added to the bots and endpoints when they connect.
+
     :param game_io: The game's GameIO object
     :type game_io: GameIO
     """
@@ -24,6 +36,15 @@ class TcpBot:
         self.endpoints = {}
         self.bot_listener_tasks = {}
         self.current_set = 0
+        # seat -> ((address, port), bot data) of all the configured bots
+        self._bot_configs = {}
+        self._bot_listener_cb = None
+        # (address, port) -> TcpHeartbeat
+        self._heartbeats = {}
+        self._heartbeat_options = None
+        self._link_state_cb = None
+        self._dead_seats = set()
+        self._pool = TcpEndpointPool(on_reconnect=self._on_bot_reconnected)
         self._loop = asyncio.get_running_loop()
         self.game_io = game_io
         self.game_io.register_config(
@@ -45,12 +66,13 @@ class TcpBot:
         :type local_bot_config: dict, optional
         :param bot_listener_cb: This is executed when udp message is received
             from a bot, defaults to None. Must take seat, cmd_id and cmd_val
-            as parameters.
+            as parameters. Seats with the same bot address share one
+            connection, and its messages are passed for each of the seats.
         :type bot_listener_cb: function, optional
         :return: Current set
         :rtype: int
         """
-        await self.shutdown()
+        await self._reset_bots()
         set_reading_succeeded = False
 
         try:
@@ -70,9 +92,7 @@ class TcpBot:
             logging.info("Reading current set from file")
             self.current_set = await self.select_set()
 
-        self.bots = {}
-        self.endpoints = {}
-
+        bot_configs = {}
         for bot_data in ge_bot_config:
             addr = None
             try:
@@ -101,29 +121,36 @@ class TcpBot:
                     )
                     continue
 
-            if seat in self.bots:
+            if seat in bot_configs:
                 logging.info(
                     f"Duplicate seat {seat} found from configs, "
                     f"using address {addr}."
                 )
+            bot_configs[seat] = ((addr, BOT_TCP_PORT), bot_data)
 
-            endpoint = await open_tcp_endpoint(addr, BOT_TCP_PORT)
+        # Healthy connections are reused, the rest are opened concurrently
+        endpoints = await self._pool.connect(
+            key for key, _ in bot_configs.values()
+        )
 
+        for key, heartbeat in list(self._heartbeats.items()):
+            if endpoints.get(key) is not heartbeat.endpoint:
+                self._heartbeats.pop(key).stop()
+
+        self._bot_configs = bot_configs
+        self._bot_listener_cb = bot_listener_cb
+        self.bots = {}
+        # Updated in place, the inputs share the same dict
+        self.endpoints.clear()
+        for seat, (key, bot_data) in bot_configs.items():
+            endpoint = endpoints[key]
             if endpoint is None:
                 logging.error(
-                    f"Connection failed to seat {seat}, {addr}:{BOT_TCP_PORT}"
+                    f"Connection failed to seat {seat}, {key[0]}:{key[1]}, "
+                    "retrying in the background"
                 )
                 continue
-
-            self.endpoints[seat] = endpoint
-            self.bots[seat] = bot_data
-
-        # Register listener tasks for all endpoints if callback is given
-        if bot_listener_cb is not None:
-            for seat in self.endpoints:
-                self.bot_listener_tasks[seat] = asyncio.create_task(
-                    self._receive_messages_from_seat(seat, bot_listener_cb)
-                )
+            self._add_bot(seat, endpoint)
 
         for input_impl in self.inputs.values():
             input_impl.set_endpoints(self.endpoints)
@@ -156,6 +183,86 @@ class TcpBot:
             )
         )
 
+    def set_heartbeat(
+        self,
+        interval=HEARTBEAT_INTERVAL,
+        degraded_rtt=DEGRADED_RTT,
+        dead_timeout=DEAD_TIMEOUT,
+        link_state_cb=None,
+    ):
+        """Enables or disables the PING heartbeat of the bots
+
+        The bots must reply to (PING, n) commands with the same bytes.
+        When no replies have been received for dead_timeout, the bot is
+        reported dead to the game engine, and reconnected in the
+        background. The options are used for the bots connected after
+        this call, so call this before handle_config.
+
+        :param interval: Seconds between PINGs, None disables the
+            heartbeat, defaults to HEARTBEAT_INTERVAL
+        :type interval: float/None, optional
+        :param degraded_rtt: Round-trip time in seconds over which the
+            link is degraded, defaults to DEGRADED_RTT
+        :type degraded_rtt: float, optional
+        :param dead_timeout: Seconds without replies after which the link
+            is dead, defaults to DEAD_TIMEOUT
+        :type dead_timeout: float, optional
+        :param link_state_cb: Function called with seat and link state
+            ("ok", "degraded" or "dead") when the state changes, defaults
+            to None
+        :type link_state_cb: function, optional
+        """
+        if interval is None:
+            self._heartbeat_options = None
+            for heartbeat in self._heartbeats.values():
+                heartbeat.stop()
+            self._heartbeats = {}
+        else:
+            self._heartbeat_options = {
+                "interval": interval,
+                "degraded_rtt": degraded_rtt,
+                "dead_timeout": dead_timeout,
+            }
+        self._link_state_cb = link_state_cb
+
+    def get_rtt(self, seat):
+        """Returns the round-trip time moving average of the seat's bot
+
+        Can be used for example to lower the speed on bad connections.
+
+        :param seat: Robot seat
+        :type seat: int
+        :return: RTT in seconds, None if not measured
+        :rtype: float/None
+        """
+        heartbeat = self._get_heartbeat(seat)
+        return heartbeat.rtt if heartbeat is not None else None
+
+    def get_link_stats(self):
+        """Returns the heartbeat statistics of the configured bots
+
+        :return: TcpHeartbeat.get_stats() with seats as keys, including the
+            link state, rtt_ms moving average and p50_ms and p99_ms
+        :rtype: dict
+        """
+        stats = {}
+        for seat in self.endpoints:
+            heartbeat = self._get_heartbeat(seat)
+            if heartbeat is not None:
+                stats[seat] = heartbeat.get_stats()
+        return stats
+
+    def get_endpoint_stats(self):
+        """Returns the send statistics of the configured bots
+
+        :return: TcpEndpoint.get_stats() with seats as keys
+        :rtype: dict
+        """
+        return {
+            seat: endpoint.get_stats()
+            for seat, endpoint in self.endpoints.items()
+        }
+
     async def select_set(self):
         """Reads the set from the set file and returns it
 
@@ -193,32 +300,147 @@ class TcpBot:
         Also cancels registered bot listener tasks
         and closes all endpoints
         """
+        await self._reset_bots()
+        for heartbeat in self._heartbeats.values():
+            heartbeat.stop()
+        self._heartbeats = {}
+        self._bot_configs = {}
+        self.endpoints.clear()
+        await self._pool.close()
+
+    async def _reset_bots(self):
+        """Cancels the bot listener tasks and resets the inputs of all bots,
+        keeping the connections open
+        """
         for listener_task in self.bot_listener_tasks.values():
             listener_task.cancel()
+        self.bot_listener_tasks = {}
 
-        for seat, endpoint in self.endpoints.items():
+        async def reset_seat(seat):
+            logging.info(f"Shutting down inputs for seat {seat}")
             for input_impl in self.inputs.values():
-                logging.info(f"Shutting down input for seat {seat}")
                 await input_impl.shutdown(seat)
-            await endpoint.close()
+
+        await asyncio.gather(
+            *(
+                reset_seat(seat)
+                for seat, endpoint in self.endpoints.items()
+                if endpoint.alive
+            )
+        )
+
+    def _add_bot(self, seat, endpoint):
+        key, bot_data = self._bot_configs[seat]
+        self.endpoints[seat] = endpoint
+        self.bots[seat] = bot_data
+        if self._heartbeat_options is not None:
+            heartbeat = self._heartbeats.get(key)
+            if heartbeat is None or heartbeat.endpoint is not endpoint:
+                if heartbeat is not None:
+                    heartbeat.stop()
+                heartbeat = TcpHeartbeat(
+                    endpoint,
+                    lambda state: self._on_link_state(key, state),
+                    **self._heartbeat_options,
+                )
+                self._heartbeats[key] = heartbeat
+                heartbeat.start()
+        # A pool retry can connect again while a listener is still running
+        old_task = self.bot_listener_tasks.pop(seat, None)
+        if old_task is not None:
+            old_task.cancel()
+        # Register a listener task for the endpoint if callback is given,
+        # the heartbeat replies are received by the listener too. Seats of
+        # the same bot share the endpoint, which only one task may read.
+        shared = any(
+            self.endpoints.get(other_seat) is endpoint and not task.done()
+            for other_seat, task in self.bot_listener_tasks.items()
+        )
+        if not shared and (
+            self._bot_listener_cb is not None or key in self._heartbeats
+        ):
+            self.bot_listener_tasks[seat] = asyncio.create_task(
+                self._receive_messages_from_seat(seat, self._bot_listener_cb)
+            )
+        if seat in self._dead_seats:
+            self._dead_seats.discard(seat)
+            self.game_io.send_state_alive(seat)
+
+    def _get_heartbeat(self, seat):
+        if seat not in self._bot_configs:
+            return None
+        return self._heartbeats.get(self._bot_configs[seat][0])
+
+    def _on_link_state(self, key, state):
+        if state == LINK_DEAD:
+            logging.error(f"No heartbeat from {key[0]}")
+            self._on_link_dead(key, self._heartbeats[key].endpoint)
+            return
+        for seat in self._get_key_seats(key):
+            if self._link_state_cb is not None:
+                self._link_state_cb(seat, state)
+
+    def _on_link_dead(self, key, endpoint):
+        """Reports the seats of a broken bot connection dead, stops its
+        heartbeat and reconnects it in the background
+        """
+        seats = self._get_key_seats(key)
+        logging.warning(f"Seats {seats} are dead, reconnecting to {key[0]}")
+        for seat in seats:
+            if self._link_state_cb is not None:
+                self._link_state_cb(seat, LINK_DEAD)
+            if seat not in self._dead_seats:
+                self._dead_seats.add(seat)
+                self.game_io.send_state_dead(seat)
+        heartbeat = self._heartbeats.get(key)
+        if heartbeat is not None and heartbeat.endpoint is endpoint:
+            self._heartbeats.pop(key).stop()
+        asyncio.create_task(self._pool.mark_dead(endpoint))
+
+    def _get_key_seats(self, key):
+        return [
+            seat
+            for seat, (bot_key, _) in self._bot_configs.items()
+            if bot_key == key
+        ]
+
+    def _on_bot_reconnected(self, key, endpoint):
+        for seat, (bot_key, _) in self._bot_configs.items():
+            if bot_key == key:
+                logging.info(f"Bot of seat {seat} connected")
+                self._add_bot(seat, endpoint)
 
     async def _receive_messages_from_seat(self, seat, on_receive_cb):
         """Receives tcp messages from specific bot
 
         :param seat: Robot seat
         :type seat: int
-        :param on_receive_cb: Function to call when message is received,
-            must take seat, cmd_id and cmd_val as parameters
-        :type on_receive_cb: function
+        :param on_receive_cb: Function to call for each seat of the bot when
+            message is received, must take seat, cmd_id and cmd_val as
+            parameters
+        :type on_receive_cb: function/None
         """
         logging.info(f"Receiving messages for seat {seat}")
         endpoint = self.endpoints[seat]
         try:
             while True:
                 data = await endpoint.receive_exactly(2)
+                if data is None:
+                    return
                 cmd_id, cmd_val = struct.unpack("BB", data)
-                await on_receive_cb(seat, cmd_id, cmd_val)
+                if cmd_id == TcpCommandId.PING:
+                    heartbeat = self._heartbeats.get(endpoint.address)
+                    if heartbeat is not None:
+                        heartbeat.reply_received(cmd_val)
+                        continue
+                if on_receive_cb is not None:
+                    for bot_seat, bot_endpoint in list(self.endpoints.items()):
+                        if bot_endpoint is endpoint:
+                            await on_receive_cb(bot_seat, cmd_id, cmd_val)
         except asyncio.CancelledError:
             logging.info(f"Message receiver for seat {seat} cancelled")
-        except ConnectionResetError:
+        except (ConnectionResetError, asyncio.IncompleteReadError):
             logging.error(f"Message receiver for seat {seat} stopped")
+            # a closed endpoint has already been handled
+            if not endpoint.closed:
+                self._on_link_dead(endpoint.address, endpoint)
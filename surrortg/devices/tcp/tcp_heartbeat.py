@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import time
+
+from surrortg.network.latency import LatencyHistogram
+
+from .tcp_protocol import TcpCommandId
+
+# Seconds between PING commands
+HEARTBEAT_INTERVAL = 1.0
+# Moving average RTT in seconds over which the link is degraded
+DEGRADED_RTT = 0.1
+# Seconds without PING replies after which the link is dead
+DEAD_TIMEOUT = 5.0
+# Weight of the latest RTT in the moving average
+RTT_AVERAGE_WEIGHT = 0.2
+
+LINK_OK = "ok"
+LINK_DEGRADED = "degraded"
+LINK_DEAD = "dead"
+
+
+class TcpHeartbeat:
+    """Sends PING commands to a bot and measures the round-trip time
+
+    The bot is expected to reply to (PING, n) with the same two bytes. The
+    replies have to be passed to reply_received. The link is degraded when
+    the RTT moving average is over degraded_rtt, or a reply is late by
+    more than degraded_rtt, and dead when no replies have been received
+    for dead_timeout. After the link is dead, no more PINGs are sent.
+
+    :param endpoint: Endpoint of the bot
+    :type endpoint: TcpEndpoint
+    :param on_state_change: Function called with the new link state,
+        defaults to None
+    :type on_state_change: Function/None, optional
+    :param interval: Seconds between PINGs, defaults to HEARTBEAT_INTERVAL
+    :type interval: float, optional
+    :param degraded_rtt: RTT in seconds over which the link is degraded,
+        defaults to DEGRADED_RTT
+    :type degraded_rtt: float, optional
+    :param dead_timeout: Seconds without replies after which the link is
+        dead, defaults to DEAD_TIMEOUT
+    :type dead_timeout: float, optional
+    """
+
+    def __init__(
+        self,
+        endpoint,
+        on_state_change=None,
+        interval=HEARTBEAT_INTERVAL,
+        degraded_rtt=DEGRADED_RTT,
+        dead_timeout=DEAD_TIMEOUT,
+    ):
+        self.endpoint = endpoint
+        self.on_state_change = on_state_change
+        self.interval = interval
+        self.degraded_rtt = degraded_rtt
+        self.dead_timeout = dead_timeout
+        self.state = LINK_OK
+        self.rtt = None
+        self.histogram = LatencyHistogram()
+        self.stats = {
+            "pings": 0,
+            "replies": 0,
+            "lost": 0,
+            "unmatched_replies": 0,
+        }
+        self._sent = {}
+        self._seq = 0
+        self._replied_at = None
+        self._task = None
+
+    def start(self):
+        self._replied_at = time.perf_counter()
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def reply_received(self, seq):
+        """Handles a PING reply from the bot
+
+        :param seq: Value of the reply
+        :type seq: int
+        """
+        sent_at = self._sent.pop(seq, None)
+        if sent_at is None:
+            self.stats["unmatched_replies"] += 1
+            return
+        # earlier PINGs without replies are lost
+        lost = [s for s, t in self._sent.items() if t < sent_at]
+        for lost_seq in lost:
+            del self._sent[lost_seq]
+        self.stats["lost"] += len(lost)
+        now = time.perf_counter()
+        rtt = now - sent_at
+        self._replied_at = now
+        self.stats["replies"] += 1
+        self.histogram.record(rtt * 1000)
+        if self.rtt is None:
+            self.rtt = rtt
+        else:
+            self.rtt += RTT_AVERAGE_WEIGHT * (rtt - self.rtt)
+        self._update_state(now)
+
+    def get_stats(self):
+        """Returns the link state and the RTTs in milliseconds
+
+        :return: Statistics, rtt_ms is the moving average
+        :rtype: dict
+        """
+        return {
+            "state": self.state,
+            "rtt_ms": self.rtt * 1000 if self.rtt is not None else None,
+            **self.stats,
+            **self.histogram.to_dict(),
+        }
+
+    async def _run(self):
+        while True:
+            now = time.perf_counter()
+            self._update_state(now)
+            if self.state == LINK_DEAD:
+                return
+            self._seq = (self._seq + 1) % 256
+            # replies older than the timeout will not be matched anymore
+            self._sent = {
+                seq: sent_at
+                for seq, sent_at in self._sent.items()
+                if now - sent_at < self.dead_timeout
+            }
+            if not self.endpoint.closed:
+                self._sent[self._seq] = now
+                self.stats["pings"] += 1
+                self.endpoint.send_nowait(
+                    bytes([TcpCommandId.PING, self._seq])
+                )
+            await asyncio.sleep(self.interval)
+
+    def _update_state(self, now):
+        if self.state == LINK_DEAD:
+            return
+        if now - self._replied_at > self.dead_timeout:
+            state = LINK_DEAD
+        elif (self.rtt is not None and self.rtt > self.degraded_rtt) or (
+            len(self._sent) > 0
+            and now - min(self._sent.values()) > self.degraded_rtt
+        ):
+            state = LINK_DEGRADED
+        else:
+            state = LINK_OK
+        if state != self.state:
+            logging.info(
+                f"Link to {self.endpoint.address[0]} changed from "
+                f"{self.state} to {state}"
+            )
+            self.state = state
+            if self.on_state_change is not None:
+                self.on_state_change(state)
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+
+from surrortg.network.connection_state import Backoff
+
+from .tcp_protocol import open_tcp_endpoint
+
+# Connection timeout in seconds for a single bot
+CONNECT_TIMEOUT = 5
+# Min and max sleep in seconds between background reconnect attempts
+RETRY_MIN_SLEEP = 1
+RETRY_MAX_SLEEP = 30
+
+
+class TcpEndpointPool:
+    """Keeps the TCP endpoints of the bots open between games
+
+    The endpoints are keyed by (host, port). connect() reuses the endpoints
+    which are still alive, and opens the missing ones concurrently, so it
+    takes at most the connection timeout of a single bot. Bots which could
+    not be reached are retried in the background with backoff, and
+    on_reconnect is called when one of them connects.
+
+    :param on_reconnect: Function called with the (host, port) key and the
+        new endpoint after a successful background retry, defaults to None
+    :type on_reconnect: Function/None, optional
+    :param timeout: Connection timeout in seconds, defaults to
+        CONNECT_TIMEOUT
+    :type timeout: float, optional
+    """
+
+    def __init__(self, on_reconnect=None, timeout=CONNECT_TIMEOUT):
+        self.on_reconnect = on_reconnect
+        self.timeout = timeout
+        self._endpoints = {}
+        self._retry_tasks = {}
+        self.stats = {
+            "connects": 0,
+            "reused": 0,
+            "failed": 0,
+            "retries": 0,
+        }
+
+    async def connect(self, keys):
+        """Returns alive endpoints for the keys, connecting when needed
+
+        Endpoints of keys which are not given are closed, and their
+        background retries cancelled. Keys which could not be connected
+        are retried in the background.
+
+        :param keys: (host, port) tuples
+        :type keys: iterable
+        :return: {(host, port): TcpEndpoint or None if not connected}
+        :rtype: dict
+        """
+        keys = list(dict.fromkeys(keys))
+        for key in set(self._endpoints).union(self._retry_tasks) - set(keys):
+            self._cancel_retry(key)
+            endpoint = self._endpoints.pop(key, None)
+            if endpoint is not None:
+                await endpoint.close()
+
+        endpoints = {}
+        missing = []
+        for key in keys:
+            endpoint = self.get(key)
+            if endpoint is not None:
+                self.stats["reused"] += 1
+                endpoints[key] = endpoint
+            else:
+                # connect now instead of waiting for the retry backoff
+                self._cancel_retry(key)
+                await self._discard(key)
+                missing.append(key)
+
+        results = await asyncio.gather(
+            *(open_tcp_endpoint(*key, self.timeout) for key in missing)
+        )
+        for key, endpoint in zip(missing, results):
+            endpoints[key] = endpoint
+            if endpoint is None:
+                self.stats["failed"] += 1
+                self._start_retry(key)
+            else:
+                self.stats["connects"] += 1
+                self._endpoints[key] = endpoint
+        return endpoints
+
+    def get(self, key):
+        """Returns the endpoint of the key if it is alive, else None
+
+        :param key: (host, port)
+        :type key: tuple
+        :rtype: TcpEndpoint/None
+        """
+        endpoint = self._endpoints.get(key)
+        if endpoint is not None and endpoint.alive:
+            return endpoint
+        return None
+
+    async def mark_dead(self, endpoint):
+        """Closes a broken endpoint and retries it in the background
+
+        Does nothing if the endpoint has already been replaced or removed.
+
+        :param endpoint: Endpoint from connect()
+        :type endpoint: TcpEndpoint
+        """
+        key = endpoint.address
+        if self._endpoints.get(key) is not endpoint:
+            return
+        await self._discard(key)
+        self._start_retry(key)
+
+    async def close(self):
+        """Closes all the endpoints and cancels the background retries"""
+        for key in list(self._retry_tasks):
+            self._cancel_retry(key)
+        for key in list(self._endpoints):
+            await self._discard(key)
+
+    async def _discard(self, key):
+        endpoint = self._endpoints.pop(key, None)
+        if endpoint is not None:
+            await endpoint.close()
+
+    def _start_retry(self, key):
+        if key not in self._retry_tasks:
+            self._retry_tasks[key] = asyncio.create_task(self._retry(key))
+
+    def _cancel_retry(self, key):
+        task = self._retry_tasks.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    async def _retry(self, key):
+        backoff = Backoff(RETRY_MIN_SLEEP, RETRY_MAX_SLEEP)
+        while True:
+            try:
+                await asyncio.sleep(backoff.next_sleep())
+            except asyncio.CancelledError:
+                return
+            self.stats["retries"] += 1
+            # shielded, so a connection finished during cancellation is
+            # closed instead of leaked
+            connect = asyncio.ensure_future(
+                open_tcp_endpoint(*key, self.timeout)
+            )
+            try:
+                endpoint = await asyncio.shield(connect)
+            except asyncio.CancelledError:
+                connect.add_done_callback(_close_connected)
+                return
+            if endpoint is not None:
+                break
+        del self._retry_tasks[key]
+        self.stats["connects"] += 1
+        self._endpoints[key] = endpoint
+        logging.info(f"Reconnected to {key[0]}:{key[1]}")
+        if self.on_reconnect is not None:
+            self.on_reconnect(key, endpoint)
+
+
+def _close_connected(connect):
+    if connect.cancelled() or connect.exception() is not None:
+        return
+    if connect.result() is not None:
+        asyncio.ensure_future(connect.result().close())
@@ -1,7 +1,15 @@
 import asyncio
 import logging
+import socket
+import time
 from enum import IntEnum
 
+# Bytes in the write buffer over which the commands sent with send_nowait
+# are held back, and merged, until the bot has read the earlier ones
+WRITE_HIGH_WATER = 64
+# Seconds between the write buffer checks while the commands are held
+DRAIN_INTERVAL = 0.005
+
 
 class TcpCommandId(IntEnum):
     """Emun for 8-bit command identifiers of TCP-controlled bots"""
@@ -26,6 +34,14 @@ class TcpCommandId(IntEnum):
 class TcpEndpoint:
     """High-level interface for TCP endpoints
 
+    Nagle's algorithm is disabled, so the small commands are sent
+    immediately. Commands sent with send_nowait are buffered and written
+    together once per event loop iteration, and only the latest command
+    of each command id is sent, unless the command is sent with
+    coalesce=False. While the write buffer is over WRITE_HIGH_WATER, the
+    commands are held until it drains, so only the latest values are sent
+    to a bot which can't keep up.
+
     :param reader: asyncio connection reader
     :type reader: asyncio.StreamReader
     :param writer: asyncio connection writer
@@ -42,11 +58,37 @@ class TcpEndpoint:
         self._writer = writer
         self._address = host
         self._port = port
+        # command id -> latest command, insertion ordered
+        self._pending = {}
+        self._flush_handle = None
+        self._drain_task = None
+        self._opened_at = time.monotonic()
+        self.stats = {
+            "bytes_sent": 0,
+            "packets_sent": 0,
+            "commands_sent": 0,
+            "commands_coalesced": 0,
+            "write_stalls": 0,
+            "deferred_flushes": 0,
+            "max_write_buffer_size": 0,
+            "max_drain_time": 0.0,
+        }
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except OSError as e:
+                logging.warning(f"Could not set TCP_NODELAY for {host}: {e}")
 
     async def close(self):
-        """Close the endpoint"""
+        """Close the endpoint, writing the buffered commands first"""
         if self._closed:
             return
+        if self._drain_task is not None:
+            self._drain_task.cancel()
+            self._drain_task = None
+        if len(self._pending) > 0:
+            self._flush(force=True)
         self._closed = True
         self._writer.close()
         await self._writer.wait_closed()
@@ -60,14 +102,140 @@ class TcpEndpoint:
         if self._closed:
             logging.error(f"Endpoint to {self._address} is closed")
             return
+        # keep the order of the buffered commands
+        if len(self._pending) > 0:
+            self._flush(force=True)
         try:
-            self._writer.write(data)
+            self._write(data)
+            start = time.perf_counter()
             await self._writer.drain()
+            self._record_drain_time(time.perf_counter() - start)
         except:  # noqa E722
             logging.error(
                 f"Could not send data to {self._address}, connection down!"
             )
 
+    def send_nowait(self, data, coalesce=True):
+        """Buffer a command to be sent in this event loop iteration
+
+        Does not wait for the data to be written. If a command with the
+        same command id is already buffered, it is replaced, or with
+        coalesce=False, the buffered commands are written first. If the
+        write buffer is over WRITE_HIGH_WATER, the command is sent after it
+        drains.
+
+        :param data: Command to send, starting with the command id byte
+        :type data: bytes
+        :param coalesce: Replace a buffered command with the same command
+            id, defaults to True. Use False for commands whose every value
+            matters, like switch presses.
+        :type coalesce: bool, optional
+        """
+        if self._closed:
+            logging.error(f"Endpoint to {self._address} is closed")
+            return
+        cmd_id = data[0]
+        if cmd_id in self._pending:
+            if coalesce:
+                self.stats["commands_coalesced"] += 1
+            else:
+                self._flush(force=True)
+        self._pending[cmd_id] = data
+        if self._flush_handle is None and self._drain_task is None:
+            self._flush_handle = asyncio.get_running_loop().call_soon(
+                self._flush
+            )
+
+    def get_stats(self):
+        """Returns the send statistics
+
+        The rates are averages since the endpoint was opened. write_stalls
+        counts the writes that did not fit into the socket buffer,
+        deferred_flushes the times the buffered commands were held until
+        the write buffer drained, and max_drain_time is the longest wait
+        for the write buffer to drain, in seconds.
+
+        :return: Statistics
+        :rtype: dict
+        """
+        stats = dict(self.stats)
+        elapsed = time.monotonic() - self._opened_at
+        if elapsed > 0:
+            stats["bytes_per_second"] = stats["bytes_sent"] / elapsed
+            stats["packets_per_second"] = stats["packets_sent"] / elapsed
+        return stats
+
+    def _flush(self, force=False):
+        self._flush_handle = None
+        if len(self._pending) == 0:
+            return
+        if self._closed or self._writer.is_closing():
+            logging.debug(
+                f"Dropped {len(self._pending)} commands to {self._address}, "
+                "connection closed"
+            )
+            self._pending.clear()
+            return
+        if (
+            not force
+            and self._writer.transport.get_write_buffer_size()
+            > WRITE_HIGH_WATER
+        ):
+            if self._drain_task is None:
+                self.stats["deferred_flushes"] += 1
+                self._drain_task = asyncio.ensure_future(self._drain())
+            return
+        commands = list(self._pending.values())
+        self._pending.clear()
+        try:
+            self._write(b"".join(commands), len(commands))
+        except:  # noqa E722
+            logging.error(
+                f"Could not send data to {self._address}, connection down!"
+            )
+
+    async def _drain(self):
+        try:
+            start = time.perf_counter()
+            # drain() only waits for the transport's own high water mark
+            while True:
+                await self._writer.drain()
+                if (
+                    self._writer.is_closing()
+                    or self._writer.transport.get_write_buffer_size()
+                    <= WRITE_HIGH_WATER
+                ):
+                    break
+                await asyncio.sleep(DRAIN_INTERVAL)
+            self._record_drain_time(time.perf_counter() - start)
+        except asyncio.CancelledError:
+            raise
+        except:  # noqa E722
+            logging.error(
+                f"Could not send data to {self._address}, connection down!"
+            )
+            self._pending.clear()
+            return
+        finally:
+            self._drain_task = None
+        self._flush()
+
+    def _record_drain_time(self, drain_time):
+        if drain_time > self.stats["max_drain_time"]:
+            self.stats["max_drain_time"] = drain_time
+
+    def _write(self, data, commands=1):
+        self._writer.write(data)
+        stats = self.stats
+        stats["bytes_sent"] += len(data)
+        stats["packets_sent"] += 1
+        stats["commands_sent"] += commands
+        buffer_size = self._writer.transport.get_write_buffer_size()
+        if buffer_size > 0:
+            stats["write_stalls"] += 1
+            if buffer_size > stats["max_write_buffer_size"]:
+                stats["max_write_buffer_size"] = buffer_size
+
     async def receive(self, n=100):
         """Receive up to n bytes of data from endpoint
 
@@ -112,6 +280,20 @@ class TcpEndpoint:
         """
         return self._closed
 
+    @property
+    def alive(self):
+        """Indicates whether the connection can still be used
+
+        False if the endpoint is closed, or the bot has closed or reset
+        the connection.
+
+        :return: True if the connection is usable
+        :rtype: bool
+        """
+        return not (
+            self._closed or self._writer.is_closing() or self._reader.at_eof()
+        )
+
 
 async def open_tcp_endpoint(host, port, timeout=5):
     """Open TCP remote endpoint to host
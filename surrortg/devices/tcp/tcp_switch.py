@@ -51,13 +51,9 @@ class TcpSwitch(Switch, TcpInput):
             f"Running tcp switch cmd {self._cmd}, seat {seat} with value {val}"
         )
         if not endpoint.closed:
-            try:
-                await endpoint.send(struct.pack("BB", self._cmd, val))
-            except OSError as e:
-                logging.warning(
-                    f"Failed to send value {val} to seat {seat} "
-                    f"command {self._cmd}: {e}"
-                )
+            endpoint.send_nowait(
+                struct.pack("BB", self._cmd, val), coalesce=False
+            )
         else:
             logging.debug(
                 f"Did not send value {val} to seat {seat} "
@@ -3,20 +3,38 @@ import logging
 import struct
 
 from .udp_protocol import open_remote_endpoint
+from .udp_transmitter import (
+    COMMAND,
+    STATE_INTERVAL,
+    STATE_REPEATS,
+    UdpStateTransmitter,
+)
 
 BOT_UDP_PORT = 31337
+# Max datagrams queued per bot, the oldest are dropped when full
+BOT_QUEUE_SIZE = 100
 set_file_name = "/var/lib/srtg/current_set"
 
 
 class UdpBot:
-    """Base class for all bots that are controlled with udp commands"""
+    """Base class for all bots that are controlled with udp commands
+
+    The commands of all the inputs of a seat are sent by one
+    UdpStateTransmitter, see set_state_transmitter.
+    """
 
     def __init__(self):
         self.inputs = {}
         self.bots = {}
         self.endpoints = {}
         self.bot_listeners_tasks = {}
+        self.transmitters = {}
         self.current_set = 0
+        self._transmitter_options = {
+            "interval": STATE_INTERVAL,
+            "packed": False,
+            "repeats": STATE_REPEATS,
+        }
         self._loop = asyncio.get_running_loop()
 
     async def handle_config(  # noqa: C901
@@ -24,6 +42,7 @@ class UdpBot:
         ge_config,
         local_bot_config={},
         bot_listener_cb=None,
+        direct_listener=False,
     ):
         """Handle robot configuration
 
@@ -33,8 +52,13 @@ class UdpBot:
             to bot addresses, defaults to an empty dict
         :type local_bot_config: dict, optional
         :param bot_listener_cb: This is executed when udp message is received
-            from a bot, defaults to None. Must take parameters seat and data.
+            from a bot, defaults to None. Must take seat, cmd_id and cmd_val
+            as parameters, and is awaited in a listener task.
         :type bot_listener_cb: function, optional
+        :param direct_listener: Call bot_listener_cb directly when a message
+            is received, without queueing. bot_listener_cb must then be a
+            regular function, whose result is not awaited. Defaults to False
+        :type direct_listener: bool, optional
         :return: Current set and bots in current set, mapped by seats
         :rtype: (int, dict)
         """
@@ -91,7 +115,9 @@ class UdpBot:
                     f"{self.bots[seat]['custom']['address']} to {addr}"
                 )
 
-            endpoint = await open_remote_endpoint(addr, BOT_UDP_PORT)
+            endpoint = await open_remote_endpoint(
+                addr, BOT_UDP_PORT, queue_size=BOT_QUEUE_SIZE, drop_oldest=True
+            )
             self.endpoints[seat] = endpoint
             self.bots[seat] = bot_data
 
@@ -103,12 +129,25 @@ class UdpBot:
         # Register listener tasks for all endpoints if callback is given
         if bot_listener_cb is not None:
             for seat, endpoint in self.endpoints.items():
-                self.bot_listeners_tasks[seat] = asyncio.create_task(
-                    self._receive_udp_for_seat(seat, endpoint, bot_listener_cb)
-                )
+                if direct_listener:
+                    endpoint.set_handler(
+                        self._get_udp_handler(seat, bot_listener_cb),
+                        decoder=COMMAND,
+                    )
+                else:
+                    self.bot_listeners_tasks[seat] = asyncio.create_task(
+                        self._receive_udp_for_seat(
+                            seat, endpoint, bot_listener_cb
+                        )
+                    )
 
+        self.transmitters = {
+            seat: UdpStateTransmitter(endpoint, **self._transmitter_options)
+            for seat, endpoint in self.endpoints.items()
+        }
         for input_impl in self.inputs.values():
             input_impl.set_endpoints(self.endpoints)
+            input_impl.set_transmitters(self.transmitters)
 
         logging.info(
             f"UdpBot config done for {len(self.bots)}/{len(ge_bot_config)} "
@@ -159,6 +198,44 @@ class UdpBot:
 
         return set_num
 
+    def set_state_transmitter(
+        self, interval=STATE_INTERVAL, packed=False, repeats=STATE_REPEATS
+    ):
+        """Sets the options of the seats' state transmitters
+
+        The options are used for the transmitters created after this call,
+        so call this before handle_config.
+
+        :param interval: Seconds between the repeated commands of the inputs
+            with repeat_commands, defaults to STATE_INTERVAL
+        :type interval: float, optional
+        :param packed: Send all the commands in one datagram. The bot
+            firmware has to support datagrams with several (command id,
+            value) byte pairs. Defaults to False
+        :type packed: bool, optional
+        :param repeats: Times to repeat a command after it was set. None
+            repeats the latest commands until the bot is shut down, which
+            keeps the bot's failsafe from stopping it if the controller
+            freezes. Defaults to STATE_REPEATS
+        :type repeats: int/None, optional
+        """
+        self._transmitter_options = {
+            "interval": interval,
+            "packed": packed,
+            "repeats": repeats,
+        }
+
+    def get_receive_stats(self):
+        """Returns the counts of received, dropped and malformed datagrams
+
+        :return: Endpoint statistics with seats as keys
+        :rtype: dict
+        """
+        return {
+            seat: dict(endpoint.stats)
+            for seat, endpoint in self.endpoints.items()
+        }
+
     def add_inputs(self, new_inputs):
         """Appends the given inputs to the bot's input configuration
 
@@ -184,6 +261,8 @@ class UdpBot:
                     input_impl.shutdown(seat), self._loop
                 )
             endpoint.close()
+        for transmitter in self.transmitters.values():
+            transmitter.close()
 
     async def _receive_udp_for_seat(self, seat, endpoint, on_receive_cb):
         """Receives udp messages from specific bot
@@ -200,7 +279,27 @@ class UdpBot:
         try:
             while True:
                 data = await endpoint.receive()
-                cmd_id, cmd_val = struct.unpack("BB", data)
+                try:
+                    cmd_id, cmd_val = COMMAND.unpack(data)
+                except struct.error:
+                    endpoint.stats["malformed"] += 1
+                    continue
                 await on_receive_cb(seat, cmd_id, cmd_val)
         except asyncio.CancelledError:
             logging.info(f"Udp receiver for seat {seat} cancelled")
+
+    @staticmethod
+    def _get_udp_handler(seat, on_receive_cb):
+        """Returns an endpoint handler which calls on_receive_cb directly
+
+        :param seat: Robot seat
+        :type seat: int
+        :param on_receive_cb: Function to call when message is received,
+            must take seat, cmd_id and cmd_val as parameters
+        :type on_receive_cb: function
+        """
+
+        def handler(values, addr):
+            on_receive_cb(seat, *values)
+
+        return handler
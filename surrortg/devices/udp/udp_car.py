@@ -14,8 +14,8 @@ class UdpCar(UdpBot):
     :type throttle_mult: float, optional
     :param steering_mult: multiplier for steering value, defaults to 1.0
     :type steering_mult: float, optional
-    :param repeat_commands: defines if commands should be repeated,
-        defaults to False
+    :param repeat_commands: defines if the latest command should be
+        repeated periodically by the state transmitter, defaults to False
     :type repeat_commands: bool, optional
     """
 
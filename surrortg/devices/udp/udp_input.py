@@ -1,4 +1,5 @@
 from ...inputs import Input
+from .udp_transmitter import UdpStateTransmitter
 
 
 class UdpInput(Input):
@@ -8,6 +9,7 @@ class UdpInput(Input):
 
     def __init__(self):
         self.endpoints = {}
+        self.transmitters = {}
 
     def set_endpoints(self, endpoints):
         """Set endpoints for this input, overriding existing ones.
@@ -16,3 +18,31 @@ class UdpInput(Input):
         :type endpoints: dict
         """
         self.endpoints = endpoints
+        self.transmitters = {}
+
+    def set_transmitters(self, transmitters):
+        """Set state transmitters shared with the other inputs of the bots
+
+        Without shared transmitters, the input creates its own ones.
+
+        :param transmitters: UdpStateTransmitters with seats as keys
+        :type transmitters: dict
+        """
+        self.transmitters = transmitters
+
+    def _get_transmitter(self, seat):
+        """Returns the state transmitter of the seat
+
+        :param seat: Robot seat
+        :type seat: int
+        :return: Transmitter, None if there is no endpoint for the seat
+        :rtype: UdpStateTransmitter/None
+        """
+        transmitter = self.transmitters.get(seat)
+        if transmitter is None:
+            endpoint = self.endpoints.get(seat)
+            if endpoint is None:
+                return None
+            transmitter = UdpStateTransmitter(endpoint)
+            self.transmitters[seat] = transmitter
+        return transmitter
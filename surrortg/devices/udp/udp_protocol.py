@@ -22,6 +22,8 @@ __all__ = ["open_local_endpoint", "open_remote_endpoint"]
 # Imports
 
 import asyncio
+import logging
+import struct
 import warnings
 
 # Datagram protocol
@@ -61,22 +63,66 @@ class Endpoint:
     """High-level interface for UDP endpoints.
     Can either be local or remote.
     It is initialized with an optional queue size for the incoming datagrams.
+    When the queue is full, new datagrams are dropped with a warning, or if
+    drop_oldest is set, the oldest queued datagram is dropped instead.
+    Alternatively, the datagrams can be passed to a handler without the
+    queue, see set_handler.
     """
 
-    def __init__(self, queue_size=None):
+    def __init__(self, queue_size=None, drop_oldest=False):
         if queue_size is None:
             queue_size = 0
         self._queue = asyncio.Queue(queue_size)
+        self._drop_oldest = drop_oldest
         self._closed = False
         self._transport = None
+        self._handler = None
+        self._decoder = None
+        self._batch = None
+        self.stats = {"received": 0, "dropped": 0, "malformed": 0}
 
     # Protocol callbacks
 
     def feed_datagram(self, data, addr):
+        if data is not None:
+            self.stats["received"] += 1
+            if self._handler is not None:
+                self._dispatch(data, addr)
+                return
         try:
             self._queue.put_nowait((data, addr))
         except asyncio.QueueFull:
-            warnings.warn("Endpoint queue is full")
+            self.stats["dropped"] += 1
+            if self._drop_oldest:
+                self._queue.get_nowait()
+                self._queue.put_nowait((data, addr))
+            else:
+                warnings.warn("Endpoint queue is full")
+
+    def _dispatch(self, data, addr):
+        if self._decoder is not None:
+            try:
+                data = self._decoder.unpack(data)
+            except struct.error:
+                self.stats["malformed"] += 1
+                return
+        if self._batch is None:
+            self._call_handler(data, addr)
+        else:
+            if len(self._batch) == 0:
+                asyncio.get_running_loop().call_soon(self._flush_batch)
+            self._batch.append((data, addr))
+
+    def _flush_batch(self):
+        batch, self._batch = self._batch, []
+        if len(batch) > 0:
+            self._call_handler(batch)
+
+    def _call_handler(self, *args):
+        try:
+            self._handler(*args)
+        except Exception:
+            logging.exception("Endpoint handler failed")
 
     def close(self):
         # Manage flag
@@ -92,6 +138,26 @@ class Endpoint:
 
     # User methods
 
+    def set_handler(self, handler, decoder=None, batch=False):
+        """Pass the incoming datagrams to a handler instead of the queue.
+        The handler is called directly when the datagram is received, or
+        with batch, once per event loop iteration with all the datagrams
+        of that iteration. None restores the queue.
+
+        :param handler: Called with data and addr, or with batch, a list
+            of (data, addr). Must not block.
+        :type handler: function/None
+        :param decoder: Precompiled struct for unpacking the data, the
+            handler gets the tuple of values, defaults to None. Datagrams
+            of the wrong size are counted as malformed and dropped.
+        :type decoder: struct.Struct/None, optional
+        :param batch: Deliver the datagrams in batches, defaults to False
+        :type batch: bool, optional
+        """
+        self._handler = handler
+        self._decoder = decoder
+        self._batch = [] if batch and handler is not None else None
+
     def send(self, data, addr):
         """Send a datagram to the given address."""
         if self._closed:
@@ -175,31 +241,33 @@ async def open_datagram_endpoint(
 
 
 async def open_local_endpoint(
-    host="0.0.0.0", port=0, *, queue_size=None, **kwargs
+    host="0.0.0.0", port=0, *, queue_size=None, drop_oldest=False, **kwargs
 ):
     """Open and return a local datagram endpoint.
-    An optional queue size argument can be provided.
+    Optional queue size and drop oldest arguments can be provided.
     Extra keyword arguments are forwarded to `loop.create_datagram_endpoint`.
     """
     return await open_datagram_endpoint(
         host,
         port,
         remote=False,
-        endpoint_factory=lambda: LocalEndpoint(queue_size),
+        endpoint_factory=lambda: LocalEndpoint(queue_size, drop_oldest),
         **kwargs
     )
 
 
-async def open_remote_endpoint(host, port, *, queue_size=None, **kwargs):
+async def open_remote_endpoint(
+    host, port, *, queue_size=None, drop_oldest=False, **kwargs
+):
     """Open and return a remote datagram endpoint.
-    An optional queue size argument can be provided.
+    Optional queue size and drop oldest arguments can be provided.
     Extra keyword arguments are forwarded to `loop.create_datagram_endpoint`.
     """
     return await open_datagram_endpoint(
         host,
         port,
         remote=True,
-        endpoint_factory=lambda: RemoteEndpoint(queue_size),
+        endpoint_factory=lambda: RemoteEndpoint(queue_size, drop_oldest),
         **kwargs
     )
 
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import struct
+
+# Seconds between the repeated state datagrams
+STATE_INTERVAL = 0.2
+# Times a repeated command is sent again after it has been set, so the bot
+# firmware's failsafe still stops the bot if the controller stops
+STATE_REPEATS = 10
+
+COMMAND = struct.Struct("BB")
+
+
+class UdpStateTransmitter:
+    """Sends the latest command values of a seat's inputs to its bot
+
+    Changed commands are sent at the end of the event loop iteration, so
+    the commands changed together, for example both joystick axes, are
+    sent together. Every change is sent in the order it was made, so a
+    switch pressed and released in the same iteration sends both. Commands
+    set with repeat=True are also sent every interval, repeats times after
+    they were last set, so a lost datagram is corrected by the next tick.
+
+    In the packed format all the commands are sent in one datagram of
+    (command id, value) byte pairs. Otherwise each command is sent in its
+    own 2-byte datagram, which is the format of the older bot firmwares.
+
+    :param endpoint: Endpoint of the bot
+    :type endpoint: RemoteEndpoint
+    :param interval: Seconds between the repeated sends, defaults to
+        STATE_INTERVAL
+    :type interval: float, optional
+    :param packed: Send several commands in one datagram, defaults to False
+    :type packed: bool, optional
+    :param repeats: Times to repeat a command, None repeats it until the
+        endpoint is closed. Defaults to STATE_REPEATS
+    :type repeats: int/None, optional
+    """
+
+    def __init__(
+        self,
+        endpoint,
+        interval=STATE_INTERVAL,
+        packed=False,
+        repeats=STATE_REPEATS,
+    ):
+        self.endpoint = endpoint
+        self.interval = interval
+        self.packed = packed
+        self.repeats = repeats
+        # command id -> latest value of the repeated commands
+        self._state = {}
+        # command id -> repeats left, None for repeating forever
+        self._repeats_left = {}
+        # (command id, value) pairs changed in this loop iteration, in order
+        self._changed = []
+        self._flush_handle = None
+        self._task = None
+        self.stats = {"datagrams": 0, "commands": 0, "ticks": 0}
+
+    def set(self, cmd, val, repeat=False):
+        """Sets the value of a command
+
+        :param cmd: Command id byte
+        :type cmd: int
+        :param val: Command value byte
+        :type val: int
+        :param repeat: Repeat the command every interval, defaults to False
+        :type repeat: bool, optional
+        """
+        if repeat and self.repeats != 0:
+            self._state[cmd] = val
+            self._repeats_left[cmd] = self.repeats
+        else:
+            self._state.pop(cmd, None)
+            self._repeats_left.pop(cmd, None)
+        self._changed.append((cmd, val))
+        loop = asyncio.get_running_loop()
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_soon(self._flush)
+        if (
+            cmd in self._state
+            and self._task is None
+            and not self.endpoint.closed
+        ):
+            self._task = loop.create_task(self._run())
+
+    def close(self):
+        """Stops the repeated sends"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._state = {}
+        self._repeats_left = {}
+
+    def get_stats(self):
+        return dict(self.stats)
+
+    def _flush(self):
+        self._flush_handle = None
+        changed, self._changed = self._changed, []
+        self._send(changed)
+
+    async def _run(self):
+        while not self.endpoint.closed and len(self._state) > 0:
+            await asyncio.sleep(self.interval)
+            if len(self._state) > 0:
+                self.stats["ticks"] += 1
+                self._send(list(self._state.items()))
+                self._count_repeats()
+        self._task = None
+
+    def _count_repeats(self):
+        for cmd, left in list(self._repeats_left.items()):
+            if left is None:
+                continue
+            if left <= 1:
+                del self._state[cmd]
+                del self._repeats_left[cmd]
+            else:
+                self._repeats_left[cmd] = left - 1
+
+    def _send(self, commands):
+        if len(commands) == 0:
+            return
+        if self.endpoint.closed:
+            logging.debug(
+                f"Did not send commands {commands}, endpoint was closed"
+            )
+            return
+        try:
+            if self.packed:
+                pack = COMMAND.pack
+                data = b"".join([pack(*item) for item in commands])
+                self.endpoint.send(data)
+                self.stats["datagrams"] += 1
+            else:
+                for cmd, val in commands:
+                    self.endpoint.send(COMMAND.pack(cmd, val))
+                    self.stats["datagrams"] += 1
+            self.stats["commands"] += len(commands)
+        except OSError as e:
+            logging.warning(f"Failed to send commands {commands}: {e}")
@@ -0,0 +1,111 @@
+"""Event loop selection and tuning for Game.run
+
+The options can be given to Game.run as event_loop, or in the [event_loop]
+section of srtg.toml:
+::
+
+    [event_loop]
+    type = "uvloop"  # "asyncio" (default) or "uvloop"
+    executor_workers = 4  # threads of the default executor
+    slow_callback_duration = 0.05  # seconds, logged in debug mode
+    debug = false  # asyncio debug mode
+
+uvloop is used only if it is installed, otherwise the default asyncio loop
+is used with a warning.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+LOOP_ASYNCIO = "asyncio"
+LOOP_UVLOOP = "uvloop"
+EVENT_LOOP_OPTIONS = {
+    "type",
+    "executor_workers",
+    "slow_callback_duration",
+    "debug",
+}
+
+
+def get_event_loop_options(config_options=None, run_options=None):
+    """Combines and validates the event loop options
+
+    :param config_options: Options from srtg.toml, defaults to None
+    :type config_options: dict/None, optional
+    :param run_options: Options given to Game.run, override the config.
+        A string is the same as {"type": <string>}. Defaults to None
+    :type run_options: dict/str/None, optional
+    :raises RuntimeError: if an option is unknown or invalid
+    :return: Options with all the keys of EVENT_LOOP_OPTIONS
+    :rtype: dict
+    """
+    if isinstance(run_options, str):
+        run_options = {"type": run_options}
+    options = {
+        "type": LOOP_ASYNCIO,
+        "executor_workers": None,
+        "slow_callback_duration": None,
+        "debug": False,
+    }
+    for source in (config_options, run_options):
+        if source is None:
+            continue
+        unknown = set(source) - EVENT_LOOP_OPTIONS
+        if len(unknown) > 0:
+            raise RuntimeError(f"Unknown event_loop options: {unknown}")
+        options.update(source)
+
+    if options["type"] not in (LOOP_ASYNCIO, LOOP_UVLOOP):
+        raise RuntimeError(
+            f"Unknown event_loop type '{options['type']}', "
+            f"options: {LOOP_ASYNCIO}, {LOOP_UVLOOP}"
+        )
+    workers = options["executor_workers"]
+    if workers is not None and (not isinstance(workers, int) or workers < 1):
+        raise RuntimeError("event_loop executor_workers must be positive")
+    return options
+
+
+def get_event_loop_policy(loop_type):
+    """Returns the event loop policy for the loop type
+
+    :param loop_type: LOOP_ASYNCIO or LOOP_UVLOOP
+    :type loop_type: str
+    :return: Policy to set, None for the default asyncio policy
+    :rtype: asyncio.AbstractEventLoopPolicy/None
+    """
+    if loop_type == LOOP_UVLOOP:
+        if uvloop is not None:
+            return uvloop.EventLoopPolicy()
+        logging.warning("uvloop is not installed, using the asyncio loop")
+    return None
+
+
+def tune_event_loop(
+    loop, executor_workers=None, slow_callback_duration=None, debug=False
+):
+    """Applies the tuning options to a running event loop
+
+    :param loop: Event loop
+    :type loop: asyncio.AbstractEventLoop
+    :param executor_workers: Threads of the default executor used by
+        run_in_executor, None keeps the asyncio default. Defaults to None
+    :type executor_workers: int/None, optional
+    :param slow_callback_duration: Callbacks running longer than this are
+        logged in debug mode, None keeps the default. Defaults to None
+    :type slow_callback_duration: float/None, optional
+    :param debug: Enable asyncio debug mode, defaults to False
+    :type debug: bool, optional
+    """
+    if executor_workers is not None:
+        loop.set_default_executor(
+            ThreadPoolExecutor(max_workers=executor_workers)
+        )
+    if slow_callback_duration is not None:
+        loop.slow_callback_duration = slow_callback_duration
+    if debug:
+        loop.set_debug(True)
@@ -1,10 +1,24 @@
 import asyncio
 import functools
 import logging
+import time
 from enum import Enum
-from signal import SIGINT, SIGTERM, SIGUSR1
-
-from .game_io import GameIO
+from signal import SIGINT, SIGTERM, SIGUSR1, SIGUSR2
+
+from .event_loop import (
+    get_event_loop_options,
+    get_event_loop_policy,
+    tune_event_loop,
+)
+from .game_io import SENDER_STOP_TIMEOUT, GameIO
+from .game_metrics import (
+    LOOP_LAG_THRESHOLD,
+    PHASE_DURATION_THRESHOLD,
+    AdminLogLimiter,
+    LoopLagMonitor,
+    PhaseTimer,
+    format_loop_lag,
+)
 
 # Reason codes are passed to the user as an on_exit parameter.
 # Code and description is also logged.
@@ -143,6 +157,7 @@ class Game:
         start_games_inputs_enabled=True,
         robot_type=RobotType.ROBOT,
         device_id=None,
+        event_loop=None,
     ):
         """Connect to the game engine and start the Game loop
 
@@ -164,6 +179,11 @@ class Game:
         :param device_id: Overrides device_id from config file. Note: config
             file device_id is mandatory field even when this parameter is used
         :type device_id: str/None, optional
+        :param event_loop: Event loop type "asyncio" or "uvloop", or a dict
+            of event loop options, see surrortg.event_loop. Overrides the
+            [event_loop] section of the config file. None uses the config,
+            or the default asyncio loop. Defaults to None
+        :type event_loop: str/dict/None, optional
         """
 
         if logging_level is not None:
@@ -178,7 +198,11 @@ class Game:
 
         # this structure makes testing easier
         self._pre_run(
-            config_path, socketio_logging_level, robot_type, device_id
+            config_path,
+            socketio_logging_level,
+            robot_type,
+            device_id,
+            event_loop,
         )
         self._run()
         self._post_run()
@@ -273,7 +297,12 @@ class Game:
         return not hasattr(self, "_io")
 
     def _pre_run(
-        self, config_path, socketio_logging_level, robot_type, device_id
+        self,
+        config_path,
+        socketio_logging_level,
+        robot_type,
+        device_id,
+        event_loop=None,
     ):
         # log info if certain methods not implemented
         for method_name in CHECK_IMPLEMENTATION:
@@ -290,6 +319,10 @@ class Game:
             device_id,
         )
 
+        self._event_loop_options = get_event_loop_options(
+            self.io._config.get("event_loop"), event_loop
+        )
+
         # set flag for updates between games
         self._update_requested = False
 
@@ -300,6 +333,28 @@ class Game:
         self._current_seat = None
         self._on_finish_started = False
 
+        # init metrics, configured in the [monitoring] section of srtg.toml
+        monitoring = self.io._config.get("monitoring", {})
+        self._phase_timer = PhaseTimer()
+        self._phase_threshold = monitoring.get(
+            "phase_threshold", PHASE_DURATION_THRESHOLD
+        )
+        self._loop_monitor = (
+            LoopLagMonitor(
+                threshold=monitoring.get(
+                    "loop_lag_threshold", LOOP_LAG_THRESHOLD
+                ),
+                on_lag=self._on_loop_lag,
+            )
+            if monitoring.get("loop_lag", False)
+            else None
+        )
+        self._admin_log = (
+            AdminLogLimiter(self.io.log_admin)
+            if monitoring.get("admin_log", False)
+            else None
+        )
+
         # set initial exit_reason, this should be different
         # when the program ends
         self._exit_reason = -1
@@ -315,7 +370,16 @@ class Game:
         )
 
     def _run(self):
-        asyncio.run(self._main())
+        policy = get_event_loop_policy(self._event_loop_options["type"])
+        if policy is None:
+            asyncio.run(self._main())
+            return
+        previous_policy = asyncio.get_event_loop_policy()
+        asyncio.set_event_loop_policy(policy)
+        try:
+            asyncio.run(self._main())
+        finally:
+            asyncio.set_event_loop_policy(previous_policy)
 
     def _post_run(self):
         # get still existing tasks
@@ -335,8 +399,18 @@ class Game:
         logging.info("Game ended.\n")
 
     async def _main(self):
+        tune_event_loop(
+            asyncio.get_running_loop(),
+            self._event_loop_options["executor_workers"],
+            self._event_loop_options["slow_callback_duration"],
+            self._event_loop_options["debug"],
+        )
+
         # get ready to handle GE messages
         self._handler_lock = asyncio.Lock()
+        self.io._sender.start()
+        if self._loop_monitor is not None:
+            self._loop_monitor.start()
 
         # Allow self.io.register_inputs usage and initialize the game.
         # Then forbid all later self.io.register_inputs calls.
@@ -358,6 +432,7 @@ class Game:
             SIGTERM, functools.partial(self._exit_signal_handler, 2)
         )
         self._loop.add_signal_handler(SIGUSR1, self._request_update)
+        self._loop.add_signal_handler(SIGUSR2, self.io.dump_latency_stats)
 
         try:
             await self._main_task
@@ -401,7 +476,11 @@ class Game:
         await self.on_exit(self._exit_reason, self._exception)
         await self.io.shutdown_inputs()
 
-        # shut down connections
+        if self._loop_monitor is not None:
+            await self._loop_monitor.stop()
+
+        # send the queued messages and shut down connections
+        await self.io._sender.stop(SENDER_STOP_TIMEOUT)
         await self.io._socket_handler.shutdown()
 
         # run() should now move to _post_run()
@@ -413,6 +492,11 @@ class Game:
             or message.event not in GE_EVENT_TO_NAME_AND_HANDLER
         ):
             return
+        received_at = (
+            message.received_at
+            if message.received_at is not None
+            else time.perf_counter()
+        )
 
         # make sure to handle only one message at a time
         async with self._handler_lock:
@@ -435,7 +519,7 @@ class Game:
 
             # create a new GE task
             self._current_ge_task = asyncio.create_task(
-                self._ge_task(task_name, method, message)
+                self._ge_task(task_name, method, message, received_at)
             )
         try:
             # await for the new GE task to finish
@@ -445,16 +529,66 @@ class Game:
             # it will cause previous message handling to be cancelled.
             return None
 
-    async def _ge_task(self, task_name, method, message):
+    async def _ge_task(self, task_name, method, message, received_at):
+        started_at = time.perf_counter()
         try:
             logging.info(f"'{task_name}' started")
             result = await method(message)
-            logging.info(f"'{task_name}' ended")
         except asyncio.CancelledError:
             logging.info(f"'{task_name}' cancelled")
+            self._record_phase(task_name, started_at, received_at, True)
             return
+        duration = self._record_phase(task_name, started_at, received_at)
+        logging.info(f"'{task_name}' ended in {duration:.3f} s")
         return result
 
+    def _record_phase(
+        self, task_name, started_at, received_at, cancelled=False
+    ):
+        now = time.perf_counter()
+        duration = now - started_at
+        self._phase_timer.record(
+            task_name, duration, now - received_at, cancelled
+        )
+        if (
+            self._phase_threshold is not None
+            and duration >= self._phase_threshold
+        ):
+            message = f"'{task_name}' took {duration:.2f} s"
+            logging.warning(message)
+            if self._admin_log is not None:
+                self._admin_log(task_name, message)
+        return duration
+
+    def _on_loop_lag(self, lag, stack):
+        message = format_loop_lag(lag, stack)
+        logging.warning(message)
+        if self._admin_log is not None:
+            self._admin_log("loop_lag", message)
+
+    def get_metrics(self):
+        """Returns the game phase timing and event loop lag metrics
+
+        Durations are in seconds. phases has for each phase (on_config,
+        on_prepare, ...) the handler durations and the response times from
+        receiving the game engine message to the response. loop has the
+        event loop lag samples and the stacks of the code which blocked the
+        loop for longer than the threshold. loop is None unless enabled
+        with 'loop_lag = true' in the [monitoring] section of srtg.toml.
+
+        :return: Metrics with keys phases and loop
+        :rtype: dict
+        """
+        return {
+            "phases": {
+                phase: dict(stats)
+                for phase, stats in self._phase_timer.stats.items()
+            },
+            "loop": self._loop_monitor.get_stats()
+            if self._loop_monitor is not None
+            else None,
+        }
+
     def _handle_robot_log(self, msg):
         if (
             "loggingLevel" in msg.payload
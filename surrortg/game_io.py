@@ -8,11 +8,19 @@ from .custom_config import (
     check_config_group,
     get_config_types,
 )
-from .network.message_router import MultiSeatMessageRouter
+from .network.message_router import (
+    INPUT_RESET_TIMEOUT,
+    MultiSeatMessageRouter,
+    reset_bindings,
+)
+from .network.message_sender import MessageSender
 from .network.socket_handler import SocketHandler
 
 SURRORTG_VERSION = "0.2.2"
 
+# Max time to wait for the queued messages to be sent when shutting down
+SENDER_STOP_TIMEOUT = 1
+
 
 class ScoreType(Enum):
     POINTS = "points"
@@ -63,6 +71,11 @@ class GameIO:
         if type(robot_type) is not str:
             robot_type = robot_type.value
 
+        # Dropping superseded controls of a received batch is opt-in
+        batch_filter = None
+        if self._config["game_engine"].get("coalesce_controls", False):
+            batch_filter = self._message_router.coalesce_batch
+
         self._socket_handler = SocketHandler(
             self._config["game_engine"]["url"],
             query={
@@ -78,9 +91,19 @@ class GameIO:
                 self._message_router.handle_message,
             ],
             response_callbacks={self._is_config_message: ge_message_handler},
-            socketio_connect_callback=self._send_controller_ready,
+            socketio_connect_callback=self._on_socketio_connect,
             socketio_logging_level=socketio_logging_level,
+            coalesce_window=self._config["game_engine"].get("coalesce_window"),
+            batch_filter=batch_filter,
+            coalesce_failed_callback=self._on_coalesced_send_failed,
+        )
+        self._sender = MessageSender(
+            self._send_socketio,
+            lambda: self._socket_handler.socketio_namespace.connected,
         )
+        self._reconnect_callbacks = []
+        if self._config.get("latency_tracking", False):
+            self.set_latency_tracking(True)
         self._can_register_inputs = False
         self._can_register_configs = False
 
@@ -355,7 +378,16 @@ class GameIO:
         }
         await self._send("setScoreType", payload=payload)
 
-    def register_inputs(self, inputs, admin=False, bindable=True):
+    def register_inputs(
+        self,
+        inputs,
+        admin=False,
+        bindable=True,
+        watchdog_timeout=None,
+        reset_order=0,
+        reset_timeout=INPUT_RESET_TIMEOUT,
+        mailbox=False,
+    ):
         """Registers inputs
 
         Input names must be unique.
@@ -369,6 +401,26 @@ class GameIO:
         :type admin: bool, optional
         :param bindable: Describes if the input can be bound to user
             input. Defaults to True.
+        :param watchdog_timeout: Seconds without messages from a player
+            before these inputs are reset for the player's seat. None uses
+            the game's timeout, see set_watchdog_timeout. Defaults to None.
+        :type watchdog_timeout: int/float/None, optional
+        :param reset_order: Inputs are reset and shut down in groups, lower
+            reset_order first. For example motors can be stopped before
+            resetting LEDs by registering the LEDs with reset_order=1.
+            Defaults to 0.
+        :type reset_order: int, optional
+        :param reset_timeout: Max seconds to wait for resetting one of these
+            inputs before continuing, None waits forever. Shutting down the
+            inputs is always awaited. Defaults to 2.
+        :type reset_timeout: int/float/None, optional
+        :param mailbox: Handle the commands of these inputs in the
+            background, one at a time per seat, so slow inputs don't delay
+            other messages. Commands arriving while one is being handled
+            wait, and for continuous inputs like Joystick and LinearActuator
+            only the newest waiting command is kept. Switch commands are
+            all kept in order. Defaults to False.
+        :type mailbox: bool, optional
         :raises RuntimeError: if input names are not unique
         :raises RuntimeError: if called outside on_init
         """
@@ -380,7 +432,15 @@ class GameIO:
         for input_id, handler_obj in inputs.items():
             if input_id in self.input_bindings:
                 raise RuntimeError(f"Duplicate input_ids: {input_id}")
-            self._message_router.register_input(input_id, handler_obj, admin)
+            self._message_router.register_input(
+                input_id,
+                handler_obj,
+                admin,
+                watchdog_timeout,
+                reset_order,
+                reset_timeout,
+                mailbox,
+            )
             if bindable:
                 self.input_bindings[input_id] = {
                     "type": handler_obj.get_name(),
@@ -388,6 +448,84 @@ class GameIO:
                     **handler_obj.get_defaults_dict(),
                 }
 
+    def set_watchdog_timeout(self, timeout):
+        """Set how long to wait for player messages before resetting inputs
+
+        Inputs of a seat are reset when no messages, including pings, have
+        been received from the seat's player for the timeout. Inputs
+        registered with their own watchdog_timeout are not affected.
+
+        :param timeout: Timeout in seconds, None disables the reset.
+            Defaults to 5 seconds.
+        :type timeout: int/float/None
+        """
+        self._message_router.router.set_watchdog_timeout(timeout)
+
+    def get_watchdog_stats(self):
+        """Returns how many times the inputs have been reset by the watchdog
+
+        :return: Counts with keys timeout_resets (player messages timed out)
+            and triggered_resets (player left or seat disabled)
+        :rtype: dict
+        """
+        return dict(self._message_router.router.watchdog_stats)
+
+    def get_local_socket_stats(self):
+        """Returns counters of the messages received from the local socket
+
+        :return: Counters with keys batches, messages, max_batch_size,
+            parse_failures and coalesced (superseded controls dropped)
+        :rtype: dict
+        """
+        return {
+            **self._socket_handler.local_socket_handler.stats,
+            "coalesced": self._message_router.coalesced_messages,
+        }
+
+    def set_latency_tracking(self, enabled):
+        """Enables or disables the input latency histograms
+
+        Can also be enabled with 'latency_tracking = true' in srtg.toml.
+        The histograms can be logged by sending SIGUSR2 to the controller
+        process, or read with get_latency_stats.
+
+        :param enabled: Whether to record the latencies
+        :type enabled: bool
+        """
+        self._message_router.router.latency.enabled = enabled
+        self._socket_handler.set_record_receive_times(enabled)
+
+    def get_latency_stats(self):
+        """Returns the input latency histograms
+
+        For each input and seat there are histograms of the stages queue
+        (message received -> input called), handle (input called -> input
+        finished) and total (message received -> input finished), in
+        milliseconds.
+
+        :return: {input id: {seat: {stage: histogram}}}, where histogram
+            has keys count, mean_ms, max_ms, p50_ms, p99_ms and buckets
+            ({bucket upper bound in ms: count})
+        :rtype: dict
+        """
+        return self._message_router.router.latency.get_stats()
+
+    def dump_latency_stats(self):
+        """Logs the input latency histograms"""
+        self._message_router.router.latency.dump()
+
+    def get_mailbox_stats(self):
+        """Returns how many commands the input mailboxes have dropped
+
+        A command is superseded when a newer command of the same input and
+        seat arrives before it is handled.
+
+        :return: {input id: {seat: superseded commands}} of the inputs
+            registered with mailbox=True
+        :rtype: dict
+        """
+        return self._message_router.router.get_mailbox_stats()
+
     def unregister_inputs(self, ids):
         """Unregisters inputs
 
@@ -444,8 +582,14 @@ class GameIO:
         If seat is not defined, resets all registered inputs,
         otherwise affects only the inputs with specified seat.
 
+        The inputs are reset concurrently, in the order of their
+        reset_order, see register_inputs.
+
         :param seat: seat number, defaults to None
         :type seat: Int, optional
+        :return: Which inputs were reset, timed out or failed, or None if
+            the seat was not found
+        :rtype: ResetReport/None
         """
         # get router and all registered seats
         router = self._message_router.router
@@ -456,12 +600,8 @@ class GameIO:
             return
         # reset all inputs in router for a specific seat,
         # or all seats if seat is not defined
-        for input_ in router.inputs.values():
-            if seat is not None:
-                await input_.dev.reset(seat)
-            else:
-                for current_seat in registered_seats:
-                    await input_.dev.reset(current_seat)
+        seats = [seat] if seat is not None else list(registered_seats)
+        return await reset_bindings(router.inputs, seats)
 
     async def shutdown_inputs(self, seat=None):
         """Shutdown registered inputs
@@ -469,8 +609,14 @@ class GameIO:
         If seat is not defined, shuts down all registered inputs,
         otherwise affects only the inputs with specified seat.
 
+        The inputs are shut down concurrently, in the order of their
+        reset_order, see register_inputs.
+
         :param seat: seat number, defaults to None
         :type seat: Int, optional
+        :return: Which inputs were shut down, timed out or failed, or None if
+            the seat was not found
+        :rtype: ResetReport/None
         """
         # get router and all registered seats
         router = self._message_router.router
@@ -481,12 +627,8 @@ class GameIO:
             return
         # shutdown all inputs in router for a specific seat,
         # or all seats if seat is not defined
-        for input_ in router.inputs.values():
-            if seat is not None:
-                await input_.dev.shutdown(seat)
-            else:
-                for current_seat in registered_seats:
-                    await input_.dev.shutdown(current_seat)
+        seats = [seat] if seat is not None else list(registered_seats)
+        return await reset_bindings(router.inputs, seats, shutdown=True)
 
     def send_lap(self, seat=0):
         """Send a lap update to the game engine when lap is finished
@@ -676,10 +818,74 @@ class GameIO:
             payload={"elementId": element_id, "playerOnly": player_only},
         )
 
+    def set_send_policy(self, event, policy):
+        """Set what to do with messages of the event that can't be sent
+
+        Messages to the game engine are sent from a bounded queue. By default
+        scores, laps, playingEnded and other game flow messages are kept when
+        the queue is full, and sent again after reconnecting to the game
+        engine. Newer progress and health state messages replace the queued
+        ones of the same seat, and the rest are dropped.
+
+        :param event: Game engine event name, for example "progress"
+        :type event: String
+        :param policy: Policy for the event
+        :type policy: SendPolicy
+        """
+        self._sender.set_policy(event, policy)
+
+    def get_send_stats(self):
+        """Returns the counters of the messages sent to the game engine
+
+        :return: Stats with keys queue_depth, replay_depth, sent, dropped,
+            overwritten, replayed, send_latency (average, in seconds) and
+            max_send_latency
+        :rtype: dict
+        """
+        return self._sender.get_stats()
+
     def set_custom_overlay(self, overlay_config):
         # TODO: documentation and type checking
         self._custom_overlay = overlay_config
 
+    def _on_socketio_connect(self):
+        # controllerReady makes the game engine send the config again, and
+        # the inputs and the custom overlay are sent in the reply to it
+        self._send_controller_ready()
+        self._sender.replay()
+        if self._socket_handler.socketio_namespace.state.stats["connects"] > 1:
+            for callback in self._reconnect_callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    logging.error("Reconnect callback failed", exc_info=e)
+
+    def add_reconnect_callback(self, callback):
+        """Adds a function called after reconnecting to the game engine
+
+        Use it to send again the state which the game engine may have
+        missed while disconnected, for example custom overlay texts. Scores
+        and game end messages are sent again automatically, see
+        set_send_policy.
+
+        :param callback: Function without arguments, called in the event
+            loop thread
+        :type callback: Function
+        """
+        self._reconnect_callbacks.append(callback)
+
+    def get_connection_stats(self):
+        """Returns game engine connection metrics
+
+        :return: Stats with keys connects, disconnects, time_to_detect,
+            max_time_to_detect, time_to_reconnect and max_time_to_reconnect.
+            time_to_detect is the time from the latest received message to
+            noticing the disconnect, and time_to_reconnect the time from the
+            disconnect to the next connect, in seconds.
+        :rtype: dict
+        """
+        return dict(self._socket_handler.socketio_namespace.state.stats)
+
     def _send_controller_ready(self):
         if len(self._custom_configs) > 0:
             configs = self._custom_configs
@@ -705,7 +911,23 @@ class GameIO:
             defaults to None
         :type payload: function/None, optional
         """
-        self._socket_handler.send_socketio_threadsafe(
+        self._sender.put(
+            event, seat=seat, src=src, payload=payload, callback=callback
+        )
+
+    def _on_coalesced_send_failed(self, msg, callback):
+        self._sender.send_failed(
+            msg["event"],
+            seat=msg["seat"],
+            src=msg["src"],
+            payload=msg["payload"],
+            callback=callback,
+        )
+
+    async def _send_socketio(
+        self, event, seat, src=None, payload={}, callback=None
+    ):
+        return await self._socket_handler.send_socketio(
             event,
             "gameEngine",
             seat,
@@ -0,0 +1,229 @@
+"""Game lifecycle phase timing and event loop lag monitoring"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+# Seconds between event loop lag samples
+LOOP_LAG_INTERVAL = 0.1
+# Loop lag in seconds which is reported as too slow
+LOOP_LAG_THRESHOLD = 0.1
+# Phase handler duration in seconds which is reported as too slow
+PHASE_DURATION_THRESHOLD = 5
+# Min seconds between admin logs of the same kind
+ADMIN_LOG_INTERVAL = 10
+# Number of slow callback stacks stored
+SLOW_CALLBACK_HISTORY = 10
+# Number of stack frames stored for a slow callback
+SLOW_CALLBACK_STACK_DEPTH = 8
+
+
+class PhaseTimer:
+    """Records the durations of the game phase handlers
+
+    For each phase (on_config, on_prepare, ...) both the duration of the
+    handler and the response time, from receiving the game engine message
+    to returning the response, are recorded in seconds.
+    """
+
+    def __init__(self):
+        self.stats = {}
+
+    def record(self, phase, duration, response_time, cancelled=False):
+        stats = self.stats.get(phase)
+        if stats is None:
+            stats = {
+                "count": 0,
+                "cancelled": 0,
+                "last_duration": None,
+                "max_duration": 0.0,
+                "total_duration": 0.0,
+                "last_response_time": None,
+                "max_response_time": 0.0,
+            }
+            self.stats[phase] = stats
+        stats["count"] += 1
+        if cancelled:
+            stats["cancelled"] += 1
+        stats["last_duration"] = duration
+        stats["max_duration"] = max(stats["max_duration"], duration)
+        stats["total_duration"] += duration
+        stats["last_response_time"] = response_time
+        stats["max_response_time"] = max(
+            stats["max_response_time"], response_time
+        )
+
+
+class LoopLagMonitor:
+    """Samples the event loop lag and detects slow callbacks
+
+    A task sleeps for the interval and measures how much later than
+    expected it wakes up. A watcher thread checks that the task keeps
+    waking up, and if the loop has been blocked for longer than the
+    threshold, stores the stack of the blocking code. Unlike asyncio debug
+    mode, the callbacks are not timed one by one, so the overhead does not
+    depend on the number of callbacks.
+
+    :param interval: Seconds between samples, defaults to LOOP_LAG_INTERVAL
+    :type interval: float, optional
+    :param threshold: Lag in seconds reported with on_lag, defaults to
+        LOOP_LAG_THRESHOLD
+    :type threshold: float, optional
+    :param on_lag: Function called with the lag and the
+        traceback.StackSummary of the blocking code (None if not captured)
+        in the event loop after a lag over the threshold, defaults to None
+    :type on_lag: Function/None, optional
+    """
+
+    def __init__(
+        self,
+        interval=LOOP_LAG_INTERVAL,
+        threshold=LOOP_LAG_THRESHOLD,
+        on_lag=None,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.on_lag = on_lag
+        self.slow_callbacks = deque(maxlen=SLOW_CALLBACK_HISTORY)
+        self.stats = {
+            "samples": 0,
+            "last_lag": None,
+            "max_lag": 0.0,
+            "total_lag": 0.0,
+            "slow": 0,
+        }
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._heartbeat = None
+        self._stack = None
+
+    def start(self):
+        """Start monitoring the running event loop"""
+        loop = asyncio.get_running_loop()
+        self._heartbeat = time.monotonic()
+        self._task = loop.create_task(self._sample())
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._watch,
+            args=(threading.get_ident(),),
+            name="LoopLagMonitor",
+            daemon=True,
+        )
+        self._thread.start()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._thread.join()
+        self._thread = None
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._heartbeat = time.monotonic()
+            stats = self.stats
+            stats["samples"] += 1
+            stats["last_lag"] = lag
+            stats["total_lag"] += lag
+            if lag > stats["max_lag"]:
+                stats["max_lag"] = lag
+            if lag >= self.threshold:
+                stats["slow"] += 1
+                stack, self._stack = self._stack, None
+                if stack is not None:
+                    self.slow_callbacks.append(
+                        {
+                            "lag": lag,
+                            "time": time.time(),
+                            "stack": "".join(stack.format()),
+                        }
+                    )
+                if self.on_lag is not None:
+                    self.on_lag(lag, stack)
+
+    def _watch(self, loop_thread_id):
+        while not self._stop.wait(self.interval):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked >= self.threshold and self._stack is None:
+                # capture what the loop thread is doing right now
+                frame = sys._current_frames().get(loop_thread_id)
+                if frame is not None:
+                    self._stack = traceback.extract_stack(
+                        frame, limit=SLOW_CALLBACK_STACK_DEPTH
+                    )
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        total_lag = stats.pop("total_lag")
+        stats["mean_lag"] = (
+            total_lag / stats["samples"] if stats["samples"] > 0 else None
+        )
+        stats["slow_callbacks"] = list(self.slow_callbacks)
+        return stats
+
+
+def format_loop_lag(lag, stack):
+    """Returns a warning message of an event loop lag
+
+    :param lag: Lag in seconds
+    :type lag: float
+    :param stack: Stack of the blocking code, or None if not captured
+    :type stack: traceback.StackSummary/None
+    :return: Message with the location of the innermost frame
+    :rtype: str
+    """
+    message = f"Event loop was blocked for {lag * 1000:.0f} ms"
+    if stack:
+        # the innermost frame is the blocking code
+        frame = stack[-1]
+        message += (
+            f', in:\nFile "{frame.filename}", line {frame.lineno}, '
+            f"in {frame.name}"
+        )
+        if frame.line:
+            message += f"\n{frame.line}"
+    return message
+
+
+class AdminLogLimiter:
+    """Forwards messages to a log function at most once per interval
+
+    :param log: Function called with the message
+    :type log: Function
+    :param interval: Min seconds between messages of the same kind,
+        defaults to ADMIN_LOG_INTERVAL
+    :type interval: float, optional
+    """
+
+    def __init__(self, log, interval=ADMIN_LOG_INTERVAL):
+        self.log = log
+        self.interval = interval
+        self._last_logged = {}
+        self.suppressed = 0
+
+    def __call__(self, kind, message):
+        now = time.monotonic()
+        last = self._last_logged.get(kind)
+        if last is not None and now - last < self.interval:
+            self.suppressed += 1
+            return
+        self._last_logged[kind] = now
+        try:
+            self.log(message)
+        except Exception as e:
+            logging.warning(f"Could not forward '{message}': {e}")
@@ -1,5 +1,5 @@
 from .aruco_filter import ArucoFilter
 from .aruco_finder import ArucoFinder
-from .aruco_marker import ArucoMarker
+from .aruco_marker import ArucoMarker, MarkerBatch
 from .aruco_source import ArucoDetector
 from .virtual_grid import ArucoGrid, point_in_rect
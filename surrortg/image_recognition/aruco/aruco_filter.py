@@ -1,6 +1,10 @@
 import logging
 import time
 
+import numpy as np
+
+from .aruco_marker import MarkerBatch
+
 
 class ArucoFilter:
     """Helper class for filtering detected Aruco markers.
@@ -128,10 +132,23 @@ class ArucoFilter:
         self.det_cd = cooldown
 
     def _detect_cb(self, found_markers):
+        if isinstance(found_markers, MarkerBatch):
+            # drop most markers with the built-in filters for the whole
+            # batch at once, before calling the filters per marker
+            indices = np.flatnonzero(self._batch_mask(found_markers))
+            found_markers = [found_markers[i] for i in indices]
         for marker in found_markers:
             if self._passes_filters(marker):
                 self.callback(marker)
 
+    def _batch_mask(self, batch):
+        mask = np.ones(len(batch), dtype=bool)
+        if len(self.ids) != 0 and self._filter_by_id in self.filters:
+            mask &= np.isin(batch.ids, list(self.ids))
+        if self.min_dist != 0 and self._filter_by_distance in self.filters:
+            mask &= batch.get_distances() > self.min_dist
+        return mask
+
     def _filter_by_id(self, marker):
         return len(self.ids) == 0 or marker.id in self.ids
 
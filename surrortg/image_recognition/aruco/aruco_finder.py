@@ -3,7 +3,7 @@ import logging
 from surrortg.game_io import ConfigType
 
 from .aruco_filter import ArucoFilter
-from .aruco_source import ArucoDetector
+from .aruco_source import DEFAULT_DETECTION_RATE, ArucoDetector
 
 DEFAULT_CAMERA = "/dev/video21"
 
@@ -27,6 +27,7 @@ class ArucoFinder:
         num_laps=1,
         bot_specific=False,
         seat=0,
+        detection_rate=DEFAULT_DETECTION_RATE,
     ):
         """Class for creating treasure hunt and racing games with aruco markers
 
@@ -80,6 +81,10 @@ class ArucoFinder:
         :type bot_specific: bool, optional
         :param seat: Seat number of the bot. Defaults to 0.
         :type seat: int, optional
+        :param detection_rate: Target aruco detection rate in Hz, None
+            detects as fast as frames arrive. Fast racing games may need a
+            higher rate to not miss markers. Defaults to 10.
+        :type detection_rate: float/None, optional
         """
         self = cls()
         self.io = io
@@ -111,7 +116,9 @@ class ArucoFinder:
         self.io.register_config(
             IN_ORDER_KEY, ConfigType.BOOLEAN, in_order, bot_specific
         )
-        self.aruco_source = await ArucoDetector.create(source)
+        self.aruco_source = await ArucoDetector.create(
+            source, detection_rate=detection_rate
+        )
         self.filter = ArucoFilter(
             self._score_logic,
             self.aruco_source,
@@ -1,4 +1,4 @@
-from math import sqrt
+import numpy as np
 
 
 class ArucoMarker:
@@ -20,6 +20,18 @@ class ArucoMarker:
         self.id = id
         self.corners = corners
         self.resolution = resolution
+        # set for markers which are views into a MarkerBatch
+        self._batch = None
+        self._index = None
+
+    @classmethod
+    def _from_batch(cls, batch, index):
+        self = cls(
+            int(batch.ids[index]), batch.corners[index], batch.resolution
+        )
+        self._batch = batch
+        self._index = index
+        return self
 
     def __str__(self):
         return (
@@ -42,16 +54,12 @@ class ArucoMarker:
         :return: value between 0 and 1, representing relative size of marker
         :rtype: float
         """
-        edge_lengths = [
-            sqrt(
-                (self.corners[i][0] - self.corners[i - 1][0]) ** 2
-                + (self.corners[i][1] - self.corners[i - 1][1]) ** 2
-            )
-            for i in range(len(self.corners))
-        ]
-        distance = (max(edge_lengths) ** 2) / (
-            self.resolution[0] * self.resolution[1]
+        if self._batch is not None:
+            return float(self._batch.get_distances()[self._index])
+        max_edge_lengths = _max_edge_lengths(
+            np.asarray(self.corners)[np.newaxis]
         )
+        distance = float(_distances(max_edge_lengths, self.resolution)[0])
         return distance
 
     def get_real_distance(
@@ -76,20 +84,23 @@ class ArucoMarker:
         :return: distance to marker in millimeters
         :rtype: float
         """
-        edge_lengths = [
-            sqrt(
-                (self.corners[i][0] - self.corners[i - 1][0]) ** 2
-                + (self.corners[i][1] - self.corners[i - 1][1]) ** 2
+        if self._batch is not None:
+            max_edge_lengths = self._batch._get_max_edge_lengths()[
+                self._index : self._index + 1
+            ]
+        else:
+            max_edge_lengths = _max_edge_lengths(
+                np.asarray(self.corners)[np.newaxis]
             )
-            for i in range(len(self.corners))
-        ]
-
-        distance = (
-            (crop_factor * focal_length * marker_size * self.resolution[1])
-            / (max(edge_lengths) * sensor_height)
-            / 1000
+        distance = _real_distances(
+            max_edge_lengths,
+            self.resolution,
+            marker_size,
+            sensor_height,
+            focal_length,
+            crop_factor,
         )
-        return distance
+        return float(distance[0])
 
     def get_location(self):
         """Calculates location of marker center in pixel coordinates
@@ -97,5 +108,152 @@ class ArucoMarker:
         :return: center of marker in pixel coordinates
         :rtype: array of two floats
         """
-        location = tuple(sum((corner / 4 for corner in self.corners)))
+        if self._batch is not None:
+            return tuple(self._batch.get_locations()[self._index].tolist())
+        location = tuple(np.asarray(self.corners).mean(axis=0).tolist())
         return location
+
+
+class MarkerBatch:
+    """All aruco markers detected from one video frame
+
+    ArucoDetector observers receive the markers as a MarkerBatch. The batch
+    stores the corners of all the markers in a single (N, 4, 2) float32
+    array and the ids in an (N,) array, which keeps sending the markers
+    from the detection process cheap, and calculates the distances and
+    locations of all the markers at once.
+
+    The batch is also a sequence of ArucoMarkers: iterating or indexing it
+    returns lazily created ArucoMarker views to the batch, so code written
+    for lists of ArucoMarkers keeps working.
+
+    :param ids: Aruco marker IDs
+    :type ids: array of ints
+    :param corners: pixel coordinates for the four corners of each marker
+    :type corners: array of shape (N, 4, 2)
+    :param resolution: Resolution of the video frame in which the markers
+        were detected
+    :type resolution: tuple of two floats
+    """
+
+    def __init__(self, ids, corners, resolution):
+        self.ids = np.asarray(ids, dtype=np.int32).reshape(-1)
+        self.corners = np.asarray(corners, dtype=np.float32).reshape(-1, 4, 2)
+        assert len(self.ids) == len(
+            self.corners
+        ), "ids and corners must have the same length"
+        self.resolution = resolution
+        self._init_cache()
+
+    def _init_cache(self):
+        self._markers = [None] * len(self.ids)
+        self._max_edge_lengths = None
+        self._distances = None
+        self._locations = None
+
+    def __getstate__(self):
+        # the cached values are cheaper to recalculate than to pickle
+        return (self.ids, self.corners, self.resolution)
+
+    def __setstate__(self, state):
+        self.ids, self.corners, self.resolution = state
+        self._init_cache()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("MarkerBatch index out of range")
+        marker = self._markers[index]
+        if marker is None:
+            marker = ArucoMarker._from_batch(self, index)
+            self._markers[index] = marker
+        return marker
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __str__(self):
+        return f"MarkerBatch with ids: {self.ids.tolist()}"
+
+    def get_distances(self):
+        """Calculates "distance" to all the markers
+
+        See ArucoMarker.get_distance().
+
+        :return: values between 0 and 1, representing relative sizes of the
+            markers
+        :rtype: array of N floats
+        """
+        if self._distances is None:
+            self._distances = _distances(
+                self._get_max_edge_lengths(), self.resolution
+            )
+        return self._distances
+
+    def get_real_distances(
+        self, marker_size, sensor_height, focal_length, crop_factor=0.75
+    ):
+        """Calculates physical distance to all the markers
+
+        See ArucoMarker.get_real_distance() for the parameters.
+
+        :return: distances to the markers in millimeters
+        :rtype: array of N floats
+        """
+        return _real_distances(
+            self._get_max_edge_lengths(),
+            self.resolution,
+            marker_size,
+            sensor_height,
+            focal_length,
+            crop_factor,
+        )
+
+    def get_locations(self):
+        """Calculates locations of the marker centers in pixel coordinates
+
+        :return: centers of the markers in pixel coordinates
+        :rtype: array of shape (N, 2)
+        """
+        if self._locations is None:
+            self._locations = self.corners.mean(axis=1)
+        return self._locations
+
+    def _get_max_edge_lengths(self):
+        if self._max_edge_lengths is None:
+            self._max_edge_lengths = _max_edge_lengths(self.corners)
+        return self._max_edge_lengths
+
+
+def _max_edge_lengths(corners):
+    """Longest edge of each marker in corners of shape (N, 4, 2)"""
+    edges = corners - np.roll(corners, 1, axis=1)
+    return np.sqrt((edges ** 2).sum(axis=2)).max(axis=1)
+
+
+def _distances(max_edge_lengths, resolution):
+    return max_edge_lengths.astype(np.float64) ** 2 / (
+        resolution[0] * resolution[1]
+    )
+
+
+def _real_distances(
+    max_edge_lengths,
+    resolution,
+    marker_size,
+    sensor_height,
+    focal_length,
+    crop_factor,
+):
+    return (
+        (crop_factor * focal_length * marker_size * resolution[1])
+        / (max_edge_lengths.astype(np.float64) * sensor_height)
+        / 1000
+    )
@@ -1,16 +1,21 @@
 import asyncio
-import concurrent.futures
 import logging
 import multiprocessing
 import time
+from dataclasses import dataclass
 from enum import Enum, auto
 
 import cv2
+import numpy as np
 
-from .aruco_marker import ArucoMarker
+from ..async_video_capture import wait_readable
+from .aruco_marker import MarkerBatch
 
 MAX_READ_FAILURES_PER_INIT = 3
 LOOPBACK_DEV_PATH = "/dev/video21"
+DEFAULT_DETECTION_RATE = 10
+# Smoothing factor for the exponential moving averages in detection stats
+STATS_SMOOTHING = 0.1
 
 
 class CapComm(Enum):
@@ -24,6 +29,20 @@ class CapComm(Enum):
     RELEASED = auto()
 
 
+@dataclass
+class DetectionResult:
+    """Response of ArucoDetectionProcess to CapComm.ARUCO_REQUEST
+
+    :param markers: Detected markers
+    :param read_time: Time spent reading the frame, in seconds
+    :param detect_time: Time spent detecting the markers, in seconds
+    """
+
+    markers: MarkerBatch
+    read_time: float
+    detect_time: float
+
+
 class ArucoDetectionProcess:
     """Separated cv2.VideoCapture process class with aruco marker detection
 
@@ -60,8 +79,7 @@ class ArucoDetectionProcess:
 
             # respond to the request
             if req == CapComm.ARUCO_REQUEST:
-                frame = self._read()
-                self._conn.send(frame)
+                self._conn.send(self._read())
             if req == CapComm.CROP_REQUEST:
                 self.crop_params = self._conn.recv()
                 self.patch_size = (
@@ -105,12 +123,19 @@ class ArucoDetectionProcess:
 
     def _read(self):
         # TODO: handle same ID appearing multiple times
-        success = False
-        markers = []
-
+        start = time.monotonic()
         success, frame = self._cap.read()
+        read_time = time.monotonic() - start
         if not success or len(frame) == 0:
-            return markers
+            return DetectionResult(
+                MarkerBatch([], [], self.resolution), read_time, 0.0
+            )
+        markers = self._detect(frame)
+        return DetectionResult(
+            markers, read_time, time.monotonic() - start - read_time
+        )
+
+    def _detect(self, frame):
         if self._vertical_flip and self._horizontal_flip:
             frame = cv2.flip(frame, -1)
         elif self._vertical_flip:
@@ -123,25 +148,269 @@ class ArucoDetectionProcess:
             frame, self.arucoDict, parameters=self.arucoParams
         )
         if len(corners) == 0:
-            return markers
+            return MarkerBatch([], [], self.resolution)
+        return MarkerBatch(ids, np.concatenate(corners), self.resolution)
+
+
+class ArucoDetectionWorker:
+    """Runs the ArucoDetectionProcess shared by ArucoDetector handles
+
+    Not to be used directly, ArucoDetector.create() creates one worker per
+    camera and settings, and fans the detected markers out to the observers
+    of all of its handles.
+    """
+
+    def __init__(
+        self,
+        source,
+        init_timeout,
+        read_timeout,
+        release_timeout,
+        process_class,
+        api_preference,
+        vertical_flip,
+        horizontal_flip,
+    ):
+        self._source = source
+        self._init_timeout = init_timeout
+        self._read_timeout = read_timeout
+        self._release_timeout = release_timeout
+        self._process_class = process_class
+        self._api_preference = api_preference
+        self._vertical_flip = vertical_flip
+        self._horizontal_flip = horizontal_flip
+        self._released = False
+        self.handles = []
+        self._detection_task = None
+        self._detection_interval = 0
+        self._last_response_time = None
+        # an ARUCO_REQUEST has been sent and not answered yet
+        self._request_pending = False
+        self._stats = {
+            "rate": None,
+            "read_time": None,
+            "detect_time": None,
+            "round_trip_time": None,
+            "callback_time": None,
+        }
+
+    async def start(self):
+        # initialize and start video_capture_process
+        await self._start_process()
 
-        ids = ids.flatten()
-        markers = [
-            ArucoMarker(ids[i], corners[i][0], self.resolution)
-            for i in range(len(ids))
-        ]
-        return markers
+    def has_observers(self):
+        return any(len(handle.callbacks) for handle in self.handles)
+
+    def update_detection_rate(self):
+        """Use the highest detection rate requested by the handles"""
+        rates = [handle.detection_rate for handle in self.handles]
+        if len(rates) == 0 or None in rates:
+            self._detection_interval = 0
+        else:
+            self._detection_interval = 1 / max(rates)
+
+    def get_detection_stats(self):
+        return dict(self._stats)
+
+    def set_crop(self, crop_params):
+        if self.has_observers():
+            logging.error("Unable to set aruco cropping while reading frames")
+            return
+        self._conn_main.send(CapComm.CROP_REQUEST)
+        self._conn_main.send(crop_params)
+
+    def _detect_cb(self, found_markers):
+        # observers may unregister themselves in the callback
+        for handle in list(self.handles):
+            handle._detect_cb(found_markers)
+
+    async def _start_process(self):
+        self._conn_main, self._conn_process = multiprocessing.Pipe()
+        self._request_pending = False
+        cap_process = self._process_class(
+            self._source,
+            self._conn_process,
+            self._api_preference,
+            self._vertical_flip,
+            self._horizontal_flip,
+        )
+        self._cap_process = multiprocessing.Process(
+            target=cap_process.run,
+            daemon=True,
+            name=f"SRTG Controller aruco detection {self._source}",
+        )
+        self._cap_process.start()
+        await self._verify_process_start()
+
+    async def _verify_process_start(self):
+        response = await self._get_response(self._init_timeout)
+        if response is CapComm.INIT_SUCCESS:
+            logging.info(f"Camera '{self._source}' opened successfully")
+        elif response is CapComm.INIT_FAILURE:
+            raise RuntimeError(
+                f"Could not open camera '{self._source}' after initialization"
+            )
+        else:  # None
+            raise RuntimeError(
+                f"Camera '{self._source}' initialization took more than "
+                f"init_timeout ({self._init_timeout}) seconds"
+            )
+
+    async def _restart_process(self):
+        await self._release()
+        await self._start_process()
+
+    async def _get_response(self, timeout):
+        """Gets response in timeout seconds or returns None"""
+        if self._conn_main.poll() or await wait_readable(
+            self._conn_main, timeout
+        ):
+            return self._conn_main.recv()
+        else:
+            return None
+
+    def _start_detection(self):
+        # A finishing task notices the new observers by itself
+        if not self._released and (
+            self._detection_task is None or self._detection_task.done()
+        ):
+            self._detection_task = asyncio.create_task(self._read())
+
+    async def _read(self):
+        """Keeps requesting aruco markers while there are observers"""
+        # keep exactly one request in flight, so the responses can not
+        # pile up in the pipe. A request left unanswered by a stopped
+        # detection is still in flight.
+        request_time = time.monotonic()
+        if not self._request_pending:
+            self._send_request()
+        while True:
+            response = await self._get_response(self._read_timeout)
+            if response is None:
+                logging.warning(
+                    f"No aruco markers returned in {self._read_timeout} "
+                    "seconds"
+                )
+                if self._released or not self.has_observers():
+                    logging.info("No aruco observers, stopping detection")
+                    self._last_response_time = None
+                    return
+                continue
+            self._request_pending = False
+            response_time = time.monotonic()
+            if isinstance(response, DetectionResult):
+                markers = response.markers
+                self._update_stats("read_time", response.read_time)
+                self._update_stats("detect_time", response.detect_time)
+            else:
+                markers = response
+            self._update_stats("round_trip_time", response_time - request_time)
+            if self._last_response_time is not None:
+                self._update_stats(
+                    "rate", 1 / (response_time - self._last_response_time)
+                )
+            self._last_response_time = response_time
+
+            if self._released or not self.has_observers():
+                logging.info("No aruco observers, stopping detection")
+                self._last_response_time = None
+                return
+
+            # request the next detection before calling the observers if
+            # the target rate allows, otherwise after them
+            next_request_time = request_time + self._detection_interval
+            requested = next_request_time <= response_time
+            if requested:
+                request_time = response_time
+                self._send_request()
+
+            if markers is not None and len(markers):
+                self._detect_cb(markers)
+                self._update_stats(
+                    "callback_time", time.monotonic() - response_time
+                )
+
+            if not requested:
+                await asyncio.sleep(next_request_time - time.monotonic())
+                if self._released or not self.has_observers():
+                    logging.info("No aruco observers, stopping detection")
+                    self._last_response_time = None
+                    return
+                request_time = time.monotonic()
+                self._send_request()
+
+    def _send_request(self):
+        self._request_pending = True
+        self._conn_main.send(CapComm.ARUCO_REQUEST)
+
+    def _update_stats(self, key, value):
+        old = self._stats[key]
+        if old is None:
+            self._stats[key] = value
+        else:
+            self._stats[key] = old + STATS_SMOOTHING * (value - old)
+
+    async def release(self):
+        self._released = True
+        if self._detection_task is not None:
+            self._detection_task.cancel()
+            try:
+                await self._detection_task
+            except asyncio.CancelledError:
+                pass
+        await self._release()
+
+    async def _release(self):
+        # send release request
+        self._conn_main.send(CapComm.RELEASE_REQUEST)
+        # wait for the response, skipping responses to old
+        # CapComm.ARUCO_REQUESTs
+        deadline = time.monotonic() + self._release_timeout
+        response = None
+        while response != CapComm.RELEASED:
+            response = await self._get_response(
+                max(0, deadline - time.monotonic())
+            )
+            if response is None:
+                break
+
+        if response == CapComm.RELEASED:
+            logging.info(f"Camera '{self._source}' released")
+            self._cap_process.join()  # should join immediately
+        else:  # None
+            logging.warning(
+                f"VideoCapture did not release in {self._release_timeout} "
+                "seconds, must be killed"
+            )
+            self._cap_process.kill()
+            # sentinel becomes readable when the process has ended
+            await wait_readable(self._cap_process.sentinel)
+            self._cap_process.join()
 
 
 class ArucoDetector:
     """Non-blocking aruco detector
 
-    Only one ArucoDetector instance can exist per camera. If aruco markers are
-    used in more than one location, subscribe the users to the same
-    ArucoDetector instance. Use factory method
+    ArucoDetector instances are handles to a detection worker, which is
+    shared by all the handles created with the same source and settings.
+    The worker reads the camera in its own process, so several cameras can
+    be used at the same time, and each camera is opened only once no matter
+    how many ArucoFinders, ArucoGrids and custom filters use it. The worker
+    is released when the last handle is released. Use factory method
     'await ArucoDetector.create(source, ...)' instead of __init__.
+
+    Detection runs only while there are registered observers. It starts when
+    the first observer registers and stops when the last one unregisters.
+    The next detection is requested before the observers are called, so the
+    detection process works on the next frame while the observers handle the
+    previous markers.
     """
 
+    # workers shared by the handles, keyed by source and settings
+    _workers = {}
+    # key -> release task of a worker whose last handle was released
+    _releases = {}
+
     @classmethod
     async def create(
         cls,
@@ -153,9 +422,16 @@ class ArucoDetector:
         api_preference=cv2.CAP_V4L2,  # noqa: N803
         vertical_flip=False,
         horizontal_flip=False,
+        detection_rate=DEFAULT_DETECTION_RATE,
     ):
         """Factory method for ArucoDetector, use this instead of __init__
 
+        Returns a new handle to the existing worker if one has already been
+        created with the same source, process_class, api_preference and
+        flips. In that case the timeouts of the first handle are used. If
+        a worker of the source is still being released, waits for it to
+        release the camera first.
+
         :param source: Camera id or path. Defaults to streamer main camera
             loopback device on Surrogate image ("/dev/video21").
         :type source: String/Int
@@ -181,26 +457,64 @@ class ArucoDetector:
         :param horizontal_flip: Flip frames horizontally before aruco
             detection. Defaults to False
         :type horizontal_flip: boolean, optional
+        :param detection_rate: Target detection rate in Hz. None detects as
+            fast as frames arrive. Defaults to 10
+        :type detection_rate: float/None, optional
         """
-        self = cls()
+        key = (
+            source,
+            process_class,
+            api_preference,
+            vertical_flip,
+            horizontal_flip,
+        )
+        worker = ArucoDetector._workers.get(key)
+        while worker is None:
+            # the camera can be opened again only after it has been released
+            releases = [
+                release
+                for other, release in ArucoDetector._releases.items()
+                if other[0] == source and not release.done()
+            ]
+            if len(releases) == 0:
+                break
+            await asyncio.shield(
+                asyncio.gather(*releases, return_exceptions=True)
+            )
+            worker = ArucoDetector._workers.get(key)
+        if worker is None:
+            if any(source == other[0] for other in ArucoDetector._workers):
+                logging.warning(
+                    f"Camera '{source}' is already used by an ArucoDetector "
+                    "with different settings, opening it again"
+                )
+            worker = ArucoDetectionWorker(
+                source,
+                init_timeout,
+                read_timeout,
+                release_timeout,
+                process_class,
+                api_preference,
+                vertical_flip,
+                horizontal_flip,
+            )
+            worker.started = asyncio.ensure_future(worker.start())
+            ArucoDetector._workers[key] = worker
+        try:
+            await asyncio.shield(worker.started)
+        except Exception:
+            if ArucoDetector._workers.get(key) is worker:
+                del ArucoDetector._workers[key]
+            raise
 
-        # save the correct state
-        self._source = source
-        self._init_timeout = init_timeout
-        self._read_timeout = read_timeout
-        self._release_timeout = release_timeout
-        self._process_class = process_class
-        self._api_preference = api_preference
-        self._vertical_flip = vertical_flip
-        self._horizontal_flip = horizontal_flip
+        self = cls()
+        self._key = key
+        self._worker = worker
         self._released = False
-        self._start_time = None
         self.callbacks = []
-
-        # initialize and start video_capture_process
-        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
-        self._loop = asyncio.get_event_loop()
-        await self._start_process()
+        self.detection_rate = None
+        worker.handles.append(self)
+        self.set_detection_rate(detection_rate)
 
         return self
 
@@ -212,6 +526,7 @@ class ArucoDetector:
         """
         logging.info("aruco detect registering observer")
         self.callbacks.append(callback)
+        self._worker._start_detection()
 
     def unregister_observer(self, callback):
         """Unregister from receiving aruco markers
@@ -229,89 +544,52 @@ class ArucoDetector:
         """Unregister all callbacks from receiving aruco markers"""
         self.callbacks = []
 
+    def set_detection_rate(self, detection_rate):
+        """Set the target detection rate
+
+        The worker detects at the highest rate set by any of its handles.
+
+        :param detection_rate: Target detection rate in Hz. None detects as
+            fast as frames arrive.
+        :type detection_rate: float/None
+        """
+        assert (
+            detection_rate is None or detection_rate > 0
+        ), "detection_rate must be positive or None"
+        self.detection_rate = detection_rate
+        self._worker.update_detection_rate()
+
+    def get_detection_stats(self):
+        """Returns the achieved detection rate and per-stage timings
+
+        All values are exponential moving averages, and None until the first
+        measurement. Timings are in seconds:
+        read_time and detect_time are measured in the detection process,
+        round_trip_time from the request to the response and callback_time
+        for calling all the observers.
+
+        :return: Stats with keys rate (Hz), read_time, detect_time,
+            round_trip_time and callback_time
+        :rtype: dict
+        """
+        return self._worker.get_detection_stats()
+
     def set_crop(self, crop_params):
         """Set cropping for frames used for aruco detection. Useful for
-            increasing performance.
+            increasing performance. Affects all handles of the same worker.
 
         :param crop_params: Tuple of pixel coordinates:
             (max_x, min_x, max_y, min_y), representing the area of the frame
             left after cropping.
         :type crop_params: Tuple of four floats
         """
-        if len(self.callbacks) != 0:
-            logging.error("Unable to set aruco cropping while reading frames")
-            return
-        self._conn_main.send(CapComm.CROP_REQUEST)
-        self._conn_main.send(crop_params)
+        self._worker.set_crop(crop_params)
 
     def _detect_cb(self, found_markers):
-        for callback in self.callbacks:
+        # observers may unregister themselves in the callback
+        for callback in list(self.callbacks):
             callback(found_markers)
 
-    async def _start_process(self):
-        self._conn_main, self._conn_process = multiprocessing.Pipe()
-        cap_process = self._process_class(
-            self._source,
-            self._conn_process,
-            self._api_preference,
-            self._vertical_flip,
-            self._horizontal_flip,
-        )
-        self._cap_process = multiprocessing.Process(
-            target=cap_process.run,
-            daemon=True,
-            name="SRTG Controller video capture",
-        )
-        self._cap_process.start()
-        await self._verify_process_start()
-        self._image_rec_task = asyncio.create_task(self._read())
-
-    async def _verify_process_start(self):
-        response = await self._get_response(self._init_timeout)
-        if response is CapComm.INIT_SUCCESS:
-            logging.info(f"Camera '{self._source}' opened successfully")
-        elif response is CapComm.INIT_FAILURE:
-            raise RuntimeError(
-                f"Could not open camera '{self._source}' after initialization"
-            )
-        else:  # None
-            raise RuntimeError(
-                f"Camera '{self._source}' initialization took more than "
-                f"init_timeout ({self._init_timeout}) seconds"
-            )
-
-    async def _restart_process(self):
-        await self._release()
-        await self._start_process()
-
-    async def _get_response(self, timeout):
-        """Gets response in timeout seconds or returns None"""
-        if await self._loop.run_in_executor(
-            self._executor, self._conn_main.poll, timeout
-        ):
-            return self._conn_main.recv()
-        else:
-            return None
-
-    async def _read(self):
-        """Keeps requesting aruco markers until released"""
-        while not self._released:
-            if self._released:
-                logging.info(
-                    "ArucoDetector has been released, stopping detection"
-                )
-                break
-            # TODO: This isn't efficient. Fix the system to safely create and
-            #       cancel this task as needed.
-            if len(self.callbacks) > 0:
-                # send aruco request
-                self._conn_main.send(CapComm.ARUCO_REQUEST)
-                # get response
-                markers = await self._get_response(self._read_timeout)
-                if markers is not None and len(markers):
-                    self._detect_cb(markers)
-            await asyncio.sleep(0.1)
-
     async def __aenter__(self):
         return self.frames()
 
@@ -319,46 +597,21 @@ class ArucoDetector:
         await self.release()
 
     async def release(self):
-        """Release resources"""
-        await self._release()
+        """Release the handle, and the worker if this was the last handle"""
+        if self._released:
+            return
         self._released = True
-
-        # release the executor
-        self._executor.shutdown()
-
-    async def _release(self):
-        # send release request
-        self._conn_main.send(CapComm.RELEASE_REQUEST)
-        # wait for the response, measure the time it took
-        start = time.time()
-        response = await self._get_response(self._release_timeout)
-        end = time.time()
-        response_time = end - start
-        logging.info(response)
-
-        # check if actually responded to old
-        # CapComm.ARUCO_REQUEST
-        if (
-            isinstance(response, list)
-            and isinstance(response[0], ArucoMarker)
-            and response_time > self.release_timeout
-        ):
-            # if was aruco marker, and still _release_time left,
-            # wait a bit more for CapComm.RELEASED
-            logging.info("got resp to old frame")
-            response = await self._get_response(
-                response_time - self._release_timeout
-            )
-
-        if response == CapComm.RELEASED:
-            logging.info(f"Camera '{self._source}' released")
-            self._cap_process.join()  # should join immediately
-        else:  # None
-            logging.warning(
-                f"VideoCapture did not release in {self._release_timeout} "
-                "seconds, must be killed"
-            )
-            self._cap_process.kill()
-            await self._loop.run_in_executor(
-                self._executor, self._cap_process.join
-            )
+        self.callbacks = []
+        self._worker.handles.remove(self)
+        if len(self._worker.handles) > 0:
+            self._worker.update_detection_rate()
+            return
+        if ArucoDetector._workers.get(self._key) is self._worker:
+            del ArucoDetector._workers[self._key]
+        release = asyncio.ensure_future(self._worker.release())
+        ArucoDetector._releases[self._key] = release
+        try:
+            await release
+        finally:
+            if ArucoDetector._releases.get(self._key) is release:
+                del ArucoDetector._releases[self._key]
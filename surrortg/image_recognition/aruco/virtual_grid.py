@@ -57,6 +57,37 @@ def point_estimate(point, corners):
     return tot_area_w_point - area_of_rect
 
 
+def point_estimates(points, corners):
+    """Vectorized point_estimate for N points and N quadrilaterals
+
+    :param points: points in pixel coordinates
+    :type points: array of shape (N, 2)
+    :param corners: corners of the quadrilaterals
+    :type corners: array of shape (N, 4, 2)
+
+    :return: point_estimate of each point against its quadrilateral
+    :rtype: array of N floats
+    """
+    a = corners
+    c = np.roll(corners, 1, axis=-2)
+    b = points[..., np.newaxis, :]
+    areas = (
+        np.abs(
+            a[..., 0] * (b[..., 1] - c[..., 1])
+            + b[..., 0] * (c[..., 1] - a[..., 1])
+            + c[..., 0] * (a[..., 1] - b[..., 1])
+        )
+        / 2
+    )
+    a, b, c = corners[..., 1, :], corners[..., 2, :], corners[..., 3, :]
+    area_of_rect = np.abs(
+        a[..., 0] * (b[..., 1] - c[..., 1])
+        + b[..., 0] * (c[..., 1] - a[..., 1])
+        + c[..., 0] * (a[..., 1] - b[..., 1])
+    )
+    return areas.sum(axis=-1) - area_of_rect
+
+
 class ArucoGrid:
     """Creates virtual grid of squares based on four aruco markers
 
@@ -326,16 +357,50 @@ class ArucoGrid:
             is not inside any of the squares.
         :rtype: int
         """
-        indices = {}
-        for sq in range(self.area_dim ** 2):
-            comparison = (
-                point_estimate(point, self.squares[sq]) - self.loc_slack
+        return int(self.get_sq_idx_many([point])[0])
+
+    def get_sq_idx_many(self, points):
+        """Gets the square indices for many points at once.
+
+        Points inside the grid are mapped straight to their squares with the
+        inverse of the grid transform. Points outside the grid are compared
+        only against the closest edge square, using the detection accuracy
+        like get_sq_idx() and point_in_sq().
+
+        :param points: points in the game area in pixel coordinates
+        :type points: list of tuples of two floats, or array of shape (N, 2)
+
+        :return: index of the square each point is in, -1 for points not
+            inside any of the squares
+        :rtype: numpy array of ints
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if self._inv_grid_transform is None:
+            return self._get_sq_idx_many_brute_force(points)
+
+        # grid coordinates: column (x) and row (y) as floats
+        grid_coords = (points - self.origin) @ self._inv_grid_transform.T
+        cells = np.floor(grid_coords).astype(np.int64)
+        inside = np.all((cells >= 0) & (cells < self.area_dim), axis=1)
+        nearest = np.clip(cells, 0, self.area_dim - 1)
+        indices = nearest[:, 1] * self.area_dim + nearest[:, 0]
+        outside = np.flatnonzero(~inside)
+        if len(outside):
+            estimates = point_estimates(
+                points[outside], self._squares_array[indices[outside]]
             )
-            if comparison < 0:
-                indices[sq] = comparison
-        if len(indices) > 0:
-            return min(indices, key=indices.get)
-        return -1
+            indices[outside[estimates - self.loc_slack >= 0]] = -1
+        return indices
+
+    def _get_sq_idx_many_brute_force(self, points):
+        # estimates of shape (points, squares)
+        estimates = point_estimates(
+            points[:, np.newaxis], self._squares_array[np.newaxis]
+        )
+        comparisons = estimates - self.loc_slack
+        indices = np.argmin(comparisons, axis=1)
+        found = comparisons[np.arange(len(points)), indices] < 0
+        return np.where(found, indices, -1)
 
     def _detect_cb(self, found_markers):
         for marker in found_markers:
@@ -439,6 +504,17 @@ class ArucoGrid:
         self.unitv_x = (top_right - self.origin) / self.area_dim
         self.unitv_y = (bottom_left - self.origin) / self.area_dim
         self.squares = self._generate_all_corners(self.area_dim)
+        self._squares_array = np.array(self.squares, dtype=np.float64)
+        try:
+            # maps pixel offsets from the origin to (column, row)
+            self._inv_grid_transform = np.linalg.inv(
+                np.column_stack((self.unitv_x, self.unitv_y))
+            )
+        except np.linalg.LinAlgError:
+            logging.warning(
+                "Calibration markers are in a line, using slow square lookup"
+            )
+            self._inv_grid_transform = None
         self.calibration_done = True
 
     def _crop_frame(self):
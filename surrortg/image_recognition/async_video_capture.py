@@ -1,27 +1,95 @@
 import asyncio
-import concurrent.futures
 import logging
 import multiprocessing
+import threading
 import time
+from dataclasses import dataclass
 from enum import Enum, auto
+from typing import Any
 
 import cv2
 import numpy as np
 
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
 # VideoCaptureProcess
 MAX_READ_FAILURES_PER_INIT = 3
 
 
+async def wait_readable(fileobj, timeout=None):
+    """Waits until fileobj is readable, without blocking the event loop
+
+    The file descriptor is registered to the running event loop with
+    add_reader, so no threads are needed for waiting.
+
+    :param fileobj: File descriptor or an object with fileno() method, for
+        example multiprocessing.connection.Connection
+    :type fileobj: int/object
+    :param timeout: Max time to wait in seconds, None waits forever,
+        defaults to None
+    :type timeout: float/None, optional
+    :return: True if readable, False if timed out
+    :rtype: bool
+    """
+    loop = asyncio.get_running_loop()
+    readable = loop.create_future()
+
+    def _on_readable():
+        # called on every loop iteration until the reader is removed
+        if not readable.done():
+            readable.set_result(True)
+
+    loop.add_reader(fileobj, _on_readable)
+    try:
+        return await asyncio.wait_for(readable, timeout)
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        loop.remove_reader(fileobj)
+
+
 class CapComm(Enum):
     """For communication between AsyncVideoCapture and VideoCaptureProcess"""
 
     INIT_SUCCESS = auto()
     INIT_FAILURE = auto()
     FRAME_REQUEST = auto()
+    SHARED_FRAME_REQUEST = auto()
     RELEASE_REQUEST = auto()
     RELEASED = auto()
 
 
+@dataclass
+class SharedFrameInfo:
+    """Location of a frame written to a shared memory slot
+
+    Sent by VideoCaptureProcess as a response to
+    CapComm.SHARED_FRAME_REQUEST instead of the frame itself.
+    """
+
+    slot: int
+    name: str
+    shape: tuple
+    dtype: str
+
+
+@dataclass
+class StreamedFrame:
+    """Frame sent by a streaming VideoCaptureProcess
+
+    :param seq: Monotonic sequence number of the captured frame
+    :param timestamp: time.monotonic() when the frame was captured
+    :param frame: The frame, or its SharedFrameInfo
+    """
+
+    seq: int
+    timestamp: float
+    frame: Any
+
+
 class VideoCaptureProcess:
     """Separated cv2.VideoCapture process class
 
@@ -34,16 +102,35 @@ class VideoCaptureProcess:
     :type source: String/Int
     :param conn: multiprocessing.connection.Pipe() one end of the connection
     :type conn: multiprocessing.connection.Connection
+    :param shared_memory_slots: Number of shared memory slots to write frames
+        into, 0 sends the frames through the pipe, defaults to 0
+    :type shared_memory_slots: int, optional
+    :param streaming: Capture frames continuously in a separate thread and
+        respond with the newest one as StreamedFrame, defaults to False
+    :type streaming: bool, optional
     """
 
-    def __init__(self, source, conn, apiPreference):  # noqa: N803
+    def __init__(
+        self,
+        source,
+        conn,
+        apiPreference,  # noqa: N803
+        shared_memory_slots=0,
+        streaming=False,
+    ):
         self._source = source
         self._conn = conn
         self._apiPreference = apiPreference
+        self._shared_memory_slots = shared_memory_slots
+        self._shared = []
+        self._shared_layout = None
+        self._streaming = streaming
 
     def run(self):
         # initialize self._cap cv2.VideoCapture
         self._init_cap(True)
+        if self._streaming:
+            self._start_streaming()
 
         while True:
             # wait until a new request
@@ -51,13 +138,83 @@ class VideoCaptureProcess:
 
             # respond to the request
             if req == CapComm.FRAME_REQUEST:
-                frame = self._read()
+                frame = self._next_frame()
                 self._conn.send(frame)
+            elif req == CapComm.SHARED_FRAME_REQUEST:
+                # the slot index is sent right after the request
+                slot = self._conn.recv()
+                frame = self._next_frame()
+                if self._streaming:
+                    frame.frame = self._write_shared(slot, frame.frame)
+                    self._conn.send(frame)
+                else:
+                    self._conn.send(self._write_shared(slot, frame))
             elif req == CapComm.RELEASE_REQUEST:
+                if self._streaming:
+                    self._stop_streaming()
                 self._cap.release()
+                self._unlink_shared()
                 self._conn.send(CapComm.RELEASED)
                 break
 
+    def _next_frame(self):
+        if not self._streaming:
+            return self._read()
+        # wait for a frame which has not been sent yet
+        with self._new_frame:
+            self._new_frame.wait_for(lambda: self._latest.seq > self._sent_seq)
+            frame = self._latest
+        self._sent_seq = frame.seq
+        return StreamedFrame(frame.seq, frame.timestamp, frame.frame)
+
+    def _start_streaming(self):
+        self._latest = StreamedFrame(0, 0.0, None)
+        self._sent_seq = 0
+        self._new_frame = threading.Condition()
+        self._streaming_stopped = False
+        self._grab_thread = threading.Thread(
+            target=self._grab_frames, daemon=True
+        )
+        self._grab_thread.start()
+
+    def _stop_streaming(self):
+        self._streaming_stopped = True
+        self._grab_thread.join()
+
+    def _grab_frames(self):
+        # keep only the newest frame, older ones are dropped
+        seq = 0
+        while not self._streaming_stopped:
+            frame = self._read()
+            seq += 1
+            with self._new_frame:
+                self._latest = StreamedFrame(seq, time.monotonic(), frame)
+                self._new_frame.notify_all()
+
+    def _write_shared(self, slot, frame):
+        # (Re)allocate the slots when the first frame is read, or when
+        # the frame size changes after a reinit
+        layout = (frame.shape, frame.dtype.str)
+        if layout != self._shared_layout:
+            self._unlink_shared()
+            self._shared = [
+                shared_memory.SharedMemory(create=True, size=frame.nbytes)
+                for _ in range(self._shared_memory_slots)
+            ]
+            self._shared_layout = layout
+        shm = self._shared[slot]
+        np.copyto(np.ndarray(frame.shape, frame.dtype, buffer=shm.buf), frame)
+        return SharedFrameInfo(slot, shm.name, frame.shape, frame.dtype.str)
+
+    def _unlink_shared(self):
+        # AsyncVideoCapture keeps its own mappings, so leased frames stay
+        # valid even after the names have been unlinked
+        for shm in self._shared:
+            shm.close()
+            shm.unlink()
+        self._shared = []
+        self._shared_layout = None
+
     def _init_cap(self, send):
         # Get cv2.VideoCapture without a buffer
         self._cap = cv2.VideoCapture(self._source, cv2.CAP_V4L2)
@@ -67,7 +224,8 @@ class VideoCaptureProcess:
             if send:
                 self._conn.send(CapComm.INIT_FAILURE)
             raise RuntimeError(f"Could not open camera '{self._source}'")
-        self._conn.send(CapComm.INIT_SUCCESS)
+        if send:
+            self._conn.send(CapComm.INIT_SUCCESS)
 
     def _read(self):
         # Returns only after a successful frame read
@@ -98,6 +256,18 @@ class AsyncVideoCapture:
 
     Based on cv2.VideoCapture class. Does not handle video files. Use factory
     method 'await AsyncVideoCapture.create(source, ...)' instead of __init__
+
+    With shared_memory_slots > 0 the frames are not sent through the pipe,
+    but written to a ring of shared memory slots. read() then returns a
+    read-only view to a slot, and the slot is leased until release_frame()
+    is called for the frame. frames() releases the previous frame
+    automatically before reading the next one.
+
+    With streaming=True the capture process grabs frames continuously and
+    keeps only the newest one, so read() does not wait for the capture.
+    The sequence number and capture time of the latest frame are then
+    available as last_seq and last_timestamp, and the number of frames
+    captured but never read as dropped_frames.
     """
 
     @classmethod
@@ -109,6 +279,8 @@ class AsyncVideoCapture:
         release_timeout=2,
         process_class=VideoCaptureProcess,
         apiPreference=cv2.CAP_V4L2,  # noqa: N803
+        shared_memory_slots=0,
+        streaming=False,
     ):
         """Factory method for AsyncVideoCapture, use this instead of __init__
 
@@ -130,7 +302,19 @@ class AsyncVideoCapture:
         :param apiPreference: backend apiPreference for cv2.VideoCapture,
             defaults to cv2.CAP_V4L2
         :type apiPreference: cv2 VideoCaptureAPI, optional
+        :param shared_memory_slots: Number of shared memory slots used for
+            zero-copy frame transport, requires Python 3.8+. 0 sends the
+            frames through the pipe, defaults to 0
+        :type shared_memory_slots: int, optional
+        :param streaming: Capture continuously and return always the newest
+            frame, defaults to False
+        :type streaming: bool, optional
         """
+        if shared_memory_slots and shared_memory is None:
+            raise RuntimeError(
+                "shared_memory_slots requires multiprocessing.shared_memory "
+                "(Python 3.8+)"
+            )
         self = cls()
 
         # save the correct state
@@ -143,17 +327,38 @@ class AsyncVideoCapture:
         self._released = False
         self._start_time = None
 
+        # shared memory slot bookkeeping, slot -> leased frame
+        self._shared_memory_slots = shared_memory_slots
+        self._free_slots = list(range(shared_memory_slots))
+        self._leases = {}
+        self._shared_handles = {}
+
+        # streaming state
+        self._streaming = streaming
+        self.last_seq = None
+        self.last_timestamp = None
+        self.dropped_frames = 0
+
         # initialize and start video_capture_process
-        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
-        self._loop = asyncio.get_event_loop()
         await self._start_process()
 
         return self
 
     async def _start_process(self):
+        if self._shared_memory_slots:
+            # share one resource tracker with the capture process, so the
+            # slots are not reported as leaked when it unlinks them
+            resource_tracker.ensure_running()
         self._conn_main, self._conn_process = multiprocessing.Pipe()
+        # pass only the non-default options, so the process classes which
+        # don't take them still work without them
+        kwargs = {}
+        if self._shared_memory_slots:
+            kwargs["shared_memory_slots"] = self._shared_memory_slots
+        if self._streaming:
+            kwargs["streaming"] = self._streaming
         cap_process = self._process_class(
-            self._source, self._conn_process, self._apiPreference
+            self._source, self._conn_process, self._apiPreference, **kwargs
         )
         self._cap_process = multiprocessing.Process(
             target=cap_process.run,
@@ -182,8 +387,8 @@ class AsyncVideoCapture:
 
     async def _get_response(self, timeout):
         """Gets response in timeout seconds or returns None"""
-        if await self._loop.run_in_executor(
-            self._executor, self._conn_main.poll, timeout
+        if self._conn_main.poll() or await wait_readable(
+            self._conn_main, timeout
         ):
             return self._conn_main.recv()
         else:
@@ -192,8 +397,11 @@ class AsyncVideoCapture:
     async def read(self):
         """Retries until able to return a new frame or released
 
-        Returns None if released
+        Returns None if released. When shared memory slots are used, the
+        returned frame is a read-only view which stays valid until
+        release_frame() is called for it.
 
+        :raises RuntimeError: if all shared memory slots are leased
         :return: the next frame or None
         :rtype: numpy.ndarray/None
         """
@@ -205,10 +413,15 @@ class AsyncVideoCapture:
                 )
                 return None
 
-            # send frame request
-            self._conn_main.send(CapComm.FRAME_REQUEST)
-            # get response
-            frame = await self._get_response(self._read_timeout)
+            if self._shared_memory_slots:
+                frame = await self._read_shared()
+            else:
+                # send frame request
+                self._conn_main.send(CapComm.FRAME_REQUEST)
+                # get response
+                frame = self._unwrap_streamed(
+                    await self._get_response(self._read_timeout)
+                )
             if frame is None:
                 # response timed out --> restart video_capture_process
                 logging.warning(
@@ -219,6 +432,60 @@ class AsyncVideoCapture:
             else:
                 return frame
 
+    async def _read_shared(self):
+        if not self._free_slots:
+            raise RuntimeError(
+                f"All {self._shared_memory_slots} shared memory slots are "
+                "leased, call release_frame() for frames no longer used"
+            )
+        slot = self._free_slots.pop()
+        self._conn_main.send(CapComm.SHARED_FRAME_REQUEST)
+        self._conn_main.send(slot)
+        info = self._unwrap_streamed(
+            await self._get_response(self._read_timeout)
+        )
+        if info is None:
+            self._free_slots.append(slot)
+            return None
+
+        shm = self._shared_handles.get(info.name)
+        if shm is None:
+            shm = shared_memory.SharedMemory(name=info.name)
+            self._shared_handles[info.name] = shm
+        frame = np.ndarray(info.shape, dtype=info.dtype, buffer=shm.buf)
+        frame.flags.writeable = False
+        self._leases[slot] = frame
+        return frame
+
+    def _unwrap_streamed(self, response):
+        if not isinstance(response, StreamedFrame):
+            return response
+        # sequence numbers restart with the process
+        if self.last_seq is not None and response.seq > self.last_seq:
+            self.dropped_frames += response.seq - self.last_seq - 1
+        self.last_seq = response.seq
+        self.last_timestamp = response.timestamp
+        return response.frame
+
+    def release_frame(self, frame):
+        """Return the shared memory slot of a frame back to the ring
+
+        The frame must not be used after this, as the slot will be
+        overwritten by a later read(). Does nothing if shared memory slots
+        are not used.
+
+        :param frame: Frame returned by read()
+        :type frame: numpy.ndarray
+        """
+        if not self._shared_memory_slots:
+            return
+        for slot, leased in self._leases.items():
+            if leased is frame:
+                del self._leases[slot]
+                self._free_slots.append(slot)
+                return
+        logging.warning("release_frame() called for a frame not leased")
+
     async def frames(self):
         """Async generator method for getting frames
 
@@ -230,8 +497,11 @@ class AsyncVideoCapture:
         self._frame_count = 0
 
         while True:
-            yield await self.read()
+            frame = await self.read()
+            yield frame
             self._frame_count += 1
+            if self._shared_memory_slots and frame is not None:
+                self.release_frame(frame)
 
     async def __aenter__(self):
         return self.frames()
@@ -246,11 +516,20 @@ class AsyncVideoCapture:
                 "FPS was: "
                 f"{self._frame_count / (time.time() - self._start_time)}"
             )
+        if self._streaming:
+            logging.info(f"Dropped frames: {self.dropped_frames}")
         await self._release()
         self._released = True
 
-        # release the executor
-        self._executor.shutdown()
+        # close the shared memory mappings, views still in use keep
+        # their mapping alive until garbage collected
+        self._leases = {}
+        for shm in self._shared_handles.values():
+            try:
+                shm.close()
+            except BufferError:
+                pass
+        self._shared_handles = {}
 
     async def _release(self):
         # send release request
@@ -264,13 +543,13 @@ class AsyncVideoCapture:
         # check if actually responded to old
         # CapComm.FRAME_REQUEST
         if (
-            isinstance(response, np.ndarray)
-            and response_time > self.release_timeout
+            isinstance(response, (np.ndarray, SharedFrameInfo, StreamedFrame))
+            and response_time < self._release_timeout
         ):
             # if was frame, and still _release_time left,
             # wait a bit more for CapComm.RELEASED
             response = await self._get_response(
-                response_time - self._release_timeout
+                self._release_timeout - response_time
             )
 
         if response == CapComm.RELEASED:
@@ -282,9 +561,15 @@ class AsyncVideoCapture:
                 "seconds, must be killed"
             )
             self._cap_process.kill()
-            await self._loop.run_in_executor(
-                self._executor, self._cap_process.join
-            )
+            # sentinel becomes readable when the process has ended
+            await wait_readable(self._cap_process.sentinel)
+            self._cap_process.join()
+            # the killed process could not unlink its slots
+            for shm in self._shared_handles.values():
+                try:
+                    shm.unlink()
+                except FileNotFoundError:
+                    pass
 
 
 if __name__ == "__main__":
@@ -9,6 +9,11 @@ class Input(ABC):
     Read more about defaults from input_config.py
     """
 
+    # Whether a command replaces the previous ones, like a joystick position.
+    # Only the newest pending command of a continuous input is handled when
+    # the input has a mailbox, see MessageRouter.register_input.
+    continuous = False
+
     def __init__(self, defaults=None):
         if defaults:
             self.validate_defaults(defaults)
@@ -61,6 +61,8 @@ class Joystick(Input):
     Read more about defaults from input_config.py
     """
 
+    continuous = True
+
     def validate_defaults(self, defaults):
         super().validate_defaults(defaults)
         assert defaults.keys() <= {
@@ -291,6 +293,9 @@ class Joystick(Input):
 
 
 class MouseJoystick(Joystick):
+    # dx and dy are relative, so no command may replace an earlier one
+    continuous = False
+
     async def _on_input(self, command, seat):
         """Mouse and joystick input functionality
 
@@ -12,6 +12,8 @@ class LinearActuator(Input):
     Read more about defaults from input_config.py
     """
 
+    continuous = True
+
     def validate_defaults(self, defaults):
         super().validate_defaults(defaults)
         assert defaults.keys() <= {
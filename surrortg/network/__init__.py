@@ -1,2 +1,3 @@
+from .codec import CodecError, get_codec
 from .message_router import MessageRouter, MultiSeatMessageRouter
 from .socket_handler import Message, MessageValidationError, SocketHandler
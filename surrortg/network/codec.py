@@ -0,0 +1,199 @@
+"""Serialization codecs for the local socket messages
+
+JsonCodec uses the standard library and is always available. OrjsonCodec
+produces the same JSON wire format faster, and is used instead of JsonCodec
+when orjson is installed. MsgpackCodec changes the wire format, so it is
+used only if the local peer accepts it, see LocalSocketHandler.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+WIRE_FORMAT_JSON = "json"
+WIRE_FORMAT_MSGPACK = "msgpack"
+
+
+class CodecError(Exception):
+    pass
+
+
+def _json_envelope(message_id, payload):
+    return b'{"id":%d,"response":false,"payload":%b}' % (message_id, payload)
+
+
+class JsonCodec:
+    """JSON codec using the standard library
+
+    encode_envelope(message_id, payload) returns the local socket envelope
+    {"id": message_id, "response": false, "payload": <payload>} around an
+    already encoded payload, the same for all the codecs.
+    """
+
+    name = "json"
+    wire_format = WIRE_FORMAT_JSON
+
+    def encode(self, obj):
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, data):
+        # json.loads detects the encoding of bytes, no need to decode first,
+        # but it does not accept memoryviews
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        try:
+            return json.loads(data)
+        except (ValueError, TypeError) as e:
+            # JSONDecodeError and UnicodeDecodeError are ValueErrors
+            raise CodecError(f"Invalid JSON message: {e}") from e
+
+    encode_envelope = staticmethod(_json_envelope)
+
+
+class OrjsonCodec:
+    """JSON codec using orjson, requires the orjson package
+
+    Non-string dict keys are converted to strings like the json module does.
+    Objects orjson can't encode, like integer keys over 64 bits, are encoded
+    with the json module instead. Unlike the json module, which writes the
+    non-standard NaN and Infinity tokens, orjson encodes NaN and Infinity
+    as null.
+    """
+
+    name = "orjson"
+    wire_format = WIRE_FORMAT_JSON
+
+    def __init__(self):
+        if orjson is None:
+            raise CodecError("orjson is not installed")
+
+    def encode(self, obj):
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, data):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError as e:
+            raise CodecError(f"Invalid JSON message: {e}") from e
+
+    encode_envelope = staticmethod(_json_envelope)
+
+
+class MsgpackCodec:
+    """MessagePack codec, requires the msgpack package"""
+
+    name = "msgpack"
+    wire_format = WIRE_FORMAT_MSGPACK
+
+    def __init__(self):
+        if msgpack is None:
+            raise CodecError("msgpack is not installed")
+        # a map of 3 items, the payload being the last value
+        self._envelope_id = b"\x83" + msgpack.packb("id")
+        self._envelope_payload = (
+            msgpack.packb("response")
+            + msgpack.packb(False)
+            + msgpack.packb("payload")
+        )
+
+    def encode(self, obj):
+        return msgpack.packb(obj, use_bin_type=True)
+
+    def encode_envelope(self, message_id, payload):
+        return (
+            self._envelope_id
+            + msgpack.packb(message_id)
+            + self._envelope_payload
+            + payload
+        )
+
+    def decode(self, data):
+        try:
+            return msgpack.unpackb(data, raw=False)
+        except (ValueError, msgpack.UnpackException) as e:
+            raise CodecError(f"Invalid MessagePack message: {e}") from e
+
+
+CODECS = {
+    codec.name: codec for codec in (JsonCodec, OrjsonCodec, MsgpackCodec)
+}
+
+
+def available_codecs():
+    """Returns the names of the codecs whose packages are installed
+
+    :return: Codec names
+    :rtype: list of str
+    """
+    names = [JsonCodec.name]
+    if orjson is not None:
+        names.append(OrjsonCodec.name)
+    if msgpack is not None:
+        names.append(MsgpackCodec.name)
+    return names
+
+
+def get_codec(name=None):
+    """Returns a codec instance
+
+    :param name: Codec name from CODECS, None returns the fastest
+        JSON codec available. Defaults to None
+    :type name: str/None, optional
+    :raises CodecError: if the codec is unknown or not installed
+    :return: Codec
+    :rtype: JsonCodec/OrjsonCodec/MsgpackCodec
+    """
+    if name is None:
+        return OrjsonCodec() if orjson is not None else JsonCodec()
+    if name not in CODECS:
+        raise CodecError(f"Unknown codec '{name}', options: {list(CODECS)}")
+    return CODECS[name]()
+
+
+def get_wire_codec(wire_format):
+    """Returns the fastest available codec for the wire format
+
+    :param wire_format: WIRE_FORMAT_JSON or WIRE_FORMAT_MSGPACK
+    :type wire_format: str
+    :raises CodecError: if no codec for the wire format is installed
+    :return: Codec
+    :rtype: JsonCodec/OrjsonCodec/MsgpackCodec
+    """
+    if wire_format == WIRE_FORMAT_JSON:
+        return get_codec()
+    if wire_format == WIRE_FORMAT_MSGPACK:
+        return get_codec(MsgpackCodec.name)
+    raise CodecError(f"Unknown wire format '{wire_format}'")
+
+
+def available_wire_formats():
+    """Returns the wire formats which can be used, the preferred first"""
+    if msgpack is not None:
+        return [WIRE_FORMAT_MSGPACK, WIRE_FORMAT_JSON]
+    return [WIRE_FORMAT_JSON]
+
+
+def sniff_wire_format(data):
+    """Returns the wire format of an encoded message
+
+    The messages are maps, so JSON messages start with '{' (possibly after
+    whitespace) and MessagePack messages with a map type byte.
+
+    :param data: Encoded message
+    :type data: bytes
+    :return: WIRE_FORMAT_JSON or WIRE_FORMAT_MSGPACK
+    :rtype: str
+    """
+    if len(data) > 0 and (0x80 <= data[0] <= 0x8F or data[0] in (0xDE, 0xDF)):
+        return WIRE_FORMAT_MSGPACK
+    return WIRE_FORMAT_JSON
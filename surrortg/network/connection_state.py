@@ -0,0 +1,112 @@
+import asyncio
+import random
+import time
+
+
+class ConnectionState:
+    """Connection state with awaitable transitions and reconnect metrics
+
+    set_connected() and set_disconnected() must be called from the event
+    loop thread. The events are created on first use, so the state can be
+    created before the event loop is running.
+
+    The metrics are in seconds:
+        time_to_detect: time from the latest received message to noticing
+            the disconnect, how long a dead connection went unnoticed at most
+        time_to_reconnect: time from the disconnect to the next connect
+    """
+
+    def __init__(self):
+        self.connected = False
+        self._connected_event = None
+        self._disconnected_event = None
+        self._connected_at = None
+        self._disconnected_at = None
+        self._received_at = None
+        self.last_connection_time = 0.0
+        self.stats = {
+            "connects": 0,
+            "disconnects": 0,
+            "time_to_detect": None,
+            "max_time_to_detect": 0.0,
+            "time_to_reconnect": None,
+            "max_time_to_reconnect": 0.0,
+        }
+
+    def _get_events(self):
+        if self._connected_event is None:
+            self._connected_event = asyncio.Event()
+            self._disconnected_event = asyncio.Event()
+            if self.connected:
+                self._connected_event.set()
+            else:
+                self._disconnected_event.set()
+        return self._connected_event, self._disconnected_event
+
+    def set_connected(self):
+        if self.connected:
+            return
+        now = time.monotonic()
+        self.connected = True
+        self._connected_at = now
+        self._received_at = now
+        self.stats["connects"] += 1
+        if self._disconnected_at is not None:
+            self._update_stat("time_to_reconnect", now - self._disconnected_at)
+        if self._connected_event is not None:
+            self._disconnected_event.clear()
+            self._connected_event.set()
+
+    def set_disconnected(self):
+        if not self.connected:
+            return
+        now = time.monotonic()
+        self.connected = False
+        self._disconnected_at = now
+        self.last_connection_time = now - self._connected_at
+        self.stats["disconnects"] += 1
+        self._update_stat("time_to_detect", now - self._received_at)
+        if self._connected_event is not None:
+            self._connected_event.clear()
+            self._disconnected_event.set()
+
+    def message_received(self):
+        self._received_at = time.monotonic()
+
+    async def wait_connected(self):
+        await self._get_events()[0].wait()
+
+    async def wait_disconnected(self):
+        await self._get_events()[1].wait()
+
+    def _update_stat(self, name, value):
+        self.stats[name] = value
+        self.stats[f"max_{name}"] = max(self.stats[f"max_{name}"], value)
+
+
+class Backoff:
+    """Exponential backoff with jitter
+
+    The sleep doubles after every failed attempt, and a random part of it
+    is skipped, so that many robots which lost the connection at the same
+    time don't reconnect at the same time.
+
+    :param min_sleep: First sleep in seconds
+    :type min_sleep: float
+    :param max_sleep: Max sleep in seconds
+    :type max_sleep: float
+    """
+
+    def __init__(self, min_sleep, max_sleep):
+        self.min_sleep = min_sleep
+        self.max_sleep = max_sleep
+        self._sleep = min_sleep
+
+    def next_sleep(self):
+        """Returns how long to sleep before the next attempt"""
+        sleep = self._sleep
+        self._sleep = min(self.max_sleep, sleep * 2)
+        return random.uniform(sleep / 2, sleep)
+
+    def reset(self):
+        self._sleep = self.min_sleep
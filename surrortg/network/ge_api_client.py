@@ -4,7 +4,15 @@ import logging
 
 import socketio
 
+from .connection_state import Backoff, ConnectionState
+
 SOCKETIO_NAMESPACE = "/api"
+RECONNECT_MIN_SLEEP = 1
+RECONNECT_MAX_SLEEP = 60
+# Connections lasting this many seconds reset the reconnect backoff, and
+# are reconnected without sleeping first
+STABLE_CONNECTION_TIME = 30
+CONNECT_TIMEOUT = 10
 
 
 class GEConnectionError(Exception):
@@ -12,6 +20,13 @@ class GEConnectionError(Exception):
 
 
 class ApiClient(socketio.AsyncClientNamespace):
+    """Game engine API client
+
+    run() keeps the client connected. After reconnecting, the reconnect
+    callbacks are awaited, so they can send the state the game engine
+    has lost, like registrations.
+    """
+
     def __init__(self, client_id, url, game_id, token, message_listener=None):
         query = {
             "clientType": "robot",
@@ -30,7 +45,10 @@ class ApiClient(socketio.AsyncClientNamespace):
         self.engineio_logger = logging.getLogger("engineio")
         self.engineio_logger.setLevel(logging.WARNING)
         self.url = self._get_query_url(url, query)
-        self.connected = False
+        self.state = ConnectionState()
+        self._backoff = Backoff(RECONNECT_MIN_SLEEP, RECONNECT_MAX_SLEEP)
+        self.reconnect_callbacks = []
+        self.connected_future = None
         self.message_listener = message_listener
 
         super().__init__(SOCKETIO_NAMESPACE)
@@ -41,6 +59,21 @@ class ApiClient(socketio.AsyncClientNamespace):
             url += f"{key}={value}&"
         return url[:-1]
 
+    @property
+    def connected(self):
+        return self.state.connected
+
+    @connected.setter
+    def connected(self, connected):
+        if connected:
+            self.state.set_connected()
+        else:
+            self.state.set_disconnected()
+
+    def add_reconnect_callback(self, callback):
+        """Adds a coroutine function awaited after every reconnect"""
+        self.reconnect_callbacks.append(callback)
+
     def on_connect(self):
         self.connected = True
         if self.connected_future is not None:
@@ -73,6 +106,7 @@ class ApiClient(socketio.AsyncClientNamespace):
         )
 
     async def on_message(self, data, *args):
+        self.state.message_received()
         if self.message_listener is not None:
             asyncio.create_task(self.message_listener(data))
         pass
@@ -106,17 +140,50 @@ class ApiClient(socketio.AsyncClientNamespace):
 
         logging.info("connected")
 
+    async def _abort_connect(self):
+        """Closes the client of a failed connection attempt, so it is not
+        leaked and can't connect after the attempt has been given up
+        """
+        self.connected_future = None
+        await self.sio.disconnect()
+        self.connected = False
+
     async def set_local_url(self, url):
         res = await self.request("setLocalConfigUrl", {"url": url})
         logging.info(f"result {res}")
 
     async def run(self):
+        """Reconnects every time the connection is lost"""
         while True:
-            # check periodically if still connected
-            while self.connected:
-                await asyncio.sleep(0.5)
-
-            await self.disconnect()
+            await self.state.wait_disconnected()
+            await self.sio.disconnect()
+
+            sleep = self.state.last_connection_time < STABLE_CONNECTION_TIME
+            if not sleep:
+                self._backoff.reset()
+            while not self.connected:
+                if sleep:
+                    await asyncio.sleep(self._backoff.next_sleep())
+                sleep = True
+                try:
+                    await asyncio.wait_for(self.connect(), CONNECT_TIMEOUT)
+                except GEConnectionError as e:
+                    await self._abort_connect()
+                    if "Invalid robot token" in str(e):
+                        raise
+                    logging.warning(f"Reconnecting failed: {e}")
+                except (
+                    asyncio.TimeoutError,
+                    socketio.exceptions.ConnectionError,
+                ) as e:
+                    await self._abort_connect()
+                    logging.warning(f"Reconnecting failed: {e!r}")
+
+            for callback in self.reconnect_callbacks:
+                try:
+                    await callback()
+                except Exception:
+                    logging.exception(f"Reconnect callback {callback} failed")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,147 @@
+"""Input latency histograms
+
+The times are measured with time.perf_counter(). For each input and seat,
+three stages are recorded:
+    queue: message received -> _on_input called
+    handle: _on_input called -> _on_input finished
+    total: message received -> _on_input finished
+"""
+import json
+import logging
+from bisect import bisect_left
+
+# Upper bounds of the histogram buckets in milliseconds, the last bucket
+# counts everything slower
+LATENCY_BUCKETS_MS = (
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1000,
+)
+LATENCY_STAGES = ("queue", "handle", "total")
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of durations"""
+
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, ms):
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, percent):
+        """Returns the upper bound of the bucket of the percentile, in ms
+
+        None if nothing has been recorded, and the max for the last bucket.
+        """
+        if self.count == 0:
+            return None
+        target = self.count * percent / 100
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target and count > 0:
+                break
+        if i < len(LATENCY_BUCKETS_MS):
+            return min(LATENCY_BUCKETS_MS[i], self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.sum / self.count if self.count > 0 else None,
+            "max_ms": self.max,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "buckets": dict(zip([*LATENCY_BUCKETS_MS, "inf"], self.counts)),
+        }
+
+
+class LatencyTracker:
+    """Collects input latency histograms by input id and seat
+
+    Disabled by default. When disabled, record() is not called at all, the
+    callers check enabled first.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        # (input id, seat) -> {stage: LatencyHistogram}
+        self._histograms = {}
+
+    def record(self, input_id, seat, received_at, dispatched_at, completed_at):
+        """Records the stages of one command
+
+        :param received_at: perf_counter() time when the message was
+            received, None if not known, then only handle is recorded
+        :type received_at: float/None
+        """
+        histograms = self._histograms.get((input_id, seat))
+        if histograms is None:
+            histograms = {
+                stage: LatencyHistogram() for stage in LATENCY_STAGES
+            }
+            self._histograms[(input_id, seat)] = histograms
+        histograms["handle"].record((completed_at - dispatched_at) * 1000)
+        if received_at is not None:
+            histograms["queue"].record((dispatched_at - received_at) * 1000)
+            histograms["total"].record((completed_at - received_at) * 1000)
+
+    def get_stats(self):
+        """Returns the histograms
+
+        :return: {input id: {seat: {stage: histogram dict}}}, see
+            LatencyHistogram.to_dict
+        :rtype: dict
+        """
+        stats = {}
+        for (input_id, seat), histograms in self._histograms.items():
+            stats.setdefault(input_id, {})[seat] = {
+                stage: histogram.to_dict()
+                for stage, histogram in histograms.items()
+            }
+        return stats
+
+    def reset(self):
+        self._histograms = {}
+
+    def dump(self):
+        """Logs the histograms"""
+        if not self.enabled:
+            logging.info("Input latency tracking is disabled")
+            return
+        lines = []
+        for (input_id, seat), histograms in sorted(
+            self._histograms.items(), key=lambda item: str(item[0])
+        ):
+            for stage, histogram in histograms.items():
+                if histogram.count > 0:
+                    lines.append(
+                        f"{input_id} seat {seat} {stage}: "
+                        f"count {histogram.count}, "
+                        f"mean {histogram.sum / histogram.count:.2f} ms, "
+                        f"p50 {histogram.percentile(50)} ms, "
+                        f"p99 {histogram.percentile(99)} ms, "
+                        f"max {histogram.max:.2f} ms"
+                    )
+        logging.info("Input latencies:\n" + "\n".join(lines))
+        logging.debug(json.dumps(self.get_stats()))
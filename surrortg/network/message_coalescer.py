@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import threading
+from collections import OrderedDict, deque
+
+# Messages of these events are sent only after all the pending messages,
+# because the game engine expects the earlier updates to arrive first
+FLUSH_EVENTS = {"playingEnded", "lapDone", "preGameReady", "controllerReady"}
+
+
+def _progress_key(msg):
+    return ("progress", msg["dst"], msg["src"], msg["seat"])
+
+
+def _overlay_text_key(msg):
+    return (
+        "setCustomOverlayText",
+        msg["dst"],
+        msg["src"],
+        msg["seat"],
+        msg["payload"].get("elementId"),
+        msg["payload"].get("playerOnly"),
+    )
+
+
+def _score_update_key(msg):
+    payload = msg["payload"]
+    if (
+        payload.get("endGame")
+        or payload.get("seatEndGame")
+        or not isinstance(payload.get("scores"), dict)
+    ):
+        # final scores end the game, they must not be merged
+        return None
+    return ("scoreUpdate", msg["dst"], msg["src"], msg["seat"])
+
+
+def _merge_score_update(old, new):
+    scores = dict(old["payload"]["scores"])
+    scores.update(new["payload"]["scores"])
+    return {**new, "payload": {**new["payload"], "scores": scores}}
+
+
+def _latest(old, new):
+    return new
+
+
+# event: (function returning the coalescing key of a message or None if the
+# message can't be coalesced, function combining the old and new message)
+COALESCE_RULES = {
+    "progress": (_progress_key, _latest),
+    "setCustomOverlayText": (_overlay_text_key, _latest),
+    "scoreUpdate": (_score_update_key, _merge_score_update),
+}
+
+
+class MessageCoalescer:
+    """Coalesces frequent outbound messages before sending them
+
+    Messages with COALESCE_RULES are held for the coalescing window. During
+    the window a newer message replaces the held progress and custom overlay
+    text of the same seat and element, and score updates are merged into one
+    scoreUpdate, so games sending updates every frame only send the latest
+    state once per window. Other messages are sent right away, except
+    FLUSH_EVENTS, which flush the held messages first to keep the order the
+    game engine relies on. The messages are sent one at a time by a single
+    task, in the order they were released.
+
+    add() may be called from any thread.
+
+    :param send: Coroutine function sending a single message dict
+    :type send: Function
+    :param window: Coalescing window in seconds
+    :type window: float
+    :param on_failed: Function called with the message and callback when
+        send returns False or raises, defaults to None
+    :type on_failed: Function/None, optional
+    """
+
+    def __init__(self, send, window, on_failed=None):
+        assert window > 0, "Coalescing window must be positive"
+        self._send = send
+        self.window = window
+        self.on_failed = on_failed
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_scheduled = False
+        self._flush_handle = None
+        self._loop = None
+        # (message, callback) released for sending, sent by _drain_task
+        self._outbox = deque()
+        self._drain_task = None
+        self.stats = {"received": 0, "sent": 0, "coalesced": 0, "failed": 0}
+
+    def start(self, loop):
+        """Set the event loop the messages are sent from"""
+        self._loop = loop
+
+    def add(self, msg, callback=None):
+        """Send or hold the message
+
+        Messages with a callback are never coalesced.
+
+        :param msg: Message dict, see Message.to_dict()
+        :type msg: dict
+        :param callback: Message acknowledgement callback, defaults to None
+        :type callback: Function/None, optional
+        """
+        rule = COALESCE_RULES.get(msg["event"])
+        key = rule[0](msg) if rule is not None and callback is None else None
+        with self._lock:
+            self.stats["received"] += 1
+            if key is None:
+                if msg["event"] in FLUSH_EVENTS or rule is not None:
+                    messages = self._take_pending()
+                else:
+                    messages = []
+                messages.append((msg, callback))
+            else:
+                if key in self._pending:
+                    self.stats["coalesced"] += 1
+                    msg = rule[1](self._pending[key][0], msg)
+                    del self._pending[key]
+                self._pending[key] = (msg, None)
+                if self._flush_scheduled:
+                    return
+                # arm the flush timer only once per window
+                self._flush_scheduled = True
+                messages = None
+        if messages is None:
+            self._call_in_loop(self._arm_flush)
+        else:
+            self._call_in_loop(self._send_messages, messages)
+
+    async def flush(self):
+        """Send all the held messages now, after the ones already released
+
+        Returns when all the released messages have been sent.
+        """
+        with self._lock:
+            messages = self._take_pending()
+        self._send_messages(messages)
+        while self._drain_task is not None:
+            await asyncio.wait({self._drain_task})
+
+    def _take_pending(self):
+        # must be called with self._lock held
+        messages = list(self._pending.values())
+        self._pending.clear()
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_scheduled = False
+        self._flush_handle = None
+        return messages
+
+    def _call_in_loop(self, fun, *args):
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            fun(*args)
+        else:
+            self._loop.call_soon_threadsafe(fun, *args)
+
+    def _arm_flush(self):
+        with self._lock:
+            # the messages may have been flushed before the timer was armed
+            if self._flush_scheduled and self._flush_handle is None:
+                self._flush_handle = self._loop.call_later(
+                    self.window, self._flush_cb
+                )
+
+    def _flush_cb(self):
+        with self._lock:
+            self._flush_handle = None
+            messages = self._take_pending()
+        self._send_messages(messages)
+
+    def _send_messages(self, messages):
+        self._outbox.extend(messages)
+        if len(self._outbox) > 0 and self._drain_task is None:
+            self._drain_task = self._loop.create_task(self._drain())
+
+    async def _drain(self):
+        try:
+            while len(self._outbox) > 0:
+                msg, callback = self._outbox.popleft()
+                await self._send_one(msg, callback)
+        finally:
+            self._drain_task = None
+
+    async def _send_one(self, msg, callback):
+        try:
+            sent = await self._send(msg, callback=callback)
+        except Exception as e:
+            logging.warning(f"Sending coalesced message {msg} failed: {e}")
+            sent = False
+        if sent is False:
+            self.stats["failed"] += 1
+            if self.on_failed is not None:
+                self.on_failed(msg, callback)
+        else:
+            self.stats["sent"] += 1
@@ -1,9 +1,13 @@
 """This module implements different types of message routing strategies."""
 import asyncio
 import logging
-from dataclasses import dataclass
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
 
 from ..inputs.input import Input
+from .latency import LatencyTracker
 
 SRC_GAME_ENGINE = "gameEngine"
 EVENT_NEW_PEER = "newPeer"
@@ -14,11 +18,205 @@ EVENT_GAME_CONTROLS = "gameControls"
 EVENT_PING = "ping"
 EVENT_ROBOT_LOG = "robotLog"
 
+# Seconds without peer messages before the inputs of the seat are reset
+WATCHDOG_TIMEOUT = 5
+# Max seconds to wait for a single input reset
+INPUT_RESET_TIMEOUT = 2
+
+
+class InputMailbox:
+    """Handles the commands of one input and seat one at a time
+
+    Commands posted while a command is being handled wait in the mailbox.
+    With latest_only, a new command replaces the waiting one, so only the
+    newest command is handled after the one in flight. Otherwise all the
+    commands are handled in the order they were posted.
+
+    :param on_input: Coroutine function with signature on_input(command, seat)
+    :type on_input: Function
+    :param seat: Robot seat
+    :type seat: int
+    :param latest_only: Keep only the newest waiting command
+    :type latest_only: bool
+    :param input_id: Input id for the latency histograms, defaults to None
+    :type input_id: str/None, optional
+    :param latency: Tracker for the latency histograms, defaults to None
+    :type latency: LatencyTracker/None, optional
+    """
+
+    def __init__(
+        self, on_input, seat, latest_only, input_id=None, latency=None
+    ):
+        self._on_input = on_input
+        self.seat = seat
+        self.latest_only = latest_only
+        self.input_id = input_id
+        self.latency = latency
+        # (command, receive time)
+        self._pending = deque()
+        self._task = None
+        self.superseded = 0
+
+    def post(self, command, received_at=None):
+        """Queue the command and start handling it if the mailbox is idle"""
+        if self.latest_only and len(self._pending) > 0:
+            self._pending[0] = (command, received_at)
+            self.superseded += 1
+        else:
+            self._pending.append((command, received_at))
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def clear(self):
+        """Drop the waiting commands, the one in flight is not cancelled"""
+        self._pending.clear()
+
+    async def wait_idle(self):
+        """Wait until the command in flight has been handled"""
+        if self._task is not None:
+            await asyncio.wait({self._task})
+
+    def cancel(self):
+        """Drop the waiting commands and cancel the one in flight"""
+        self._pending.clear()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _run(self):
+        try:
+            while len(self._pending) > 0:
+                command, received_at = self._pending.popleft()
+                latency = self.latency
+                if latency is not None and not latency.enabled:
+                    latency = None
+                if latency is not None:
+                    dispatched_at = time.perf_counter()
+                try:
+                    await self._on_input(command, self.seat)
+                except Exception as e:
+                    logging.error(
+                        f"Handling input failed for seat {self.seat}",
+                        exc_info=e,
+                    )
+                finally:
+                    # failed and cancelled commands are recorded too
+                    if latency is not None:
+                        latency.record(
+                            self.input_id,
+                            self.seat,
+                            received_at,
+                            dispatched_at,
+                            time.perf_counter(),
+                        )
+        finally:
+            self._task = None
+
 
 @dataclass
 class InputBinding:
     dev: Input
     admin: bool
+    watchdog_timeout: Optional[float] = None
+    reset_order: int = 0
+    reset_timeout: Optional[float] = INPUT_RESET_TIMEOUT
+    mailbox: bool = False
+    # seat -> InputMailbox, created on the first command of the seat
+    mailboxes: dict = field(default_factory=dict)
+
+
+@dataclass
+class ResetReport:
+    """Result of resetting or shutting down inputs
+
+    :param completed: (input id, seat) of the finished resets
+    :param timed_out: (input id, seat) of the resets which did not finish
+        in the input's reset_timeout. They are left running in the
+        background.
+    :param failed: (input id, seat, exception) of the failed resets
+    """
+
+    completed: list = field(default_factory=list)
+    timed_out: list = field(default_factory=list)
+    failed: list = field(default_factory=list)
+
+
+async def reset_bindings(bindings, seats, shutdown=False):
+    """Resets or shuts down the inputs concurrently
+
+    The inputs are reset in the order of their reset_order: all the inputs
+    with the lowest reset_order for all the seats at the same time, then the
+    next reset_order and so on. A reset which does not finish in the input's
+    reset_timeout does not hold back the others. Shutdowns are awaited
+    until they finish, so the devices are stopped before the program exits.
+
+    :param bindings: Inputs to reset
+    :type bindings: dict{str: InputBinding}
+    :param seats: Seats to reset the inputs for
+    :type seats: iterable of int
+    :param shutdown: Call shutdown instead of reset, defaults to False
+    :type shutdown: bool, optional
+    :return: Which resets finished, timed out or failed
+    :rtype: ResetReport
+    """
+    report = ResetReport()
+    groups = {}
+    for dev_id, binding in bindings.items():
+        groups.setdefault(binding.reset_order, []).append((dev_id, binding))
+    for order in sorted(groups):
+        await asyncio.gather(
+            *[
+                _reset_binding(report, dev_id, binding, seat, shutdown)
+                for dev_id, binding in groups[order]
+                for seat in seats
+            ]
+        )
+    if len(report.timed_out) > 0:
+        action = "shut down" if shutdown else "reset"
+        logging.warning(f"Inputs did not {action} in time: {report.timed_out}")
+    return report
+
+
+async def _reset_binding(report, dev_id, binding, seat, shutdown):
+    timeout = binding.reset_timeout
+    mailbox = binding.mailboxes.get(seat)
+    if mailbox is not None:
+        # stale commands must not be handled after the reset, and the
+        # command in flight counts against the reset timeout
+        mailbox.clear()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            await asyncio.wait_for(mailbox.wait_idle(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(
+                f"Input '{dev_id}' command for seat {seat} did not finish "
+                "before the reset, cancelling it"
+            )
+            mailbox.cancel()
+        if timeout is not None:
+            timeout = max(0, timeout - (loop.time() - start))
+    if shutdown:
+        timeout = None
+    method = binding.dev.shutdown if shutdown else binding.dev.reset
+    # shielded, so a slow device is still reset after the timeout
+    task = asyncio.ensure_future(method(seat))
+    try:
+        await asyncio.wait_for(asyncio.shield(task), timeout)
+    except asyncio.TimeoutError:
+        report.timed_out.append((dev_id, seat))
+        task.add_done_callback(_log_late_reset_error)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logging.error(f"Input '{dev_id}' failed for seat {seat}", exc_info=e)
+        report.failed.append((dev_id, seat, e))
+    else:
+        report.completed.append((dev_id, seat))
+
+
+def _log_late_reset_error(task):
+    if not task.cancelled() and task.exception() is not None:
+        logging.error("Input reset failed", exc_info=task.exception())
 
 
 @dataclass
@@ -44,11 +242,42 @@ class MessageRouter:
         }
 
     Additional fields may be present and will be ignored.
+
+    Inputs registered with a mailbox are not awaited: their commands are
+    handled in the background one at a time per seat, see InputMailbox.
+
+    When latency.enabled is set, the time from receiving each command to
+    calling the input's _on_input, and to it finishing, is recorded in
+    histograms by input id and seat, see LatencyTracker.
+
+    The inputs of a seat are reset by a watchdog when no messages have been
+    received from the seat's peer for the watchdog timeout. Receiving a
+    message only stores its time: a single timer checks the deadlines of
+    all the seats, and is rescheduled only when it fires.
+
+    :param watchdog_timeout: Default watchdog timeout in seconds, None
+        disables the watchdog for inputs without their own timeout. Defaults
+        to WATCHDOG_TIMEOUT
+    :type watchdog_timeout: int/float/None, optional
     """
 
-    def __init__(self):
+    def __init__(self, watchdog_timeout=WATCHDOG_TIMEOUT):
         self.inputs = {}
         self.reset_tasks = {}
+        # input id -> (bound _on_input, admin, InputBinding if the input has
+        # a mailbox), rebuilt on (un)registering
+        self._handlers = {}
+        self.watchdog_timeout = watchdog_timeout
+        # [(timeout, [input ids])] sorted by timeout
+        self._watchdog_groups = []
+        # seat -> loop time of the latest peer message
+        self._last_kicks = {}
+        # seat -> (kick time, largest timeout already handled for the kick)
+        self._handled_timeouts = {}
+        self._watchdog_handle = None
+        self._loop = None
+        self.watchdog_stats = {"timeout_resets": 0, "triggered_resets": 0}
+        self.latency = LatencyTracker()
 
     async def handle_message(self, msg, seat, is_admin_msg):
         """Routes a message according to input type and id.
@@ -69,7 +298,7 @@ class MessageRouter:
 
         # We received a message from peer. Kick watchdog
         if msg.src != SRC_GAME_ENGINE:
-            self._kick_watchdog(seat, 5)
+            self._kick_watchdog(seat)
 
         if msg.event == EVENT_PING:
             return
@@ -80,13 +309,28 @@ class MessageRouter:
             logging.warning("Could not route message: malformed message")
             return
 
-        if input_id in self.inputs:
-            if self.inputs[input_id].admin and not is_admin_msg:
+        handler = self._handlers.get(input_id)
+        if handler is not None:
+            on_input, admin, mailbox_binding = handler
+            if admin and not is_admin_msg:
                 logging.warning("Non-admin trying to use admin input")
                 return
-            await self.inputs[input_id].dev._on_input(
-                msg.payload["command"], seat
-            )
+            if mailbox_binding is not None:
+                self._post(input_id, mailbox_binding, msg, seat)
+            elif self.latency.enabled:
+                dispatched_at = time.perf_counter()
+                try:
+                    await on_input(msg.payload["command"], seat)
+                finally:
+                    self.latency.record(
+                        input_id,
+                        seat,
+                        msg.received_at,
+                        dispatched_at,
+                        time.perf_counter(),
+                    )
+            else:
+                await on_input(msg.payload["command"], seat)
             return
         else:
             logging.warning(
@@ -97,7 +341,29 @@ class MessageRouter:
                 f"can be used to register this input during on_init."
             )
 
-    def register_input(self, dev_id, dev, admin):
+    def _post(self, dev_id, binding, msg, seat):
+        mailbox = binding.mailboxes.get(seat)
+        if mailbox is None:
+            mailbox = InputMailbox(
+                binding.dev._on_input,
+                seat,
+                binding.dev.continuous,
+                dev_id,
+                self.latency,
+            )
+            binding.mailboxes[seat] = mailbox
+        mailbox.post(msg.payload["command"], msg.received_at)
+
+    def register_input(
+        self,
+        dev_id,
+        dev,
+        admin,
+        watchdog_timeout=None,
+        reset_order=0,
+        reset_timeout=INPUT_RESET_TIMEOUT,
+        mailbox=False,
+    ):
         """Registers a callback for route
 
         :param dev_id: Input device id
@@ -106,54 +372,175 @@ class MessageRouter:
         :type dev: Input
         :param admin: Describes if the input is for admin use only
         :type admin: bool
+        :param watchdog_timeout: Watchdog timeout for this input in seconds,
+            None uses the router's watchdog_timeout. Defaults to None
+        :type watchdog_timeout: int/float/None, optional
+        :param reset_order: Inputs with lower reset_order are reset first,
+            defaults to 0
+        :type reset_order: int, optional
+        :param reset_timeout: Max seconds to wait for the input's reset,
+            None waits forever. Shutdowns are always awaited. Defaults to
+            INPUT_RESET_TIMEOUT
+        :type reset_timeout: int/float/None, optional
+        :param mailbox: Handle the commands in a per-seat mailbox instead of
+            awaiting them. Only the newest waiting command of a continuous
+            input is handled, other inputs keep every command in order.
+            Defaults to False
+        :type mailbox: bool, optional
         """
-        self.inputs[dev_id] = InputBinding(dev, admin)
+        binding = InputBinding(
+            dev, admin, watchdog_timeout, reset_order, reset_timeout, mailbox
+        )
+        self.inputs[dev_id] = binding
+        self._handlers[dev_id] = (
+            dev._on_input,
+            admin,
+            binding if mailbox else None,
+        )
+        self._update_watchdog_groups()
 
     def unregister_input(self, dev_id):
         """Unregisters a callback"""
         del self.inputs[dev_id]
+        del self._handlers[dev_id]
+        self._update_watchdog_groups()
+
+    def set_watchdog_timeout(self, timeout):
+        """Sets the default watchdog timeout
+
+        :param timeout: Timeout in seconds, None disables the watchdog for
+            inputs without their own timeout
+        :type timeout: int/float/None
+        """
+        self.watchdog_timeout = timeout
+        self._update_watchdog_groups()
 
     def has_input(self, dev_id):
         return dev_id in self.inputs
 
+    def get_mailbox_stats(self):
+        """Returns the numbers of superseded commands of the mailboxes
+
+        :return: {input id: {seat: superseded commands}} of the inputs
+            with a mailbox
+        :rtype: dict
+        """
+        return {
+            dev_id: {
+                seat: mailbox.superseded
+                for seat, mailbox in binding.mailboxes.items()
+            }
+            for dev_id, binding in self.inputs.items()
+            if binding.mailbox
+        }
+
     def trigger_watchdog_reset(self, seat):
         """Resets inputs and clears watchdog for given seat immediately
 
         :param seat: Robot seat
         :type seat: int
         """
-        self._kick_watchdog(seat, 0)
-
-    def _kick_watchdog(self, seat, timeout):
+        self._last_kicks.pop(seat, None)
+        self._handled_timeouts.pop(seat, None)
+        self.watchdog_stats["triggered_resets"] += 1
+        self._start_reset(seat, list(self.inputs))
+
+    def _update_watchdog_groups(self):
+        groups = {}
+        for dev_id, binding in self.inputs.items():
+            timeout = binding.watchdog_timeout
+            if timeout is None:
+                timeout = self.watchdog_timeout
+            if timeout is not None:
+                groups.setdefault(timeout, []).append(dev_id)
+        self._watchdog_groups = sorted(groups.items())
+        if self._loop is not None:
+            self._schedule_watchdog()
+
+    def _kick_watchdog(self, seat):
         """Kicks watchdog for the specified seat
 
-        Cancels the old reset task if one is defined,
-        replacing it with a new one.
+        Only stores the time, the deadlines are checked when the watchdog
+        timer fires.
         :param seat: Robot seat
         :type seat: int
-        :param timeout: time to wait before resetting inputs
-        :type timeout: int or float
         """
-        if seat in self.reset_tasks:
-            reset_task = self.reset_tasks[seat]
-            if not reset_task.cancelled():
-                self.reset_tasks[seat].cancel()
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        self._last_kicks[seat] = self._loop.time()
+        if self._watchdog_handle is None:
+            self._schedule_watchdog()
+
+    def _next_deadline(self, seat, kick):
+        """Returns the next unhandled deadline of the seat, or None"""
+        handled = self._handled_timeouts.get(seat)
+        for timeout, _ in self._watchdog_groups:
+            if handled is None or handled[0] != kick or timeout > handled[1]:
+                return kick + timeout
+        return None
+
+    def _schedule_watchdog(self):
+        if self._watchdog_handle is not None:
+            self._watchdog_handle.cancel()
+            self._watchdog_handle = None
+        deadlines = [
+            self._next_deadline(seat, kick)
+            for seat, kick in self._last_kicks.items()
+        ]
+        deadlines = [d for d in deadlines if d is not None]
+        if len(deadlines) > 0:
+            self._watchdog_handle = self._loop.call_at(
+                min(deadlines), self._check_watchdog
+            )
+
+    def _check_watchdog(self):
+        self._watchdog_handle = None
+        now = self._loop.time()
+        for seat, kick in list(self._last_kicks.items()):
+            handled = self._handled_timeouts.get(seat)
+            if handled is None or handled[0] != kick:
+                handled = (kick, None)
+            due = [
+                (timeout, dev_ids)
+                for timeout, dev_ids in self._watchdog_groups
+                if (handled[1] is None or timeout > handled[1])
+                and kick + timeout <= now
+            ]
+            if len(due) > 0:
+                self._handled_timeouts[seat] = (kick, due[-1][0])
+                self.watchdog_stats["timeout_resets"] += 1
+                self._start_reset(
+                    seat, [dev_id for _, ids in due for dev_id in ids]
+                )
+            if self._next_deadline(seat, kick) is None:
+                del self._last_kicks[seat]
+                self._handled_timeouts.pop(seat, None)
+        self._schedule_watchdog()
+
+    def _start_reset(self, seat, dev_ids):
         self.reset_tasks[seat] = asyncio.create_task(
-            self._reset_all_timeout(seat, timeout)
+            self._reset_inputs(seat, dev_ids)
         )
 
-    async def _reset_all_timeout(self, seat, timeout):
-        """Resets all inputs for the specified seat after the timeout
+    async def _reset_inputs(self, seat, dev_ids):
+        """Resets the inputs for the specified seat
 
         :param seat: Robot seat
         :type seat: int
-        :param timeout: Time to sleep before resetting inputs
-        :type timeout: int or float
+        :param dev_ids: Ids of the inputs to reset
+        :type dev_ids: list of str
         """
-        await asyncio.sleep(timeout)
-        for route in self.inputs.values():
-            await route.dev.reset(seat)
-        logging.info(f"All inputs reset for seat {seat}")
+        # the inputs may have been unregistered meanwhile
+        bindings = {
+            dev_id: self.inputs[dev_id]
+            for dev_id in dev_ids
+            if dev_id in self.inputs
+        }
+        await reset_bindings(bindings, [seat])
+        if len(dev_ids) == len(self.inputs):
+            logging.info(f"All inputs reset for seat {seat}")
+        else:
+            logging.info(f"Inputs {dev_ids} reset for seat {seat}")
 
 
 class MultiSeatMessageRouter:
@@ -192,6 +579,31 @@ class MultiSeatMessageRouter:
         self.route_mappings = {"gameEngine": "gameEngine"}
         self.seat_statuses = {}
         self.robot_log_handler = robot_log_handler
+        # gameControls dropped by coalesce_batch
+        self.coalesced_messages = 0
+        self._update_routes()
+
+    def _update_routes(self):
+        """Rebuild the routing table used for each message
+
+        Must be called after changing route_mappings or seat_statuses.
+        The table maps src -> (seat, is_admin, enabled), or src -> None if
+        the seat status is not defined.
+        """
+        routes = {}
+        for src, seat in self.route_mappings.items():
+            if src == SRC_GAME_ENGINE:
+                routes[src] = (seat, True, True)
+            elif seat in self.seat_statuses:
+                status = self.seat_statuses[seat]
+                routes[src] = (
+                    seat,
+                    status.clientType == "admin",
+                    status.enabled,
+                )
+            else:
+                routes[src] = None
+        self._routes = routes
 
     async def handle_message(self, msg):
         """Handles a message.
@@ -207,25 +619,64 @@ class MultiSeatMessageRouter:
             self.robot_log_handler(msg)
         elif msg.src == SRC_GAME_ENGINE and msg.event != EVENT_GAME_CONTROLS:
             await self.handle_routing_messages(msg)
-        elif msg.src in self.route_mappings:
-            seat = self.route_mappings[msg.src]
-            is_admin_msg = (
-                msg.src == SRC_GAME_ENGINE
-                or self.seat_statuses[seat].clientType == "admin"
-                or msg.isAdmin
-            )
-            if msg.src == SRC_GAME_ENGINE or seat in self.seat_statuses:
-                if is_admin_msg or self.seat_statuses[seat].enabled:
-                    await self.router.handle_message(msg, seat, is_admin_msg)
-            else:
+        elif msg.src in self._routes:
+            route = self._routes[msg.src]
+            if route is None:
                 logging.warning(
                     f"Seat route registered but enabled status not defined. "
                     f"Message not handled: {msg}"
                 )
+                return
+            seat, is_admin_seat, enabled = route
+            is_admin_msg = is_admin_seat or msg.isAdmin
+            if is_admin_msg or enabled:
+                await self.router.handle_message(msg, seat, is_admin_msg)
         else:
             logging.warning(f"Received unhandleable peer message: {msg}")
 
-    def register_input(self, dev_id, dev, admin=False):
+    def coalesce_batch(self, messages):
+        """Drops superseded commands of continuous inputs from a batch
+
+        When the batch contains several gameControls messages from the same
+        sender to the same continuous input, like Joystick, only the last
+        one is kept. The order of the other messages does not change.
+
+        :param messages: Messages received at once
+        :type messages: list of Message
+        :return: Messages to handle
+        :rtype: list of Message
+        """
+        latest = {}
+        for i, msg in enumerate(messages):
+            if msg.event != EVENT_GAME_CONTROLS or not isinstance(
+                msg.payload, dict
+            ):
+                continue
+            binding = self.router.inputs.get(msg.payload.get("id"))
+            if binding is not None and binding.dev.continuous:
+                latest[(msg.src, msg.payload["id"])] = i
+        if len(latest) == 0:
+            return messages
+        kept = [
+            msg
+            for i, msg in enumerate(messages)
+            if msg.event != EVENT_GAME_CONTROLS
+            or not isinstance(msg.payload, dict)
+            or latest.get((msg.src, msg.payload.get("id")), i) == i
+        ]
+        self.coalesced_messages += len(messages) - len(kept)
+        return kept
+
+    def register_input(
+        self,
+        dev_id,
+        dev,
+        admin=False,
+        watchdog_timeout=None,
+        reset_order=0,
+        reset_timeout=INPUT_RESET_TIMEOUT,
+        mailbox=False,
+    ):
         """Registers a new routing
 
         :param dev_id: Input device id
@@ -235,8 +686,28 @@ class MultiSeatMessageRouter:
         :param admin: Describes if the input is for admin use only,
             defaults to False
         :type admin: bool, optional
+        :param watchdog_timeout: Watchdog timeout for this input in seconds,
+            None uses the default. Defaults to None
+        :type watchdog_timeout: int/float/None, optional
+        :param reset_order: Inputs with lower reset_order are reset first,
+            defaults to 0
+        :type reset_order: int, optional
+        :param reset_timeout: Max seconds to wait for the input's reset,
+            defaults to INPUT_RESET_TIMEOUT
+        :type reset_timeout: int/float/None, optional
+        :param mailbox: Handle the commands in a per-seat mailbox,
+            defaults to False
+        :type mailbox: bool, optional
         """
-        self.router.register_input(dev_id, dev, admin)
+        self.router.register_input(
+            dev_id,
+            dev,
+            admin,
+            watchdog_timeout,
+            reset_order,
+            reset_timeout,
+            mailbox,
+        )
 
     def unregister_input(self, dev_id):
         self.router.unregister_input(dev_id)
@@ -274,6 +745,7 @@ class MultiSeatMessageRouter:
                 self.seat_statuses[seat] = SeatStatus(False, client_type)
             else:
                 self.seat_statuses[seat].clientType = client_type
+            self._update_routes()
 
             admin_info = "admin " if client_type == "admin" else ""
             logging.info(
@@ -284,6 +756,7 @@ class MultiSeatMessageRouter:
             try:
                 seat = self.route_mappings[msg.payload["id"]]
                 del self.route_mappings[msg.payload["id"]]
+                self._update_routes()
                 logging.info(f"Removed route from {msg.payload['id']}")
                 self.router.trigger_watchdog_reset(seat)
             except KeyError:
@@ -326,6 +799,7 @@ class MultiSeatMessageRouter:
         :type enabled: bool
         """
         self.seat_statuses[seat].enabled = enabled
+        self._update_routes()
         if not enabled:
             self.router.trigger_watchdog_reset(seat)
 
@@ -0,0 +1,319 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum, auto
+from typing import Any, Callable, Optional
+
+DEFAULT_QUEUE_SIZE = 256
+REPLAY_BUFFER_SIZE = 64
+# Smoothing factor for the exponential moving average of send latency
+STATS_SMOOTHING = 0.1
+
+
+class SendPolicy(Enum):
+    """What to do with an outbound message that can't be sent right away"""
+
+    # Dropped when the queue is full or socketio is not connected
+    DROP = auto()
+    # Replaces the queued message with the same event and seat, otherwise
+    # handled like DROP
+    OVERWRITE = auto()
+    # Never dropped because of a full queue, and sent again after
+    # reconnecting if socketio was not connected
+    KEEP = auto()
+
+
+DEFAULT_SEND_POLICIES = {
+    "scoreUpdate": SendPolicy.KEEP,
+    "playingEnded": SendPolicy.KEEP,
+    "lapDone": SendPolicy.KEEP,
+    "preGameReady": SendPolicy.KEEP,
+    "setCurrentPlayer": SendPolicy.KEEP,
+    "progress": SendPolicy.OVERWRITE,
+    "botHealthState": SendPolicy.OVERWRITE,
+}
+
+
+@dataclass
+class QueuedMessage:
+    event: str
+    seat: int
+    src: Optional[str]
+    payload: Any
+    callback: Optional[Callable]
+    policy: SendPolicy
+    queued_at: float
+
+
+# Queued after the messages sent before reconnecting, see MessageSender.replay
+_REPLAY = object()
+
+
+class MessageSender:
+    """Sends outbound messages from a bounded queue in a single task
+
+    put() may be called from any thread, it never blocks. What happens to
+    a message when the queue is full or socketio is disconnected depends on
+    the SendPolicy of its event.
+
+    :param send: Coroutine function with signature
+        send(event, seat, src=None, payload={}, callback=None), which returns
+        False if the message could not be sent
+    :type send: Function
+    :param is_connected: Function returning whether messages can be sent
+    :type is_connected: Function
+    :param queue_size: Max number of queued DROP and OVERWRITE messages,
+        defaults to DEFAULT_QUEUE_SIZE
+    :type queue_size: int, optional
+    :param replay_size: Max number of KEEP messages stored for sending
+        after reconnecting, defaults to REPLAY_BUFFER_SIZE
+    :type replay_size: int, optional
+    """
+
+    def __init__(
+        self,
+        send,
+        is_connected,
+        queue_size=DEFAULT_QUEUE_SIZE,
+        replay_size=REPLAY_BUFFER_SIZE,
+    ):
+        self._send = send
+        self._is_connected = is_connected
+        self._queue_size = queue_size
+        self._replay_buffer = deque(maxlen=replay_size)
+        # KEEP messages and replay markers which did not fit the queue
+        self._overflow = deque()
+        # queued OVERWRITE messages by (event, seat)
+        self._overwritable = {}
+        self.policies = dict(DEFAULT_SEND_POLICIES)
+        self._queue = None
+        self._loop = None
+        self._task = None
+        self._stats = {
+            "sent": 0,
+            "dropped": 0,
+            "overwritten": 0,
+            "replayed": 0,
+            "send_latency": None,
+            "max_send_latency": 0.0,
+        }
+
+    def start(self):
+        """Start the sender task on the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(self._queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout):
+        """Send the queued messages in timeout seconds and stop the task"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(
+                f"{self._queue.qsize() + len(self._overflow)} outbound "
+                f"messages not sent in {timeout} seconds"
+            )
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def set_policy(self, event, policy):
+        assert isinstance(policy, SendPolicy), "'policy' has to be SendPolicy"
+        self.policies[event] = policy
+
+    def get_stats(self):
+        """Returns counters of the outbound messages
+
+        send_latency is an exponential moving average of the time from
+        put() to sending, in seconds, and None until the first message.
+
+        :return: Stats with keys queue_depth, replay_depth, sent, dropped,
+            overwritten, replayed, send_latency and max_send_latency
+        :rtype: dict
+        """
+        queue_depth = len(self._overflow)
+        if self._queue is not None:
+            queue_depth += self._queue.qsize()
+        return {
+            "queue_depth": queue_depth,
+            "replay_depth": len(self._replay_buffer),
+            **self._stats,
+        }
+
+    def put(self, event, seat=0, src=None, payload={}, callback=None):
+        """Queue a message for sending, thread-safe"""
+        if self._task is None:
+            logging.info(f"Did not send {event}: sender not running")
+            self._stats["dropped"] += 1
+            return
+        msg = QueuedMessage(
+            event,
+            seat,
+            src,
+            payload,
+            callback,
+            self.policies.get(event, SendPolicy.DROP),
+            time.monotonic(),
+        )
+        self._call_in_loop(self._put, msg)
+
+    def send_failed(self, event, seat=0, src=None, payload={}, callback=None):
+        """Report a message which send accepted but could not send later
+
+        For example a coalesced message which was flushed after
+        disconnecting. KEEP messages are sent again after reconnecting,
+        the others are counted as dropped. Thread-safe.
+        """
+        if self._task is None:
+            return
+        msg = QueuedMessage(
+            event,
+            seat,
+            src,
+            payload,
+            callback,
+            self.policies.get(event, SendPolicy.DROP),
+            time.monotonic(),
+        )
+        self._call_in_loop(self._send_failed, msg)
+
+    def replay(self):
+        """Send the stored KEEP messages, call after reconnecting
+
+        The messages are sent after the messages queued before this call,
+        and before the KEEP messages queued after it.
+        """
+        if self._task is not None:
+            self._call_in_loop(self._put_unbounded, _REPLAY)
+
+    def _call_in_loop(self, fun, *args):
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            fun(*args)
+        else:
+            self._loop.call_soon_threadsafe(fun, *args)
+
+    def _put(self, msg):
+        if msg.policy is SendPolicy.OVERWRITE:
+            queued = self._overwritable.get((msg.event, msg.seat))
+            if queued is not None:
+                # keep the place in the queue, but send the newest content
+                queued.src = msg.src
+                queued.payload = msg.payload
+                queued.callback = msg.callback
+                self._stats["overwritten"] += 1
+                return
+
+        if msg.policy is SendPolicy.KEEP:
+            self._put_unbounded(msg)
+        elif self._queue.full():
+            logging.debug(f"Outbound queue full, dropped {msg.event}")
+            self._stats["dropped"] += 1
+            return
+        else:
+            self._queue.put_nowait(msg)
+
+        if msg.policy is SendPolicy.OVERWRITE:
+            self._overwritable[(msg.event, msg.seat)] = msg
+
+    def _put_unbounded(self, item):
+        if len(self._overflow) > 0 or self._queue.full():
+            self._overflow.append(item)
+        else:
+            self._queue.put_nowait(item)
+
+    def _refill(self):
+        while len(self._overflow) > 0 and not self._queue.full():
+            self._queue.put_nowait(self._overflow.popleft())
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            try:
+                self._refill()
+                if item is _REPLAY:
+                    await self._replay()
+                else:
+                    if item.policy is SendPolicy.OVERWRITE:
+                        del self._overwritable[(item.event, item.seat)]
+                    await self._send_message(item)
+            finally:
+                self._queue.task_done()
+
+    async def _replay(self):
+        while len(self._replay_buffer) > 0:
+            if not self._is_connected():
+                return
+            msg = self._replay_buffer.popleft()
+            if await self._send_message(msg, replayed=True):
+                self._stats["replayed"] += 1
+
+    async def _send_message(self, msg, replayed=False):
+        # older KEEP messages wait for replay, the order must not change
+        if not self._is_connected() or (
+            msg.policy is SendPolicy.KEEP
+            and len(self._replay_buffer) > 0
+            and not replayed
+        ):
+            self._not_sent(msg, replayed)
+            return False
+
+        try:
+            sent = await self._send(
+                msg.event,
+                msg.seat,
+                src=msg.src,
+                payload=msg.payload,
+                callback=msg.callback,
+            )
+        except Exception as e:
+            logging.warning(f"Sending {msg.event} failed: {e}")
+            sent = False
+        if sent is False:
+            self._not_sent(msg, replayed)
+            return False
+
+        latency = time.monotonic() - msg.queued_at
+        self._stats["sent"] += 1
+        self._stats["max_send_latency"] = max(
+            self._stats["max_send_latency"], latency
+        )
+        old = self._stats["send_latency"]
+        if old is None:
+            self._stats["send_latency"] = latency
+        else:
+            self._stats["send_latency"] = old + STATS_SMOOTHING * (
+                latency - old
+            )
+        return True
+
+    def _send_failed(self, msg):
+        # was counted as sent when send accepted it
+        self._stats["sent"] -= 1
+        self._not_sent(msg, False)
+
+    def _not_sent(self, msg, replayed):
+        if msg.policy is not SendPolicy.KEEP:
+            self._stats["dropped"] += 1
+            return
+        if replayed:
+            # was just taken from the buffer, so there is room for it
+            self._replay_buffer.appendleft(msg)
+            return
+        if len(self._replay_buffer) == self._replay_buffer.maxlen:
+            logging.warning(
+                "Outbound replay buffer full, dropped "
+                f"{self._replay_buffer[0].event}"
+            )
+            self._stats["dropped"] += 1
+        self._replay_buffer.append(msg)
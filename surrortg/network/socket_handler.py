@@ -1,35 +1,86 @@
 import asyncio
-import json
 import logging
 import os
 import socket
 import sys
+import time
 import traceback
-from dataclasses import asdict, dataclass, field
+from dataclasses import dataclass, field
 from signal import SIGINT
 from typing import Any, Dict, Optional
 
 import socketio
 
+from .codec import (
+    WIRE_FORMAT_JSON,
+    CodecError,
+    available_wire_formats,
+    get_codec,
+    get_wire_codec,
+    sniff_wire_format,
+)
+from .connection_state import Backoff, ConnectionState
+from .message_coalescer import MessageCoalescer
+
 # Socketio sleep when connecting fails.
 # Starting from MIN_SLEEP, sleep always doubles with a connection failure,
-# but it does not get larger than MAX_SLEEP
+# but it does not get larger than MAX_SLEEP. A random part of the sleep is
+# skipped, see Backoff
 SOCKETIO_CONNECTION_MIN_SLEEP = 1
 SOCKETIO_CONNECTION_MAX_SLEEP = 60
 SOCKETIO_WAIT_FOR_CONNECTED_TIMEOUT = 10
+# Connections lasting this many seconds reset the reconnect backoff, so a
+# robot which was connected for a while reconnects right away
+SOCKETIO_STABLE_CONNECTION_TIME = 30
 
 SOCKETIO_NAMESPACE = "/signaling"
 LOCAL_SOCKET_NAME = "/tmp/.srtg-sock"
 
 LOCAL_SOCKET_RECONNECT_TIMEOUT = 5
+# Size of the reused receive buffer, the max local socket message size
+LOCAL_SOCKET_RECV_SIZE = 65535
+# Max messages read at once before handling them, so that a fast sender
+# can't keep the receive loop from handing the messages over
+LOCAL_SOCKET_MAX_BATCH = 64
+# Wire format negotiation with the local socket peer: the offer lists the
+# formats in preference order, the peer answers with the one it selected
+EVENT_CODEC_OFFER = "codecOffer"
+EVENT_CODEC_SELECT = "codecSelect"
+LOCAL_SOCKET_PEER = "localPeer"
 
 
 class MessageValidationError(Exception):
-    pass
+    """Raised when Message fields have invalid types
+
+    :param errors: Description of each invalid field
+    :type errors: list of str/str
+    """
+
+    def __init__(self, errors):
+        if isinstance(errors, str):
+            errors = [errors]
+        self.errors = errors
+        super().__init__(" ".join(errors))
+
+
+# Message field: allowed types, in the order of the Message arguments
+MESSAGE_FIELD_TYPES = {
+    "event": (str,),
+    "dst": (str,),
+    "src": (type(None), str),
+    "seat": (int,),
+    "payload": (dict, list),
+    "isAdmin": (bool,),
+}
+_MESSAGE_FIELDS = tuple(MESSAGE_FIELD_TYPES.items())
+# Message's payload default, a new dict for each message
+_NO_PAYLOAD = object()
 
 
 @dataclass
-class Message:
+class _MessageFields:
+    """The fields of Message, which used to be a dataclass"""
+
     event: str
     dst: str
     src: Optional[str] = None
@@ -37,34 +88,186 @@ class Message:
     payload: Optional[Dict[Any, Any]] = field(default_factory=dict)
     isAdmin: Optional[bool] = False  # noqa: N815
 
-    def __post_init__(self):
-        self._validate("event", self.event, str)
-        self._validate("dst", self.dst, str)
-        self._validate("src", self.src, type(None), str)
-        self._validate("seat", self.seat, int)
-        self._validate("payload", self.payload, dict, list)
-        self._validate("isAdmin", self.isAdmin, bool)
-
-    def _validate(self, name, value, *types):
-        if not isinstance(value, types):
-            raise MessageValidationError(
-                f"Message.{name} has to be of type {types}. "
-                f"Is now {type(value)} (value: {value})"
-            )
+
+def _validate_message_fields(
+    event, dst, src, seat, payload, isAdmin  # noqa: N803
+):
+    """Raises MessageValidationError listing all the invalid fields"""
+    # exact types first, subclasses are checked by the full validation
+    if (
+        type(event) is str
+        and type(dst) is str
+        and (src is None or type(src) is str)
+        and type(seat) is int
+        and (type(payload) is dict or type(payload) is list)
+        and type(isAdmin) is bool
+    ):
+        return
+    errors = [
+        f"Message.{name} has to be of type {types}. "
+        f"Is now {type(value)} (value: {value})"
+        for (name, types), value in zip(
+            _MESSAGE_FIELDS, (event, dst, src, seat, payload, isAdmin)
+        )
+        if not isinstance(value, types)
+    ]
+    if len(errors) > 0:
+        raise MessageValidationError(errors)
+
+
+class Message:
+    """Message between the controller and the game engine or a local peer
+
+    The field types are validated once, when the message is created.
+    Messages created by the SDK itself can skip the validation by using
+    Message.trusted().
+
+    The encoded form and repr of a message are cached, so forwarding or
+    logging a message again does not encode it again. Assigning a field
+    drops the cache, but modifying the payload in place does not, so copy
+    the payload instead of modifying a message which has been sent.
+    """
+
+    # received_at is the time.perf_counter() time when the message was
+    # received, if recording receive times is enabled, otherwise None
+    __slots__ = (*MESSAGE_FIELD_TYPES, "received_at", "_cache")
+    # keeps dataclasses.fields, asdict and replace working
+    __dataclass_fields__ = _MessageFields.__dataclass_fields__
+    __dataclass_params__ = _MessageFields.__dataclass_params__
+
+    def __init__(
+        self,
+        event,
+        dst,
+        src=None,
+        seat=0,
+        payload=_NO_PAYLOAD,
+        isAdmin=False,  # noqa: N803
+    ):
+        if payload is _NO_PAYLOAD:
+            payload = {}
+        _validate_message_fields(event, dst, src, seat, payload, isAdmin)
+        self.event = event
+        self.dst = dst
+        self.src = src
+        self.seat = seat
+        self.payload = payload
+        self.isAdmin = isAdmin
+        self.received_at = None
+        self._cache = None
+
+    @classmethod
+    def trusted(
+        cls,
+        event,
+        dst,
+        src=None,
+        seat=0,
+        payload=None,
+        isAdmin=False,  # noqa: N803
+    ):
+        """Creates a message without validating the fields
+
+        Only for messages whose field types are known to be valid.
+        """
+        msg = cls.__new__(cls)
+        msg.event = event
+        msg.dst = dst
+        msg.src = src
+        msg.seat = seat
+        msg.payload = {} if payload is None else payload
+        msg.isAdmin = isAdmin
+        msg.received_at = None
+        msg._cache = None
+        return msg
 
     @classmethod
     def from_dict(cls, dictionary):
+        get = dictionary.get
         return cls(
-            dictionary.get("event"),
-            dictionary.get("dst"),
-            src=dictionary.get("src"),
-            seat=dictionary.get("seat", 0),
-            payload=dictionary.get("payload", {}),
-            isAdmin=dictionary.get("isAdmin", False),
+            get("event"),
+            get("dst"),
+            get("src"),
+            get("seat", 0),
+            get("payload", {}),
+            get("isAdmin", False),
         )
 
     def to_dict(self):
-        return asdict(self)
+        """Returns the message as a dict
+
+        The payload is not copied.
+        """
+        return {
+            "event": self.event,
+            "dst": self.dst,
+            "src": self.src,
+            "seat": self.seat,
+            "payload": self.payload,
+            "isAdmin": self.isAdmin,
+        }
+
+    @property
+    def __dict__(self):
+        # keeps vars(message) working without an instance dict
+        return self.to_dict()
+
+    def encode(self, codec):
+        """Returns the message dict encoded with the codec, cached
+
+        :param codec: Codec from surrortg.network.codec
+        :type codec: JsonCodec/OrjsonCodec/MsgpackCodec
+        :return: Encoded message
+        :rtype: bytes
+        """
+        cache = self._get_cache()
+        encoded = cache.get(codec.name)
+        if encoded is None:
+            encoded = codec.encode(self.to_dict())
+            cache[codec.name] = encoded
+        return encoded
+
+    def _get_cache(self):
+        fields = (
+            self.event,
+            self.dst,
+            self.src,
+            self.seat,
+            self.payload,
+            self.isAdmin,
+        )
+        # the fields are compared by identity first, so this is cheap
+        if self._cache is None or self._cache[0] != fields:
+            self._cache = (fields, {})
+        return self._cache[1]
+
+    def __repr__(self):
+        cache = self._get_cache()
+        text = cache.get("repr")
+        if text is None:
+            text = (
+                f"Message(event={self.event!r}, dst={self.dst!r}, "
+                f"src={self.src!r}, seat={self.seat!r}, "
+                f"payload={self.payload!r}, isAdmin={self.isAdmin!r})"
+            )
+            cache["repr"] = text
+        return text
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.received_at = None
+        self._cache = None
 
 
 class SocketioNamespace(socketio.AsyncClientNamespace):
@@ -82,7 +285,11 @@ class SocketioNamespace(socketio.AsyncClientNamespace):
     ):
         self.message_handler = message_handler
         self.on_connect_handler = on_connect_handler
-        self.connected = False
+        self.record_receive_times = False
+        self.state = ConnectionState()
+        self._backoff = Backoff(
+            SOCKETIO_CONNECTION_MIN_SLEEP, SOCKETIO_CONNECTION_MAX_SLEEP
+        )
         self.socketio_logger = self._get_logger(
             "socketio", socketio_logging_level
         )
@@ -105,6 +312,17 @@ class SocketioNamespace(socketio.AsyncClientNamespace):
             url += f"{key}={value}&"
         return url[:-1]
 
+    @property
+    def connected(self):
+        return self.state.connected
+
+    @connected.setter
+    def connected(self, connected):
+        if connected:
+            self.state.set_connected()
+        else:
+            self.state.set_disconnected()
+
     def _get_logger(self, name, level):
         logger = logging.getLogger(name)
         if level is None:
@@ -123,9 +341,14 @@ class SocketioNamespace(socketio.AsyncClientNamespace):
         self.connected = False
 
     async def on_message(self, data, *args):
+        self.state.message_received()
+        received_at = (
+            time.perf_counter() if self.record_receive_times else None
+        )
         msg = None
         try:
             msg = Message.from_dict(data)
+            msg.received_at = received_at
             return await self.message_handler(msg)
         except MessageValidationError as e:
             logging.warning(f"Message validation failed: {e}")
@@ -158,6 +381,8 @@ class SocketioNamespace(socketio.AsyncClientNamespace):
                 f"Sending message {msg} failed, "
                 f"{SOCKETIO_NAMESPACE} not connected"
             )
+            return False
+        return True
 
     async def run(self):
         # manually reconnect every time the socketio gets disconnected
@@ -165,17 +390,20 @@ class SocketioNamespace(socketio.AsyncClientNamespace):
         # but it cannot be interrupted or disconnected
         while True:
             await self._connect()
-
-            # check periodically if still connected
-            while self.connected:
-                await asyncio.sleep(0.5)
-
+            await self.state.wait_disconnected()
             await self.shutdown()
 
+            if self.state.last_connection_time >= (
+                SOCKETIO_STABLE_CONNECTION_TIME
+            ):
+                self._backoff.reset()
+            else:
+                # the connection keeps dropping, don't reconnect in a loop
+                await asyncio.sleep(self._backoff.next_sleep())
+
     async def _connect(self):
         logging.info("socketio: connecting...")
         last_exception = None
-        sleep = SOCKETIO_CONNECTION_MIN_SLEEP
         while True:
             try:
                 # create client
@@ -218,13 +446,11 @@ class SocketioNamespace(socketio.AsyncClientNamespace):
                 else:
                     logging.warning(f"socketio: did not connect, {e}")
                     last_exception = str(e)
-                await asyncio.sleep(sleep)
-                sleep = min(SOCKETIO_CONNECTION_MAX_SLEEP, sleep * 2)
+                await asyncio.sleep(self._backoff.next_sleep())
 
     async def _wait_for_connected(self):
         logging.info("socketio waiting for connected...")
-        while not self.connected:
-            await asyncio.sleep(0.1)
+        await self.state.wait_connected()
 
     async def shutdown(self):
         logging.info("socketio shutting down...")
@@ -238,14 +464,48 @@ class LocalSocketHandler:
 
     Messages are forwarded to the message router passed when constructing a
     LocalSocketHandler.
+
+    Messages are JSON encoded by default. When msgpack is installed,
+    MessagePack is offered to the peer after connecting, and used for
+    sending once the peer selects it. Received messages are decoded based
+    on their first byte, so either format can be received at any time.
+
+    :param socket_name: Path of the unix socket
+    :type socket_name: str
+    :param message_handler: Coroutine function called with each Message
+    :type message_handler: Function
+    :param codec: Name of the codec used before negotiation, see
+        surrortg.network.codec.CODECS. None uses the fastest available
+        JSON codec, defaults to None
+    :type codec: str/None, optional
+    :param batch_handler: Coroutine function called with the list of
+        messages received at once, instead of calling message_handler for
+        each message. Defaults to None
+    :type batch_handler: Function/None, optional
     """
 
-    def __init__(self, socket_name, message_handler):
+    def __init__(
+        self, socket_name, message_handler, codec=None, batch_handler=None
+    ):
         self.socket_name = socket_name
         self.message_handler = message_handler
+        self.batch_handler = batch_handler
+        self.record_receive_times = False
+        self._recv_buffer = bytearray(LOCAL_SOCKET_RECV_SIZE)
+        self._recv_view = memoryview(self._recv_buffer)
+        self.stats = {
+            "batches": 0,
+            "messages": 0,
+            "max_batch_size": 0,
+            "parse_failures": 0,
+        }
         self.sock = None
         self.connected = False
         self.message_id = 0
+        self.default_codec = get_codec(codec)
+        self.codec = self.default_codec
+        # wire format -> codec used for decoding
+        self._decoders = {self.codec.wire_format: self.codec}
 
     async def run(self):
         self.event_loop = asyncio.get_event_loop()
@@ -253,18 +513,37 @@ class LocalSocketHandler:
             await self.do_receive()
 
     async def do_receive(self):
-        """Selects socket and reads it when ready"""
+        """Waits until the socket is readable and handles all the messages
+
+        All the queued messages, up to LOCAL_SOCKET_MAX_BATCH, are read into
+        the same preallocated buffer and handled as a batch.
+        """
         if not self.connected:
             logging.info("Connecting..")
             await self.connect()
             logging.info("Connected: %s" % self.connected)
 
+        messages = []
         try:
-            data = await self.event_loop.sock_recv(self.sock, 65535)
-            if len(data) == 0:
+            size = await self.event_loop.sock_recv_into(
+                self.sock, self._recv_buffer
+            )
+            while size > 0:
+                self._add_message(
+                    messages,
+                    self._recv_view[:size],
+                    time.perf_counter() if self.record_receive_times else None,
+                )
+                if len(messages) >= LOCAL_SOCKET_MAX_BATCH:
+                    break
+                try:
+                    size = self.sock.recv_into(self._recv_buffer)
+                except BlockingIOError:
+                    break
+            else:
+                # an empty read without a break: the peer closed the socket
                 logging.info("Local socket disconnected")
                 self.connected = False
-                return
         except asyncio.CancelledError:
             raise
         except Exception:
@@ -273,8 +552,23 @@ class LocalSocketHandler:
                 f"\n{traceback.format_exc()}"
             )
             self.connected = False
+
+        self._count_batch(len(messages))
+        if len(messages) == 0:
             return
+        if self.batch_handler is not None:
+            msg_task = asyncio.create_task(self.batch_handler(messages))
+            msg_task.add_done_callback(self.msg_task_done_cb)
+        else:
+            for msg in messages:
+                msg_task = asyncio.create_task(self.message_handler(msg))
+                msg_task.add_done_callback(self.msg_task_done_cb)
+
+    def _add_message(self, messages, data, received_at=None):
+        """Parses data and appends the message to messages
 
+        Codec selections are handled here and not appended.
+        """
         msg = None
         try:
             parsed_data = self._parse_data(data)
@@ -285,12 +579,23 @@ class LocalSocketHandler:
                     logging.warning(f"Message validation failed: {e}")
         except Exception:
             logging.warning(
-                f"Failed to parse message: {data}\n\n{traceback.format_exc()}"
+                f"Failed to parse message: {bytes(data)}"
+                f"\n\n{traceback.format_exc()}"
             )
 
-        if msg is not None:
-            msg_task = asyncio.create_task(self.message_handler(msg))
-            msg_task.add_done_callback(self.msg_task_done_cb)
+        if msg is None:
+            self.stats["parse_failures"] += 1
+        elif not self._select_codec(msg):
+            msg.received_at = received_at
+            messages.append(msg)
+
+    def _count_batch(self, size):
+        if size > 0:
+            self.stats["batches"] += 1
+            self.stats["messages"] += size
+            self.stats["max_batch_size"] = max(
+                self.stats["max_batch_size"], size
+            )
 
     def msg_task_done_cb(self, fut):
         if not fut.cancelled() and fut.exception() is not None:
@@ -312,6 +617,7 @@ class LocalSocketHandler:
                 await self.event_loop.sock_connect(self.sock, self.socket_name)
                 self.connected = True
                 logging.info("Connected localsocket")
+                await self._offer_codecs()
             except asyncio.CancelledError:
                 raise
             except (ConnectionRefusedError, FileNotFoundError):
@@ -322,36 +628,84 @@ class LocalSocketHandler:
                 )
                 await asyncio.sleep(LOCAL_SOCKET_RECONNECT_TIMEOUT)
 
-    def _parse_data(self, data):
+    async def _offer_codecs(self):
+        # the peer may not know about codecs, so start with the default
+        self.codec = self.default_codec
+        formats = available_wire_formats()
+        if formats != [WIRE_FORMAT_JSON]:
+            await self.send(
+                Message.trusted(
+                    EVENT_CODEC_OFFER,
+                    LOCAL_SOCKET_PEER,
+                    payload={"formats": formats},
+                )
+            )
+
+    def _select_codec(self, msg):
+        """Switches the sending codec if msg is the peer's codec selection
+
+        :return: 'True' if the message was a codec selection
+        :rtype: bool
+        """
+        if msg.event != EVENT_CODEC_SELECT:
+            return False
+        wire_format = (
+            msg.payload.get("format")
+            if isinstance(msg.payload, dict)
+            else None
+        )
         try:
-            return json.loads(data.decode("utf-8"))
+            self.codec = get_wire_codec(wire_format)
+            logging.info(f"Local socket uses {wire_format} messages")
+        except CodecError as e:
+            logging.warning(f"Local socket codec not changed: {e}")
+        return True
 
-        except json.JSONDecodeError:
-            logging.warning(f"Received non-json message, discarding: {data}")
-        except UnicodeDecodeError:
-            logging.warning(
-                f"Received a non-unicode message, discarding: {data}"
-            )
-        except KeyError:
+    def _parse_data(self, data):
+        wire_format = sniff_wire_format(data)
+        try:
+            codec = self._decoders.get(wire_format)
+            if codec is None:
+                codec = get_wire_codec(wire_format)
+                self._decoders[wire_format] = codec
+            parsed_data = codec.decode(data)
+        except CodecError as e:
+            logging.warning(f"{e}, discarding: {bytes(data)}")
+            return None
+        if not isinstance(parsed_data, dict):
             logging.warning(
-                f"Received malformed LocalSocketMessage, discarding: {data}"
+                "Received malformed LocalSocketMessage, discarding: "
+                f"{bytes(data)}"
             )
-        return None
+            return None
+        return parsed_data
 
     async def send(self, msg):
-        await self.event_loop.sock_sendall(
-            self.sock, str.encode(json.dumps(self._wrap_message(msg)))
-        )
+        """Sends a message to the local peer
+
+        :param msg: Message, or a message dict
+        :type msg: Message/dict
+        """
+        if isinstance(msg, Message):
+            # reuses the encoded message if it has been encoded before
+            data = self.codec.encode_envelope(
+                self._next_message_id(), msg.encode(self.codec)
+            )
+        else:
+            data = self.codec.encode(self._wrap_message(msg))
+        await self.event_loop.sock_sendall(self.sock, data)
 
-    def _wrap_message(self, msg):
+    def _next_message_id(self):
         # increment message_id
         if self.message_id != 0xFFFFFFFF:
             self.message_id += 1
         else:
             self.message_id = 0
+        return self.message_id
 
+    def _wrap_message(self, msg):
         return {
-            "id": self.message_id,
+            "id": self._next_message_id(),
             "response": False,
             "payload": msg,
         }
@@ -371,6 +725,19 @@ class SocketHandler:
     :param socketio_logging_level: both socketio and engineio logging level,
         None disables all logging, defaults to logging.WARNING
     :type socketio_logging_level: Int/None, optional
+    :param coalesce_window: If set, frequent socketio messages like progress
+        and score updates are coalesced for this many seconds before sending,
+        see MessageCoalescer. None sends every message, defaults to None
+    :type coalesce_window: float/None, optional
+    :param batch_filter: Function called with the list of messages received
+        at once from the local socket, returning the messages to handle.
+        Can be used to drop superseded messages. None handles all the
+        messages, defaults to None
+    :type batch_filter: Function/None, optional
+    :param coalesce_failed_callback: Function called with the message dict
+        and callback of a coalesced message which could not be sent when
+        it was flushed, defaults to None
+    :type coalesce_failed_callback: Function/None, optional
     """
 
     def __init__(
@@ -381,6 +748,9 @@ class SocketHandler:
         response_callbacks={},
         socketio_connect_callback=lambda: None,
         socketio_logging_level=logging.WARNING,
+        coalesce_window=None,
+        batch_filter=None,
+        coalesce_failed_callback=None,
     ):
         self.message_callbacks = message_callbacks
         self.response_callbacks = response_callbacks
@@ -393,12 +763,26 @@ class SocketHandler:
             socketio_logging_level,
             socketio_logging_level,
         )
+        self.batch_filter = batch_filter
         self.local_socket_handler = LocalSocketHandler(
-            LOCAL_SOCKET_NAME, self._handle_message
+            LOCAL_SOCKET_NAME,
+            self._handle_message,
+            batch_handler=self._handle_batch,
+        )
+        self.coalescer = (
+            MessageCoalescer(
+                self._send_socketio_message,
+                coalesce_window,
+                on_failed=coalesce_failed_callback,
+            )
+            if coalesce_window is not None
+            else None
         )
 
     async def run(self):
         self.event_loop = asyncio.get_event_loop()
+        if self.coalescer is not None:
+            self.coalescer.start(self.event_loop)
 
         if self.local_socket_handler is None:
             await self.socketio_namespace.run()
@@ -419,6 +803,12 @@ class SocketHandler:
         # otherwise use the regular callbacks
         await asyncio.gather(*[mcb(msg) for mcb in self.message_callbacks])
 
+    async def _handle_batch(self, messages):
+        if self.batch_filter is not None:
+            messages = self.batch_filter(messages)
+        # handled concurrently like the messages received one by one
+        await asyncio.gather(*[self._handle_message(msg) for msg in messages])
+
     def _get_response_callback(self, msg):
         for checker, cb in self.response_callbacks.items():
             if checker(msg):
@@ -436,7 +826,13 @@ class SocketHandler:
             msg = self._create_message(
                 event, dst, seat, src=src, payload=payload
             )
-            await self.socketio_namespace.send_message(msg, callback=callback)
+            if self.coalescer is not None:
+                # failures are reported to coalesce_failed_callback
+                self.coalescer.add(msg, callback=callback)
+                return True
+            return await self.socketio_namespace.send_message(
+                msg, callback=callback
+            )
         else:
             return False
 
@@ -458,11 +854,32 @@ class SocketHandler:
         else:
             return False
 
+    def set_record_receive_times(self, enabled):
+        """Sets whether Message.received_at is set for received messages"""
+        self.socketio_namespace.record_receive_times = enabled
+        if self.local_socket_handler is not None:
+            self.local_socket_handler.record_receive_times = enabled
+
+    async def flush_socketio(self):
+        """Send the socketio messages held for coalescing now"""
+        if self.coalescer is not None:
+            await self.coalescer.flush()
+
+    async def _send_socketio_message(self, msg, callback=None):
+        if not self.socketio_namespace.connected:
+            # counted as failed by the coalescer
+            logging.warning(
+                f"Did not send coalesced {msg['event']}: "
+                "socketio not connected"
+            )
+            return False
+        return await self.socketio_namespace.send_message(
+            msg, callback=callback
+        )
+
     async def send_local(self, event, dst, seat, src=None, payload={}):
         if self._local_socket_ok():
-            msg = self._create_message(
-                event, dst, seat, src=src, payload=payload
-            )
+            msg = Message(event, dst, src=src, seat=seat, payload=payload)
             await self.local_socket_handler.send(msg)
         else:
             return False
@@ -500,6 +917,7 @@ class SocketHandler:
 
     async def shutdown(self):
         """Shuts down SocketHandler gracefully with logging"""
+        await self.flush_socketio()
         await self.socketio_namespace.shutdown()
         if self.local_socket_handler is not None:
             self.local_socket_handler.shutdown()
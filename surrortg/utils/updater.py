@@ -375,10 +375,16 @@ if __name__ == "__main__":
         logging.info(f"Connecting to {ge_config['url']}")
 
         loop.run_until_complete(api_client.connect())
+
+        async def register_updater():
+            await api_client.send(
+                "registerUpdater", {"robot": config["device_id"]}
+            )
+
         logging.info("Registering updater..")
-        loop.run_until_complete(
-            api_client.send("registerUpdater", {"robot": config["device_id"]})
-        )
+        loop.run_until_complete(register_updater())
+        # the game engine forgets the registration when disconnected
+        api_client.add_reconnect_callback(register_updater)
 
         logging.info("Registered updater..")
         loop.run_until_complete(api_client.run())
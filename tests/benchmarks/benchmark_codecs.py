@@ -0,0 +1,96 @@
+"""Compares the local socket codecs on typical message shapes
+
+Encodes outbound messages the way LocalSocketHandler.send does, and decodes
+inbound messages the way LocalSocketHandler._parse_data does. Codecs whose
+packages are not installed are skipped.
+
+Run from the repository root:
+    python tests/benchmarks/benchmark_codecs.py
+"""
+import time
+
+from surrortg.network.codec import CODECS, available_codecs, get_codec
+from surrortg.network.socket_handler import Message
+
+NUM_ROUNDS = 20000
+
+MESSAGES = {
+    "gameControls": Message(
+        "gameControls",
+        "robot",
+        src="peer0",
+        seat=0,
+        payload={
+            "type": "joystick",
+            "id": "joystick_main",
+            "command": {"x": 0.42, "y": -0.87},
+        },
+    ),
+    "scoreUpdate": Message(
+        "scoreUpdate",
+        "gameEngine",
+        seat=1,
+        payload={
+            "scores": {f"player{i}": i * 1.5 for i in range(4)},
+            "final": False,
+            "endGame": False,
+        },
+    ),
+    "config": Message(
+        "config",
+        "robot",
+        src="gameEngine",
+        payload={
+            "robots": [
+                {"id": f"robot{i}robot", "seat": i, "enabled": True}
+                for i in range(8)
+            ],
+            "customConfig": {
+                "difficulty": {
+                    "value": "hard",
+                    "valueType": "string",
+                    "title": "Difficulty",
+                    "options": ["easy", "medium", "hard"],
+                },
+                "laps": {"value": 3, "valueType": "number", "min": 1},
+            },
+            "set": 0,
+        },
+    ),
+}
+
+
+def wrap(msg):
+    return {"id": 1, "response": False, "payload": msg.to_dict()}
+
+
+def measure(fun, arg):
+    start = time.perf_counter()
+    for _ in range(NUM_ROUNDS):
+        fun(arg)
+    return (time.perf_counter() - start) / NUM_ROUNDS * 1e6
+
+
+def main():
+    installed = available_codecs()
+    skipped = [name for name in CODECS if name not in installed]
+    if len(skipped) > 0:
+        print(f"Not installed, skipped: {', '.join(skipped)}")
+    print(
+        f"{'codec':<10}{'message':<14}{'bytes':>7}{'enc us':>9}{'dec us':>9}"
+    )
+    for name in installed:
+        codec = get_codec(name)
+        for shape, msg in MESSAGES.items():
+            data = codec.encode(wrap(msg))
+            inbound = codec.encode(msg.to_dict())
+            encode_us = measure(lambda m: codec.encode(wrap(m)), msg)
+            decode_us = measure(codec.decode, inbound)
+            print(
+                f"{name:<10}{shape:<14}{len(data):>7}"
+                f"{encode_us:>9.2f}{decode_us:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
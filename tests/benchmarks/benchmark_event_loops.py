@@ -0,0 +1,143 @@
+"""Compares the asyncio and uvloop event loops on the input message paths
+
+The router path routes messages straight to MultiSeatMessageRouter, the
+socket handler path sends them through a local SEQPACKET socket pair to
+LocalSocketHandler, which hands the batches to the router. uvloop is
+skipped if not installed.
+
+Run from the repository root:
+    python tests/benchmarks/benchmark_event_loops.py
+"""
+import asyncio
+import json
+import socket
+import time
+
+from surrortg.event_loop import get_event_loop_policy, uvloop
+from surrortg.inputs import Input
+from surrortg.network.message_router import MultiSeatMessageRouter
+from surrortg.network.socket_handler import LocalSocketHandler, Message
+
+NUM_SEATS = 4
+NUM_INPUTS = 8
+NUM_MESSAGES = 100000
+# datagrams sent before reading, stays below the socket buffer size
+SEND_CHUNK = 100
+
+
+class MockInput(Input):
+    async def _on_input(self, command, seat):
+        pass
+
+    async def reset(self, seat):
+        pass
+
+    def get_name(self):
+        return "MockInput"
+
+    def _get_default_keybinds(self):
+        return {}
+
+
+async def setup_router():
+    router = MultiSeatMessageRouter(lambda msg: None)
+    for i in range(NUM_INPUTS):
+        router.register_input(f"input{i}", MockInput())
+    for seat in range(NUM_SEATS):
+        await router.handle_message(
+            Message(
+                "newPeer",
+                "robot",
+                src="gameEngine",
+                payload={
+                    "id": f"peer{seat}",
+                    "seat": seat,
+                    "clientType": "player",
+                },
+            )
+        )
+    router.set_enabled_all(True)
+    router.router.set_watchdog_timeout(None)
+    return router
+
+
+def message_dict(i):
+    return {
+        "event": "gameControls",
+        "dst": "robot",
+        "src": f"peer{i % NUM_SEATS}",
+        "payload": {
+            "type": "mock",
+            "id": f"input{i % NUM_INPUTS}",
+            "command": {"x": 0.5, "y": -0.5},
+        },
+    }
+
+
+async def router_path():
+    router = await setup_router()
+    messages = [Message.from_dict(message_dict(i)) for i in range(1000)]
+    start = time.perf_counter()
+    for i in range(NUM_MESSAGES):
+        await router.handle_message(messages[i % len(messages)])
+    return time.perf_counter() - start
+
+
+async def socket_handler_path():
+    router = await setup_router()
+    handled = 0
+
+    async def batch_handler(messages):
+        nonlocal handled
+        handled += len(messages)
+        for msg in messages:
+            await router.handle_message(msg)
+
+    handler = LocalSocketHandler("", None, batch_handler=batch_handler)
+    handler.event_loop = asyncio.get_running_loop()
+    handler.sock, peer = socket.socketpair(
+        socket.AF_UNIX, socket.SOCK_SEQPACKET
+    )
+    handler.sock.setblocking(False)
+    handler.connected = True
+    datagrams = [json.dumps(message_dict(i)).encode() for i in range(1000)]
+
+    start = time.perf_counter()
+    for i in range(0, NUM_MESSAGES, SEND_CHUNK):
+        for j in range(i, i + SEND_CHUNK):
+            peer.send(datagrams[j % len(datagrams)])
+        while handled < i + SEND_CHUNK:
+            await handler.do_receive()
+            await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    peer.close()
+    handler.shutdown()
+    return elapsed
+
+
+def main():
+    loop_types = ["asyncio", "uvloop"]
+    if uvloop is None:
+        print("uvloop is not installed, skipped")
+        loop_types.remove("uvloop")
+    for loop_type in loop_types:
+        policy = get_event_loop_policy(loop_type)
+        previous_policy = asyncio.get_event_loop_policy()
+        if policy is not None:
+            asyncio.set_event_loop_policy(policy)
+        try:
+            for name, path in [
+                ("router", router_path),
+                ("socket handler", socket_handler_path),
+            ]:
+                elapsed = asyncio.run(path())
+                print(
+                    f"{loop_type:<8} {name:<15} {NUM_MESSAGES} messages in "
+                    f"{elapsed:.3f} s: {NUM_MESSAGES / elapsed:.0f} msgs/s"
+                )
+        finally:
+            asyncio.set_event_loop_policy(previous_policy)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Measures inbound control message throughput of MultiSeatMessageRouter
+
+Run from the repository root:
+    python tests/benchmarks/benchmark_message_router.py
+"""
+import asyncio
+import time
+
+from surrortg.inputs import Input
+from surrortg.network.message_router import MultiSeatMessageRouter
+from surrortg.network.socket_handler import Message
+
+NUM_SEATS = 4
+NUM_INPUTS = 8
+NUM_MESSAGES = 200000
+
+
+class MockInput(Input):
+    def __init__(self):
+        self.count = 0
+
+    async def _on_input(self, command, seat):
+        self.count += 1
+
+    async def reset(self, seat):
+        pass
+
+    def get_name(self):
+        return "MockInput"
+
+    def _get_default_keybinds(self):
+        return {}
+
+
+def create_router():
+    router = MultiSeatMessageRouter(lambda msg: None)
+    inputs = [MockInput() for _ in range(NUM_INPUTS)]
+    for i, dev in enumerate(inputs):
+        router.register_input(f"input{i}", dev)
+    return router, inputs
+
+
+async def route_messages(router):
+    for seat in range(NUM_SEATS):
+        await router.handle_message(
+            Message(
+                "newPeer",
+                "robot",
+                src="gameEngine",
+                payload={
+                    "id": f"peer{seat}",
+                    "seat": seat,
+                    "clientType": "player",
+                },
+            )
+        )
+    router.set_enabled_all(True)
+    messages = [
+        Message(
+            "gameControls",
+            "robot",
+            src=f"peer{i % NUM_SEATS}",
+            payload={"id": f"input{i % NUM_INPUTS}", "command": {"val": 1}},
+        )
+        for i in range(NUM_MESSAGES)
+    ]
+    start = time.perf_counter()
+    for msg in messages:
+        await router.handle_message(msg)
+    return time.perf_counter() - start
+
+
+def main():
+    router, inputs = create_router()
+    elapsed = asyncio.run(route_messages(router))
+    assert sum(dev.count for dev in inputs) == NUM_MESSAGES
+    print(
+        f"{NUM_MESSAGES} messages from {NUM_SEATS} seats to {NUM_INPUTS} "
+        f"inputs in {elapsed:.3f} s: {NUM_MESSAGES / elapsed:.0f} msgs/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
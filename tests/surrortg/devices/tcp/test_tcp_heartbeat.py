@@ -0,0 +1,186 @@
+import asyncio
+import sys
+import unittest
+from unittest.mock import Mock, patch
+
+# mock import hardware spesific libraries of surrortg.devices
+for name in ["adafruit_tcs34725", "pigpio"]:
+    sys.modules.setdefault(name, Mock())
+
+from surrortg.devices.tcp import (  # noqa: E402
+    TcpBot,
+    tcp_bot,
+    tcp_heartbeat,
+    tcp_pool,
+)
+from surrortg.devices.tcp.tcp_heartbeat import TcpHeartbeat  # noqa: E402
+
+
+class FakeEndpoint:
+    closed = False
+    address = ("127.0.0.1", 0)
+
+    def __init__(self):
+        self.sent = []
+
+    def send_nowait(self, data):
+        self.sent.append(data)
+
+
+async def wait_until(condition, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+
+
+class TcpHeartbeatTest(unittest.TestCase):
+    def test_link_states(self):
+        """Test RTT measurement and the degraded and dead states"""
+        endpoint = FakeEndpoint()
+        states = []
+        clock = [100.0]
+
+        async def step():
+            # with interval=0 the heartbeat runs once per loop iteration
+            for _ in range(3):
+                await asyncio.sleep(0)
+
+        async def main():
+            heartbeat = TcpHeartbeat(
+                endpoint,
+                states.append,
+                interval=0,
+                degraded_rtt=0.05,
+                dead_timeout=0.15,
+            )
+            heartbeat.start()
+            await step()
+            clock[0] = 100.01
+            heartbeat.reply_received(endpoint.sent[0][1])
+            self.assertAlmostEqual(heartbeat.rtt, 0.01)
+            # unknown replies are ignored
+            heartbeat.reply_received(endpoint.sent[0][1])
+            await step()
+            self.assertEqual(states, [])
+            # no more replies, late replies degrade the link before dead
+            clock[0] = 100.07
+            await step()
+            self.assertEqual(states, ["degraded"])
+            clock[0] = 100.17
+            await step()
+            self.assertEqual(states, ["degraded", "dead"])
+            pings = len(endpoint.sent)
+            await step()
+            self.assertEqual(len(endpoint.sent), pings)
+            return heartbeat.get_stats()
+
+        fake_time = Mock(perf_counter=lambda: clock[0])
+        with patch.object(tcp_heartbeat, "time", fake_time):
+            with self.assertLogs(level="INFO"):
+                stats = asyncio.run(main())
+        self.assertEqual(stats["state"], "dead")
+        self.assertEqual(stats["replies"], 1)
+        self.assertEqual(stats["unmatched_replies"], 1)
+        self.assertEqual(stats["count"], 1)
+
+
+class TcpBotHeartbeatTest(unittest.TestCase):
+    def test_heartbeat(self):
+        """Test that replying bots get an RTT and silent ones are dead"""
+
+        async def main():
+            async def echo(reader, writer):
+                while True:
+                    data = await reader.read(100)
+                    if len(data) == 0:
+                        break
+                    writer.write(data)
+                writer.close()
+
+            async def silent(reader, writer):
+                await reader.read()
+                writer.close()
+
+            echo_server = await asyncio.start_server(echo, "127.0.0.2", 0)
+            port = echo_server.sockets[0].getsockname()[1]
+            silent_server = await asyncio.start_server(
+                silent, "127.0.0.3", port
+            )
+            game_io = Mock()
+            bot = TcpBot(game_io)
+            link_states = []
+            bot.set_heartbeat(
+                interval=0.01,
+                dead_timeout=60,
+                link_state_cb=lambda *args: link_states.append(args),
+            )
+            config = {
+                "currentSet": 0,
+                "robots": [
+                    {"seat": 0, "custom": {"address": "127.0.0.2"}},
+                    {"seat": 1, "custom": {"address": "127.0.0.3"}},
+                ],
+            }
+            with patch.object(tcp_bot, "BOT_TCP_PORT", port):
+                await bot.handle_config(config)
+            await wait_until(lambda: bot.get_rtt(0) is not None)
+
+            # the silent bot has not replied for longer than dead_timeout
+            silent_heartbeat = bot._get_heartbeat(1)
+            silent_heartbeat._update_state(silent_heartbeat._replied_at + 61)
+            await wait_until(lambda: bot.endpoints[1].closed)
+
+            self.assertIsNone(bot.get_rtt(1))
+            self.assertIsNone(bot._get_heartbeat(1))
+            self.assertEqual(bot.get_link_stats()[0]["state"], "ok")
+            self.assertIn((1, "dead"), link_states)
+            game_io.send_state_dead.assert_called_once_with(1)
+
+            await bot.shutdown()
+            echo_server.close()
+            silent_server.close()
+
+        with self.assertLogs(level="ERROR"):
+            asyncio.run(main())
+
+    @patch.object(tcp_pool, "RETRY_MIN_SLEEP", 0.01)
+    def test_connection_reset(self):
+        """Test that a bot which closes the connection is reported dead"""
+
+        async def main():
+            connections = []
+
+            async def close_first(reader, writer):
+                connections.append(writer)
+                if len(connections) == 1:
+                    writer.close()
+                    return
+                await reader.read()
+                writer.close()
+
+            server = await asyncio.start_server(close_first, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            game_io = Mock()
+            bot = TcpBot(game_io)
+            config = {
+                "currentSet": 0,
+                "robots": [{"seat": 0, "custom": {"address": "127.0.0.1"}}],
+            }
+
+            async def on_receive(seat, cmd_id, cmd_val):
+                pass
+
+            with patch.object(tcp_bot, "BOT_TCP_PORT", port):
+                await bot.handle_config(config, bot_listener_cb=on_receive)
+            await wait_until(lambda: game_io.send_state_alive.called)
+
+            game_io.send_state_dead.assert_called_once_with(0)
+            game_io.send_state_alive.assert_called_once_with(0)
+            self.assertFalse(bot.endpoints[0].closed)
+
+            await bot.shutdown()
+            server.close()
+
+        with self.assertLogs(level="ERROR"):
+            asyncio.run(main())
@@ -0,0 +1,233 @@
+import asyncio
+import socket
+import sys
+import unittest
+from unittest.mock import Mock, patch
+
+# mock import hardware spesific libraries of surrortg.devices
+for name in ["adafruit_tcs34725", "pigpio"]:
+    sys.modules.setdefault(name, Mock())
+
+from surrortg.devices.tcp import (  # noqa: E402
+    TcpBot,
+    TcpSwitch,
+    tcp_bot,
+    tcp_pool,
+)
+from surrortg.devices.tcp.tcp_pool import TcpEndpointPool  # noqa: E402
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_bot_server(port=0):
+    connections = []
+
+    async def on_connect(reader, writer):
+        connections.append(writer)
+
+    server = await asyncio.start_server(on_connect, "127.0.0.1", port)
+    return server, server.sockets[0].getsockname()[1], connections
+
+
+class TcpEndpointPoolTest(unittest.TestCase):
+    def test_connect_reuse_and_release(self):
+        """Test that alive endpoints are reused and unused ones closed"""
+
+        async def main():
+            server_a, port_a, connections = await start_bot_server()
+            server_b, port_b, connections_b = await start_bot_server()
+            key_a, key_b = ("127.0.0.1", port_a), ("127.0.0.1", port_b)
+            pool = TcpEndpointPool()
+
+            endpoints = await pool.connect([key_a, key_b])
+            endpoint_a, endpoint_b = endpoints[key_a], endpoints[key_b]
+            self.assertTrue(endpoint_a.alive and endpoint_b.alive)
+
+            endpoints = await pool.connect([key_a])
+            self.assertEqual(endpoints, {key_a: endpoint_a})
+            self.assertTrue(endpoint_b.closed)
+
+            await endpoint_a.close()
+            endpoints = await pool.connect([key_a])
+            self.assertIsNot(endpoints[key_a], endpoint_a)
+            self.assertEqual(
+                pool.stats,
+                {"connects": 3, "reused": 1, "failed": 0, "retries": 0},
+            )
+
+            await pool.close()
+            self.assertTrue(endpoints[key_a].closed)
+            for server in (server_a, server_b):
+                server.close()
+            for writer in connections + connections_b:
+                writer.close()
+
+        asyncio.run(main())
+
+    def test_concurrent_connect(self):
+        """Test that the bots are connected concurrently"""
+        keys = [("127.0.0.1", port) for port in range(1000, 1004)]
+
+        async def unreachable(host, port, timeout):
+            await asyncio.sleep(0.1)
+            return None
+
+        async def main():
+            pool = TcpEndpointPool()
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            endpoints = await pool.connect(keys)
+            duration = loop.time() - start
+            await pool.close()
+            return endpoints, duration
+
+        with patch.object(tcp_pool, "open_tcp_endpoint", unreachable):
+            endpoints, duration = asyncio.run(main())
+        self.assertEqual(endpoints, {key: None for key in keys})
+        self.assertLess(duration, 0.2)
+
+    @patch.object(tcp_pool, "RETRY_MIN_SLEEP", 0.02)
+    def test_background_retry(self):
+        """Test that unreachable bots are retried in the background"""
+        port = get_free_port()
+        key = ("127.0.0.1", port)
+        reconnected = []
+
+        async def main():
+            pool = TcpEndpointPool(
+                on_reconnect=lambda *args: reconnected.append(args)
+            )
+            with self.assertLogs(level="ERROR"):
+                endpoints = await pool.connect([key])
+            self.assertIsNone(endpoints[key])
+
+            server, _, connections = await start_bot_server(port)
+            for _ in range(50):
+                if reconnected:
+                    break
+                await asyncio.sleep(0.02)
+            self.assertEqual(len(reconnected), 1)
+            self.assertEqual(reconnected[0][0], key)
+            self.assertIs(pool.get(key), reconnected[0][1])
+
+            await pool.close()
+            server.close()
+            for writer in connections:
+                writer.close()
+
+        asyncio.run(main())
+
+    @patch.object(tcp_pool, "RETRY_MIN_SLEEP", 0.01)
+    def test_cancelled_retry_closes_endpoint(self):
+        """Test that a retry cancelled while connecting closes the socket"""
+        endpoint = Mock(closed=False)
+
+        async def close():
+            endpoint.closed = True
+
+        endpoint.close = close
+        attempts = []
+
+        async def slow_connect(host, port, timeout):
+            attempts.append((host, port))
+            if len(attempts) == 1:
+                return None
+            await asyncio.sleep(0.05)
+            return endpoint
+
+        async def main():
+            pool = TcpEndpointPool()
+            await pool.connect([("127.0.0.1", 1000)])
+            while len(attempts) < 2:
+                await asyncio.sleep(0.01)
+            await pool.close()
+            await asyncio.sleep(0.1)
+
+        with patch.object(tcp_pool, "open_tcp_endpoint", slow_connect):
+            asyncio.run(main())
+        self.assertTrue(endpoint.closed)
+
+
+class TcpBotPoolTest(unittest.TestCase):
+    def test_config_keeps_connections(self):
+        """Test that a new config resets the inputs but keeps the sockets"""
+
+        async def main():
+            server, port, connections = await start_bot_server()
+            bot = TcpBot(Mock())
+            bot.add_inputs({"switch": TcpSwitch(1)})
+            config = {
+                "currentSet": 0,
+                "robots": [
+                    {"seat": 0, "custom": {"address": "127.0.0.1"}},
+                    {"seat": 1, "custom": {"address": "127.0.0.1"}},
+                ],
+            }
+            with patch.object(tcp_bot, "BOT_TCP_PORT", port):
+                await bot.handle_config(config)
+                endpoint = bot.endpoints[0]
+                self.assertIs(bot.endpoints[1], endpoint)
+                await bot.handle_config(config)
+            self.assertIs(bot.endpoints[0], endpoint)
+            self.assertTrue(endpoint.alive)
+            await asyncio.sleep(0.01)
+            self.assertEqual(len(connections), 1)
+
+            await bot.shutdown()
+            self.assertTrue(endpoint.closed)
+            self.assertEqual(bot.endpoints, {})
+            server.close()
+            for writer in connections:
+                writer.close()
+
+        asyncio.run(main())
+
+    def test_shared_endpoint_listener(self):
+        """Test that seats of one bot share a single listener task"""
+        received = []
+
+        async def on_receive(seat, cmd_id, cmd_val):
+            received.append((seat, cmd_id, cmd_val))
+
+        async def main():
+            server, port, connections = await start_bot_server()
+            bot = TcpBot(Mock())
+            config = {
+                "currentSet": 0,
+                "robots": [
+                    {"seat": 0, "custom": {"address": "127.0.0.1"}},
+                    {"seat": 1, "custom": {"address": "127.0.0.1"}},
+                ],
+            }
+            with patch.object(tcp_bot, "BOT_TCP_PORT", port):
+                await bot.handle_config(config, bot_listener_cb=on_receive)
+            endpoint = bot.endpoints[0]
+            # a late background reconnect replaces the listener
+            bot._on_bot_reconnected(endpoint.address, endpoint)
+            await asyncio.sleep(0.01)
+            running = [
+                task
+                for task in bot.bot_listener_tasks.values()
+                if not task.done()
+            ]
+            self.assertEqual(len(running), 1)
+
+            while len(connections) < 1:
+                await asyncio.sleep(0.01)
+            connections[0].write(bytes([5, 6]))
+            for _ in range(50):
+                if len(received) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            self.assertEqual(sorted(received), [(0, 5, 6), (1, 5, 6)])
+
+            await bot.shutdown()
+            server.close()
+            for writer in connections:
+                writer.close()
+
+        asyncio.run(main())
@@ -0,0 +1,137 @@
+import asyncio
+import socket
+import sys
+import unittest
+from unittest.mock import Mock
+
+# mock import hardware spesific libraries of surrortg.devices
+for name in ["adafruit_tcs34725", "pigpio"]:
+    sys.modules.setdefault(name, Mock())
+
+from surrortg.devices.tcp import TcpCommandId  # noqa: E402
+from surrortg.devices.tcp.tcp_joystick import TcpJoystick  # noqa: E402
+from surrortg.devices.tcp.tcp_protocol import (  # noqa: E402
+    WRITE_HIGH_WATER,
+    TcpEndpoint,
+    open_tcp_endpoint,
+)
+from surrortg.devices.tcp.tcp_switch import TcpSwitch  # noqa: E402
+
+
+class TcpEndpointTest(unittest.TestCase):
+    def test_send_nowait(self):
+        """Test that buffered commands are coalesced into one write"""
+
+        async def main():
+            received = asyncio.Queue()
+
+            async def on_connect(reader, writer):
+                while True:
+                    data = await reader.read(100)
+                    if len(data) == 0:
+                        break
+                    await received.put(data)
+                writer.close()
+
+            server = await asyncio.start_server(on_connect, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            endpoint = await open_tcp_endpoint("127.0.0.1", port)
+            sock = endpoint._writer.get_extra_info("socket")
+            self.assertTrue(
+                sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+            )
+
+            endpoint.send_nowait(bytes([TcpCommandId.THROTTLE, 100]))
+            endpoint.send_nowait(bytes([TcpCommandId.STEER, 120]))
+            endpoint.send_nowait(bytes([TcpCommandId.THROTTLE, 150]))
+            # buffered commands are written before the awaited send
+            await endpoint.send(bytes([TcpCommandId.STOP, 0]))
+            data = b""
+            while len(data) < 6:
+                data += await asyncio.wait_for(received.get(), 1)
+            self.assertEqual(data, bytes([1, 150, 3, 120, 255, 0]))
+
+            joystick = TcpJoystick(TcpCommandId.STEER, TcpCommandId.THROTTLE)
+            joystick.set_endpoints({0: endpoint})
+            await joystick.handle_coordinates(0.5, -0.5, 0)
+            data = await asyncio.wait_for(received.get(), 1)
+            self.assertEqual(data, bytes([3, 150, 1, 50]))
+
+            stats = endpoint.get_stats()
+            self.assertEqual(stats["packets_sent"], 3)
+            self.assertEqual(stats["commands_sent"], 5)
+            self.assertEqual(stats["commands_coalesced"], 1)
+            self.assertEqual(stats["bytes_sent"], 10)
+            self.assertGreater(stats["packets_per_second"], 0)
+
+            await endpoint.close()
+            server.close()
+
+        asyncio.run(main())
+
+    def stalled_endpoint(self):
+        writes = []
+        buffer_size = [WRITE_HIGH_WATER + 1]
+
+        async def drain():
+            # below the transport's own limit drain() returns at once
+            pass
+
+        writer = Mock()
+        writer.get_extra_info.return_value = None
+        writer.is_closing.return_value = False
+        writer.write = writes.append
+        writer.drain = drain
+        writer.transport.get_write_buffer_size = lambda: buffer_size[0]
+        endpoint = TcpEndpoint(Mock(), writer, "127.0.0.1", 0)
+        return writes, buffer_size, endpoint
+
+    def test_send_nowait_switch(self):
+        """Test that switch presses are not merged"""
+
+        async def main():
+            writes, buffer_size, endpoint = self.stalled_endpoint()
+            buffer_size[0] = 0
+            switch = TcpSwitch(TcpCommandId.CUSTOM_1)
+            switch.set_endpoints({0: endpoint})
+            await switch.on(0)
+            await switch.off(0)
+            await asyncio.sleep(0)
+            self.assertEqual(writes, [bytes([5, 1]), bytes([5, 0])])
+
+            # the press is written even while the commands are held
+            writes.clear()
+            buffer_size[0] = WRITE_HIGH_WATER + 1
+            endpoint.send_nowait(bytes([TcpCommandId.THROTTLE, 10]))
+            await switch.on(0)
+            await asyncio.sleep(0)
+            await switch.off(0)
+            await asyncio.sleep(0)
+            self.assertEqual(writes, [bytes([1, 10, 5, 1])])
+            buffer_size[0] = 0
+            await asyncio.sleep(0.05)
+            self.assertEqual(writes, [bytes([1, 10, 5, 1]), bytes([5, 0])])
+            self.assertEqual(endpoint.get_stats()["commands_coalesced"], 0)
+
+        asyncio.run(main())
+
+    def test_send_nowait_stalled(self):
+        """Test that commands are held and merged while the bot lags"""
+
+        async def main():
+            writes, buffer_size, endpoint = self.stalled_endpoint()
+
+            for value in range(10):
+                endpoint.send_nowait(bytes([TcpCommandId.THROTTLE, value]))
+                endpoint.send_nowait(bytes([TcpCommandId.STEER, value]))
+                await asyncio.sleep(0.002)
+            self.assertEqual(writes, [])
+
+            buffer_size[0] = 0
+            await asyncio.sleep(0.05)
+            self.assertEqual(writes, [bytes([1, 9, 3, 9])])
+            stats = endpoint.get_stats()
+            self.assertEqual(stats["deferred_flushes"], 1)
+            self.assertEqual(stats["commands_coalesced"], 18)
+
+        asyncio.run(main())
@@ -0,0 +1,125 @@
+import asyncio
+import sys
+import unittest
+from unittest.mock import Mock, patch
+
+# mock import hardware spesific libraries of surrortg.devices
+for name in ["adafruit_tcs34725", "pigpio"]:
+    sys.modules.setdefault(name, Mock())
+
+from surrortg.devices.udp import UdpBot, udp_bot  # noqa: E402
+from surrortg.devices.udp.udp_protocol import (  # noqa: E402
+    open_local_endpoint,
+    open_remote_endpoint,
+)
+from surrortg.devices.udp.udp_transmitter import COMMAND  # noqa: E402
+
+
+async def open_endpoints(**kwargs):
+    local = await open_local_endpoint("127.0.0.1", 0, **kwargs)
+    remote = await open_remote_endpoint(*local.address)
+    return local, remote
+
+
+async def send_all(remote, datagrams):
+    for data in datagrams:
+        remote.send(data)
+    # let the datagrams arrive
+    await asyncio.sleep(0.01)
+
+
+class UdpEndpointTest(unittest.TestCase):
+    def test_drop_oldest(self):
+        """Test that a full queue drops the oldest datagrams"""
+
+        async def main():
+            local, remote = await open_endpoints(
+                queue_size=2, drop_oldest=True
+            )
+            await send_all(remote, [b"1", b"2", b"3", b"4"])
+            received = [(await local.receive())[0] for _ in range(2)]
+            stats = local.stats
+            local.close()
+            remote.close()
+            return received, stats
+
+        received, stats = asyncio.run(main())
+        self.assertEqual(received, [b"3", b"4"])
+        self.assertEqual(stats, {"received": 4, "dropped": 2, "malformed": 0})
+
+    def test_handler(self):
+        """Test direct and batched handlers with a struct decoder"""
+
+        async def main():
+            local, remote = await open_endpoints()
+            received = []
+            local.set_handler(
+                lambda values, addr: received.append(values), COMMAND
+            )
+            await send_all(remote, [b"\x01\x02", b"\x01", b"\x03\x04"])
+            self.assertEqual(received, [(1, 2), (3, 4)])
+            self.assertEqual(local.stats["malformed"], 1)
+
+            batches = []
+            local.set_handler(batches.append, COMMAND, batch=True)
+            # datagrams received in the same loop iteration
+            local.feed_datagram(b"\x05\x06", remote.address)
+            local.feed_datagram(b"\x07\x08", remote.address)
+            self.assertEqual(batches, [])
+            await asyncio.sleep(0)
+            self.assertEqual(
+                [[values for values, _ in batch] for batch in batches],
+                [[(5, 6), (7, 8)]],
+            )
+            self.assertTrue(local._queue.empty())
+            local.close()
+            remote.close()
+
+        asyncio.run(main())
+
+
+class UdpBotListenerTest(unittest.TestCase):
+    def run_listener(self, bot_listener_cb, direct_listener):
+        async def main():
+            local = await open_local_endpoint("127.0.0.1", 0)
+            bot = UdpBot()
+            config = {
+                "currentSet": 0,
+                "robots": [
+                    {
+                        "seat": 0,
+                        "set": 0,
+                        "enabled": True,
+                        "custom": {"address": "127.0.0.1"},
+                    }
+                ],
+            }
+            with patch.object(udp_bot, "BOT_UDP_PORT", local.address[1]):
+                await bot.handle_config(
+                    config,
+                    bot_listener_cb=bot_listener_cb,
+                    direct_listener=direct_listener,
+                )
+            endpoint = bot.endpoints[0]
+            endpoint.feed_datagram(b"\x01\x02", local.address)
+            await asyncio.sleep(0.01)
+            await bot.shutdown()
+            local.close()
+
+        asyncio.run(main())
+
+    def test_listener_task(self):
+        """Test that callables returning coroutines are awaited"""
+        received = []
+
+        async def on_receive(seat, cmd_id, cmd_val):
+            received.append((seat, cmd_id, cmd_val))
+
+        self.run_listener(lambda *args: on_receive(*args), False)
+        self.assertEqual(received, [(0, 1, 2)])
+
+    def test_direct_listener(self):
+        """Test that a direct listener is called without a task"""
+        received = []
+        self.run_listener(lambda *args: received.append(args), True)
+        self.assertEqual(received, [(0, 1, 2)])
@@ -0,0 +1,122 @@
+import asyncio
+import sys
+import unittest
+from unittest.mock import Mock
+
+# mock import hardware spesific libraries of surrortg.devices
+for name in ["adafruit_tcs34725", "pigpio"]:
+    sys.modules.setdefault(name, Mock())
+
+from surrortg.devices.udp import UdpActuator, UdpSwitch  # noqa: E402
+from surrortg.devices.udp.udp_protocol import (  # noqa: E402
+    open_local_endpoint,
+    open_remote_endpoint,
+)
+from surrortg.devices.udp.udp_transmitter import (  # noqa: E402
+    UdpStateTransmitter,
+)
+
+
+class UdpStateTransmitterTest(unittest.TestCase):
+    def run_inputs(self, packed):
+        async def main():
+            local = await open_local_endpoint("127.0.0.1", 0)
+            remote = await open_remote_endpoint(*local.address)
+            throttle = UdpActuator(1, repeat_commands=True)
+            steering = UdpActuator(2, repeat_commands=True)
+            horn = UdpSwitch(3)
+            transmitters = {
+                0: UdpStateTransmitter(remote, interval=0.05, packed=packed)
+            }
+            for input_impl in (throttle, steering, horn):
+                input_impl.set_endpoints({0: remote})
+                input_impl.set_transmitters(transmitters)
+
+            await throttle.drive_actuator(0.5, 0)
+            await steering.drive_actuator(-0.5, 0)
+            await throttle.drive_actuator(1.0, 0)
+            await horn.on(0)
+            await asyncio.sleep(0.07)
+            transmitters[0].close()
+
+            received = []
+            while not local._queue.empty():
+                received.append((await local.receive())[0])
+            local.close()
+            remote.close()
+            return received, transmitters[0].get_stats()
+
+        return asyncio.run(main())
+
+    def test_packed(self):
+        """Test that changes are sent and repeated in one datagram"""
+        received, stats = self.run_inputs(packed=True)
+        # only the latest repeated commands are sent on the tick
+        self.assertEqual(
+            received,
+            [bytes([1, 150, 2, 50, 1, 200, 3, 1]), bytes([1, 200, 2, 50])],
+        )
+        self.assertEqual(stats, {"datagrams": 2, "commands": 6, "ticks": 1})
+
+    def test_legacy(self):
+        """Test that the legacy format sends 2-byte datagrams"""
+        received, stats = self.run_inputs(packed=False)
+        self.assertEqual(
+            received,
+            [
+                bytes([1, 150]),
+                bytes([2, 50]),
+                bytes([1, 200]),
+                bytes([3, 1]),
+                bytes([1, 200]),
+                bytes([2, 50]),
+            ],
+        )
+        self.assertEqual(stats["datagrams"], 6)
+
+    def test_switch_in_one_iteration(self):
+        """Test that a switch pressed and released at once sends both"""
+
+        async def main(packed):
+            endpoint = Mock(closed=False)
+            sent = []
+            endpoint.send = sent.append
+            transmitter = UdpStateTransmitter(endpoint, packed=packed)
+            horn = UdpSwitch(3)
+            horn.set_endpoints({0: endpoint})
+            horn.set_transmitters({0: transmitter})
+            await horn.on(0)
+            await horn.off(0)
+            await asyncio.sleep(0)
+            return sent
+
+        self.assertEqual(asyncio.run(main(True)), [bytes([3, 1, 3, 0])])
+        self.assertEqual(
+            asyncio.run(main(False)), [bytes([3, 1]), bytes([3, 0])]
+        )
+
+    def test_repeats(self):
+        """Test that commands are repeated a bounded number of times"""
+
+        async def main():
+            endpoint = Mock(closed=False)
+            sent = []
+            endpoint.send = sent.append
+            transmitter = UdpStateTransmitter(
+                endpoint, interval=0.01, repeats=2
+            )
+            forever = UdpStateTransmitter(
+                endpoint, interval=0.01, repeats=None
+            )
+            transmitter.set(1, 10, repeat=True)
+            forever.set(2, 20, repeat=True)
+            await asyncio.sleep(0.1)
+            # the task stops once there is nothing to repeat
+            self.assertIsNone(transmitter._task)
+            self.assertIsNotNone(forever._task)
+            forever.close()
+            return sent
+
+        sent = asyncio.run(main())
+        self.assertEqual(sent.count(bytes([1, 10])), 3)
+        self.assertGreater(sent.count(bytes([2, 20])), 3)
@@ -0,0 +1,62 @@
+import pickle
+import unittest
+
+import numpy as np
+
+from surrortg.image_recognition.aruco import ArucoMarker, MarkerBatch
+
+RESOLUTION = (1280, 720)
+CORNERS = [
+    [[0, 0], [10, 0], [10, 10], [0, 10]],
+    [[100, 100], [140, 100], [140, 130], [100, 130]],
+]
+
+
+class MarkerBatchTest(unittest.TestCase):
+    def test_matches_single_markers(self):
+        """Test that the batch calculations match ArucoMarker's"""
+        batch = MarkerBatch([3, 7], CORNERS, RESOLUTION)
+        for i, marker in enumerate(batch):
+            single = ArucoMarker(
+                batch.ids[i], np.array(CORNERS[i]), RESOLUTION
+            )
+            self.assertEqual(marker.id, single.id)
+            self.assertAlmostEqual(
+                marker.get_distance(), single.get_distance()
+            )
+            self.assertAlmostEqual(
+                marker.get_real_distance(50000, 2760, 3040),
+                single.get_real_distance(50000, 2760, 3040),
+            )
+            self.assertEqual(marker.get_location(), single.get_location())
+
+        self.assertEqual(batch[1].get_location(), (120.0, 115.0))
+        self.assertAlmostEqual(batch[1].get_distance(), 40 ** 2 / (1280 * 720))
+        np.testing.assert_allclose(
+            batch.get_distances(),
+            [10 ** 2 / (1280 * 720), 40 ** 2 / (1280 * 720)],
+        )
+
+    def test_sequence(self):
+        """Test that the batch works like a list of ArucoMarkers"""
+        batch = MarkerBatch([3, 7], CORNERS, RESOLUTION)
+        self.assertEqual(len(batch), 2)
+        self.assertIs(batch[0], batch[0])
+        self.assertEqual(batch[-1].id, 7)
+        self.assertEqual([m.id for m in batch[1:]], [7])
+        with self.assertRaises(IndexError):
+            batch[2]
+
+        empty = MarkerBatch([], [], RESOLUTION)
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(list(empty), [])
+        self.assertEqual(empty.get_distances().shape, (0,))
+
+    def test_pickle(self):
+        """Test that the batch can be sent between processes"""
+        batch = MarkerBatch([3, 7], CORNERS, RESOLUTION)
+        batch[0].get_distance()
+        copy = pickle.loads(pickle.dumps(batch))
+        np.testing.assert_array_equal(copy.ids, batch.ids)
+        np.testing.assert_array_equal(copy.corners, batch.corners)
+        self.assertEqual(copy[1].get_location(), (120.0, 115.0))
@@ -0,0 +1,152 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import Mock
+
+from surrortg.image_recognition.aruco import MarkerBatch
+from surrortg.image_recognition.aruco.aruco_source import (
+    ArucoDetectionProcess,
+    ArucoDetector,
+    CapComm,
+    DetectionResult,
+)
+
+SOURCE = "fake"
+CORNERS = [[[0, 0], [10, 0], [10, 10], [0, 10]]]
+
+
+# Modified process classes
+class ArucoDetectionProcessReturn(ArucoDetectionProcess):
+    release_delay = 0
+
+    def __init__(self, source, conn, *args):
+        self._source = source
+        self._conn = conn
+
+    def run(self):
+        self._conn.send(CapComm.INIT_SUCCESS)
+
+        while True:
+            # wait until a new request
+            req = self._conn.recv()
+            # respond to the request
+            if req == CapComm.ARUCO_REQUEST:
+                markers = MarkerBatch([1], CORNERS, (1280, 720))
+                self._conn.send(DetectionResult(markers, 0.0, 0.0))
+            elif req == CapComm.RELEASE_REQUEST:
+                time.sleep(self.release_delay)
+                self._conn.send(CapComm.RELEASED)
+                break
+
+
+class ArucoDetectionProcessSlowRelease(ArucoDetectionProcessReturn):
+    release_delay = 0.2
+
+
+class ArucoDetectionProcessNeverReturn(ArucoDetectionProcessReturn):
+    def run(self):
+        self._conn.send(CapComm.INIT_SUCCESS)
+
+        while True:
+            # wait until a new request
+            req = self._conn.recv()
+            # respond only to the release request
+            if req == CapComm.RELEASE_REQUEST:
+                self._conn.send(CapComm.RELEASED)
+                break
+
+
+class ArucoDetectorTest(unittest.TestCase):
+    def test_shared_worker(self):
+        """Test that the handles share one worker until the last release"""
+
+        async def main():
+            first = await ArucoDetector.create(
+                SOURCE, process_class=ArucoDetectionProcessReturn
+            )
+            second = await ArucoDetector.create(
+                SOURCE, process_class=ArucoDetectionProcessReturn
+            )
+            worker = first._worker
+            self.assertIs(second._worker, worker)
+            self.assertEqual(len(ArucoDetector._workers), 1)
+
+            await first.release()
+            self.assertIn(first._key, ArucoDetector._workers)
+            self.assertTrue(worker._cap_process.is_alive())
+
+            await second.release()
+            self.assertEqual(ArucoDetector._workers, {})
+            self.assertEqual(ArucoDetector._releases, {})
+            self.assertFalse(worker._cap_process.is_alive())
+
+        asyncio.run(main())
+
+    def test_observer_fan_out(self):
+        """Test that the markers are passed to the observers of all handles"""
+
+        async def main():
+            first = await ArucoDetector.create(
+                SOURCE,
+                process_class=ArucoDetectionProcessReturn,
+                detection_rate=None,
+            )
+            second = await ArucoDetector.create(
+                SOURCE, process_class=ArucoDetectionProcessReturn
+            )
+            received = {"first": [], "second": []}
+            first.register_observer(received["first"].append)
+            second.register_observer(received["second"].append)
+            for _ in range(100):
+                if all(len(markers) > 1 for markers in received.values()):
+                    break
+                await asyncio.sleep(0.01)
+            for markers in received.values():
+                self.assertGreater(len(markers), 1)
+                self.assertEqual(markers[0].ids.tolist(), [1])
+
+            await first.release()
+            await second.release()
+
+        asyncio.run(main())
+
+    def test_create_waits_for_release(self):
+        """Test that the camera is not opened again before it is released"""
+
+        async def main():
+            old = await ArucoDetector.create(
+                SOURCE, process_class=ArucoDetectionProcessSlowRelease
+            )
+            old_process = old._worker._cap_process
+            release = asyncio.ensure_future(old.release())
+            await asyncio.sleep(0.01)
+            new = await ArucoDetector.create(
+                SOURCE, process_class=ArucoDetectionProcessSlowRelease
+            )
+            self.assertIsNot(new._worker, old._worker)
+            self.assertFalse(old_process.is_alive())
+            await release
+            await new.release()
+
+        asyncio.run(main())
+
+    def test_stops_after_read_timeout(self):
+        """Test that detection stops on a timeout if nobody observes"""
+
+        async def main():
+            detector = await ArucoDetector.create(
+                SOURCE,
+                read_timeout=0.05,
+                process_class=ArucoDetectionProcessNeverReturn,
+            )
+            callback = Mock()
+            detector.register_observer(callback)
+            task = detector._worker._detection_task
+            detector.unregister_observer(callback)
+            with self.assertLogs(level="WARNING"):
+                await asyncio.wait_for(task, 1)
+            # the unanswered request is still in flight
+            self.assertTrue(detector._worker._request_pending)
+            await detector.release()
+
+        asyncio.run(main())
@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+
+from surrortg.image_recognition.aruco import ArucoGrid
+from surrortg.image_recognition.aruco.virtual_grid import point_estimate
+
+GRID_SIZE = 8
+
+
+def make_marker(center, angle, size=20):
+    """Corners of a marker rotated by angle, clockwise from top left"""
+    offsets = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]]) * size / 2
+    rotation = np.array(
+        [[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]]
+    )
+    return np.array(center) + offsets @ rotation.T
+
+
+def make_grid(angle):
+    grid = ArucoGrid(GRID_SIZE, None, crop_frame=False)
+    grid.crop_params = (0, 0, 0, 0)
+    rotation = np.array(
+        [[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]]
+    )
+    centers = np.array([[100, 100], [500, 100], [500, 400], [100, 400]])
+    centers = (centers - 300) @ rotation.T + 300
+    grid._generate_grid(
+        {
+            marker_id: make_marker(center, angle)
+            for marker_id, center in zip(grid.ids, centers)
+        }
+    )
+    return grid
+
+
+def get_sq_idx_loop(grid, point):
+    """Reference implementation checking every square"""
+    indices = {}
+    for sq in range(grid.area_dim ** 2):
+        comparison = point_estimate(point, grid.squares[sq]) - grid.loc_slack
+        if comparison < 0:
+            indices[sq] = comparison
+    if len(indices) > 0:
+        return min(indices, key=indices.get)
+    return -1
+
+
+class ArucoGridTest(unittest.TestCase):
+    def test_get_sq_idx_many(self):
+        """Test that the transform lookup matches checking every square"""
+        rng = np.random.default_rng(0)
+        points = rng.uniform(0, 600, (500, 2))
+        for angle in (0, 0.2):
+            grid = make_grid(angle)
+            expected = [get_sq_idx_loop(grid, p.tolist()) for p in points]
+            self.assertEqual(grid.get_sq_idx_many(points).tolist(), expected)
+            self.assertIn(-1, expected)
+
+    def test_get_sq_idx(self):
+        """Test that square centers map to their own squares"""
+        grid = make_grid(0.2)
+        for idx, corners in enumerate(grid.squares):
+            center = tuple(np.mean(corners, axis=0))
+            self.assertEqual(grid.get_sq_idx(center), idx)
+        self.assertEqual(grid.get_sq_idx((-1000, -1000)), -1)
+
+        grid._inv_grid_transform = None
+        self.assertEqual(grid.get_sq_idx(center), idx)
+        self.assertEqual(grid.get_sq_idx((-1000, -1000)), -1)
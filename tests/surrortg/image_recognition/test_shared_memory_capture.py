@@ -0,0 +1,137 @@
+import asyncio
+import time
+import unittest
+
+import numpy as np
+
+from surrortg.image_recognition.async_video_capture import (
+    AsyncVideoCapture,
+    CapComm,
+    VideoCaptureProcess,
+    shared_memory,
+)
+
+
+class FakeCap:
+    def release(self):
+        pass
+
+
+# Modified process class, reads numbered frames without a camera
+class VideoCaptureProcessCounter(VideoCaptureProcess):
+    def _init_cap(self, send):
+        self._cap = FakeCap()
+        self._count = 0
+        if send:
+            self._conn.send(CapComm.INIT_SUCCESS)
+
+    def _read(self):
+        # like a camera, wait for the next frame
+        time.sleep(0.005)
+        self._count += 1
+        return np.full((4, 6, 3), self._count, dtype=np.uint8)
+
+
+@unittest.skipIf(shared_memory is None, "requires Python 3.8+")
+class SharedMemoryCaptureTest(unittest.TestCase):
+    def test_frame_leases(self):
+        """Test that leased slots are not reused until released"""
+
+        async def main():
+            cap = await AsyncVideoCapture.create(
+                None,
+                process_class=VideoCaptureProcessCounter,
+                shared_memory_slots=2,
+            )
+            first = await cap.read()
+            second = await cap.read()
+            self.assertEqual((first[0, 0, 0], second[0, 0, 0]), (1, 2))
+            self.assertFalse(first.flags.writeable)
+            with self.assertRaises(RuntimeError):
+                await cap.read()
+
+            cap.release_frame(first)
+            third = await cap.read()
+            self.assertEqual(third[0, 0, 0], 3)
+            # the leased frame was not overwritten
+            self.assertEqual(second[0, 0, 0], 2)
+
+            names = list(cap._shared_handles)
+            self.assertEqual(len(names), 2)
+            await cap.release()
+            return names
+
+        names = asyncio.run(main())
+        # the capture process unlinked the slots when released
+        for name in names:
+            with self.assertRaises(FileNotFoundError):
+                shared_memory.SharedMemory(name=name)
+
+    def test_streamed_frames(self):
+        """Test that streamed frames are written to the slots"""
+
+        async def main():
+            cap = await AsyncVideoCapture.create(
+                None,
+                process_class=VideoCaptureProcessCounter,
+                shared_memory_slots=2,
+                streaming=True,
+            )
+            frames = []
+            async for frame in cap.frames():
+                frames.append(int(frame[0, 0, 0]))
+                if len(frames) == 3:
+                    break
+            # frames() released the earlier slots, the last one is ours
+            self.assertEqual(len(cap._leases), 1)
+            self.assertIs(next(iter(cap._leases.values())), frame)
+            self.assertEqual(len(cap._free_slots), 1)
+            cap.release_frame(frame)
+            self.assertEqual(cap._leases, {})
+            self.assertEqual(sorted(cap._free_slots), [0, 1])
+            await cap.release()
+            return cap, frames
+
+        cap, frames = asyncio.run(main())
+        # only new frames are returned
+        self.assertEqual(frames, sorted(set(frames)))
+        self.assertEqual(cap.last_seq, frames[-1])
+
+    def test_release_after_unanswered_request(self):
+        """Test that a frame response is skipped when releasing"""
+
+        async def main():
+            cap = await AsyncVideoCapture.create(
+                None,
+                process_class=VideoCaptureProcessCounter,
+                shared_memory_slots=1,
+            )
+            # a request whose response was never read
+            cap._conn_main.send(CapComm.SHARED_FRAME_REQUEST)
+            cap._conn_main.send(0)
+            await cap.release()
+            return cap._cap_process.exitcode
+
+        # exited by itself instead of being killed
+        self.assertEqual(asyncio.run(main()), 0)
+
+
+# Process class with the 3-argument constructor of the older versions
+class VideoCaptureProcessPositional(VideoCaptureProcessCounter):
+    def __init__(self, source, conn, apiPreference):  # noqa: N803
+        super().__init__(source, conn, apiPreference)
+
+
+class ProcessClassTest(unittest.TestCase):
+    def test_positional_process_class(self):
+        """Test that process classes without the new options still work"""
+
+        async def main():
+            cap = await AsyncVideoCapture.create(
+                None, process_class=VideoCaptureProcessPositional
+            )
+            frame = await cap.read()
+            await cap.release()
+            return frame
+
+        self.assertEqual(asyncio.run(main())[0, 0, 0], 1)
@@ -0,0 +1,78 @@
+import unittest
+
+from surrortg.network.codec import (
+    WIRE_FORMAT_JSON,
+    WIRE_FORMAT_MSGPACK,
+    CodecError,
+    available_codecs,
+    get_codec,
+    sniff_wire_format,
+)
+from surrortg.network.socket_handler import LocalSocketHandler, Message
+
+MESSAGE = {
+    "event": "scoreUpdate",
+    "dst": "gameEngine",
+    "src": None,
+    "seat": 1,
+    "payload": {"scores": {"player": 1.5}, "text": "ä"},
+    "isAdmin": False,
+}
+
+
+class CodecTest(unittest.TestCase):
+    def test_round_trip(self):
+        for name in available_codecs():
+            codec = get_codec(name)
+            data = codec.encode(MESSAGE)
+            self.assertIsInstance(data, bytes)
+            self.assertEqual(codec.decode(data), MESSAGE)
+            self.assertEqual(sniff_wire_format(data), codec.wire_format)
+            with self.assertRaises(CodecError):
+                codec.decode(b"\xc1{")
+
+    def test_json_codec_parity(self):
+        """Test that the JSON codecs encode dict keys the same way"""
+        obj = {0: 1, True: 2, None: 3, 1.5: 4, 2 ** 70: 5, "a": [1, "b"]}
+        encoded = {
+            name: get_codec(name).encode(obj)
+            for name in available_codecs()
+            if get_codec(name).wire_format == WIRE_FORMAT_JSON
+        }
+        self.assertEqual(set(encoded.values()), {encoded["json"]}, msg=encoded)
+        if "orjson" in encoded:
+            # NaN and Infinity are not valid JSON, orjson encodes them null
+            data = get_codec("orjson").encode([float("nan"), float("inf")])
+            self.assertEqual(get_codec("json").decode(data), [None, None])
+
+    def test_unknown_codec(self):
+        with self.assertRaises(CodecError):
+            get_codec("xml")
+
+    def test_local_socket_codec_selection(self):
+        handler = LocalSocketHandler("", None, codec="json")
+        data = get_codec("json").encode(MESSAGE)
+        self.assertEqual(handler._parse_data(data), MESSAGE)
+        self.assertIsNone(handler._parse_data(b"[1, 2]"))
+        self.assertIsNone(handler._parse_data(b"\xff"))
+
+        select = Message("codecSelect", "robot", payload={"format": "foo"})
+        self.assertTrue(handler._select_codec(select))
+        # unknown formats keep the current codec
+        self.assertEqual(handler.codec.wire_format, WIRE_FORMAT_JSON)
+        self.assertFalse(handler._select_codec(Message.from_dict(MESSAGE)))
+
+        if "msgpack" in available_codecs():
+            select.payload["format"] = WIRE_FORMAT_MSGPACK
+            handler._select_codec(select)
+            self.assertEqual(handler.codec.wire_format, WIRE_FORMAT_MSGPACK)
+
+    def test_envelope(self):
+        for name in available_codecs():
+            codec = get_codec(name)
+            msg = Message.from_dict(MESSAGE)
+            data = codec.encode_envelope(7, msg.encode(codec))
+            self.assertEqual(
+                codec.decode(data),
+                {"id": 7, "response": False, "payload": MESSAGE},
+            )
@@ -0,0 +1,46 @@
+import asyncio
+import unittest
+
+from surrortg.network.connection_state import Backoff, ConnectionState
+
+
+class ConnectionStateTest(unittest.TestCase):
+    def test_transitions(self):
+        """Test that waiters wake up on transitions and metrics update"""
+        state = ConnectionState()
+
+        async def main():
+            await asyncio.wait_for(state.wait_disconnected(), 0.1)
+            waiter = asyncio.ensure_future(state.wait_connected())
+            await asyncio.sleep(0.01)
+            self.assertFalse(waiter.done())
+            state.set_connected()
+            await asyncio.wait_for(waiter, 0.1)
+
+            await asyncio.sleep(0.02)
+            state.message_received()
+            waiter = asyncio.ensure_future(state.wait_disconnected())
+            await asyncio.sleep(0.02)
+            state.set_disconnected()
+            # repeated transitions are ignored
+            state.set_disconnected()
+            await asyncio.wait_for(waiter, 0.1)
+            await asyncio.sleep(0.02)
+            state.set_connected()
+
+        asyncio.run(main())
+        stats = state.stats
+        self.assertEqual((stats["connects"], stats["disconnects"]), (2, 1))
+        self.assertGreaterEqual(state.last_connection_time, 0.04)
+        self.assertTrue(0.02 <= stats["time_to_detect"] < 0.04)
+        self.assertGreaterEqual(stats["time_to_reconnect"], 0.02)
+
+
+class BackoffTest(unittest.TestCase):
+    def test_backoff(self):
+        backoff = Backoff(1, 4)
+        sleeps = [backoff.next_sleep() for _ in range(4)]
+        for sleep, limit in zip(sleeps, [1, 2, 4, 4]):
+            self.assertTrue(limit / 2 <= sleep <= limit)
+        backoff.reset()
+        self.assertLessEqual(backoff.next_sleep(), 1)
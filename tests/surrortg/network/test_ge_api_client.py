@@ -0,0 +1,86 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from surrortg.network import ge_api_client
+from surrortg.network.connection_state import Backoff
+from surrortg.network.ge_api_client import ApiClient
+
+
+class FakeSio:
+    def __init__(self):
+        self.disconnected = False
+
+    async def disconnect(self):
+        self.disconnected = True
+
+
+class HangingApiClient(ApiClient):
+    def __init__(self):
+        super().__init__("client", "http://localhost", "game", "token")
+        self.clients = []
+        self.sio = FakeSio()
+
+    async def connect(self):
+        self.sio = FakeSio()
+        self.clients.append(self.sio)
+        self.connected_future = asyncio.get_running_loop().create_future()
+        await self.connected_future
+
+
+class ConnectingApiClient(ApiClient):
+    def __init__(self):
+        super().__init__("client", "http://localhost", "game", "token")
+        self.sio = FakeSio()
+
+    async def connect(self):
+        self.on_connect()
+
+
+class ApiClientTest(unittest.TestCase):
+    @patch.object(ge_api_client, "CONNECT_TIMEOUT", 0.01)
+    def test_timed_out_connect_is_closed(self):
+        """Test that timed out connection attempts are disconnected"""
+        client = HangingApiClient()
+        client._backoff = Backoff(0.01, 0.01)
+
+        async def main():
+            task = asyncio.ensure_future(client.run())
+            while len(client.clients) < 3:
+                await asyncio.sleep(0.01)
+            task.cancel()
+
+        with self.assertLogs(level="WARNING"):
+            asyncio.run(main())
+        self.assertTrue(all(sio.disconnected for sio in client.clients[:2]))
+        self.assertFalse(client.connected)
+
+    def test_failing_reconnect_callback(self):
+        """Test that a failing reconnect callback does not stop run()"""
+        client = ConnectingApiClient()
+        client._backoff = Backoff(0.01, 0.01)
+        called = []
+
+        async def fail():
+            called.append("fail")
+            raise RuntimeError("callback failed")
+
+        async def succeed():
+            called.append("succeed")
+
+        client.add_reconnect_callback(fail)
+        client.add_reconnect_callback(succeed)
+
+        async def main():
+            task = asyncio.ensure_future(client.run())
+            for _ in range(2):
+                while len(called) < 2 and not task.done():
+                    await asyncio.sleep(0.01)
+                self.assertEqual(called, ["fail", "succeed"])
+                called.clear()
+                client.connected = False
+            task.cancel()
+
+        with self.assertLogs(level="ERROR") as logs:
+            asyncio.run(main())
+        self.assertEqual(len(logs.records), 2)
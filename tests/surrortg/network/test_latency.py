@@ -0,0 +1,110 @@
+import asyncio
+import time
+import unittest
+
+from surrortg.inputs import Input
+from surrortg.network.latency import LatencyHistogram
+from surrortg.network.message_router import MessageRouter
+from surrortg.network.socket_handler import Message
+
+
+class SleepInput(Input):
+    async def _on_input(self, command, seat):
+        await asyncio.sleep(0.01)
+
+    async def reset(self, seat):
+        pass
+
+    def get_name(self):
+        return "SleepInput"
+
+    def _get_default_keybinds(self):
+        return {}
+
+
+class FailingInput(SleepInput):
+    async def _on_input(self, command, seat):
+        raise RuntimeError("input failed")
+
+
+class LatencyHistogramTest(unittest.TestCase):
+    def test_histogram(self):
+        histogram = LatencyHistogram()
+        self.assertIsNone(histogram.percentile(50))
+        for ms in [0.05, 0.3, 0.3, 7, 2000]:
+            histogram.record(ms)
+        stats = histogram.to_dict()
+        self.assertEqual(stats["count"], 5)
+        self.assertEqual(stats["p50_ms"], 0.5)
+        self.assertEqual(stats["p99_ms"], 2000)
+        self.assertEqual(stats["buckets"][0.1], 1)
+        self.assertEqual(stats["buckets"][10], 1)
+        self.assertEqual(stats["buckets"]["inf"], 1)
+
+
+class RouterLatencyTest(unittest.TestCase):
+    def test_router_latency(self):
+        """Test that latencies are recorded only when enabled"""
+
+        def msg(input_id):
+            msg = Message(
+                "gameControls",
+                "robot",
+                src="peer",
+                payload={"id": input_id, "command": {}},
+            )
+            msg.received_at = time.perf_counter()
+            return msg
+
+        async def main():
+            router = MessageRouter(watchdog_timeout=None)
+            router.register_input("a", SleepInput(), False)
+            router.register_input("b", SleepInput(), False, mailbox=True)
+            await router.handle_message(msg("a"), 0, False)
+            self.assertEqual(router.latency.get_stats(), {})
+
+            router.latency.enabled = True
+            await router.handle_message(msg("a"), 0, False)
+            await router.handle_message(msg("b"), 1, False)
+            await asyncio.sleep(0.05)
+            return router.latency.get_stats()
+
+        stats = asyncio.run(main())
+        self.assertEqual(list(stats), ["a", "b"])
+        for input_id, seat in [("a", 0), ("b", 1)]:
+            histograms = stats[input_id][seat]
+            self.assertEqual(histograms["total"]["count"], 1)
+            self.assertGreaterEqual(histograms["handle"]["max_ms"], 10)
+            self.assertGreaterEqual(
+                histograms["total"]["max_ms"], histograms["handle"]["max_ms"]
+            )
+
+    def test_failed_input_latency(self):
+        """Test that latencies are recorded for failing inputs too"""
+        msgs = [
+            Message(
+                "gameControls",
+                "robot",
+                src="peer",
+                payload={"id": input_id, "command": {}},
+            )
+            for input_id in ("a", "b")
+        ]
+
+        async def main():
+            router = MessageRouter(watchdog_timeout=None)
+            router.register_input("a", FailingInput(), False)
+            router.register_input("b", FailingInput(), False, mailbox=True)
+            router.latency.enabled = True
+            for msg in msgs:
+                msg.received_at = time.perf_counter()
+            with self.assertRaises(RuntimeError):
+                await router.handle_message(msgs[0], 0, False)
+            with self.assertLogs(level="ERROR"):
+                await router.handle_message(msgs[1], 0, False)
+                await asyncio.sleep(0.01)
+            return router.latency.get_stats()
+
+        stats = asyncio.run(main())
+        for input_id in ("a", "b"):
+            self.assertEqual(stats[input_id][0]["total"]["count"], 1)
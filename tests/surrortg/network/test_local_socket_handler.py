@@ -0,0 +1,51 @@
+import asyncio
+import json
+import socket
+import unittest
+
+from surrortg.network.socket_handler import LocalSocketHandler
+
+
+def encode(event, **kwargs):
+    return json.dumps({"event": event, "dst": "robot", **kwargs}).encode()
+
+
+class LocalSocketHandlerTest(unittest.TestCase):
+    def test_batch_receive(self):
+        """Test that the queued datagrams are handled as one batch"""
+        batches = []
+
+        async def batch_handler(messages):
+            batches.append([msg.event for msg in messages])
+
+        async def main():
+            handler = LocalSocketHandler("", None, batch_handler=batch_handler)
+            handler.event_loop = asyncio.get_running_loop()
+            handler.sock, peer = socket.socketpair(
+                socket.AF_UNIX, socket.SOCK_SEQPACKET
+            )
+            handler.sock.setblocking(False)
+            handler.connected = True
+            for data in [encode("a"), b"not json", encode("b", seat="0")]:
+                peer.send(data)
+            peer.send(encode("c", payload={"x": "y" * 1000}))
+            await handler.do_receive()
+            await asyncio.sleep(0)
+
+            peer.close()
+            await handler.do_receive()
+            self.assertFalse(handler.connected)
+            handler.shutdown()
+            return handler.stats
+
+        stats = asyncio.run(main())
+        self.assertEqual(batches, [["a", "c"]])
+        self.assertEqual(
+            stats,
+            {
+                "batches": 1,
+                "messages": 2,
+                "max_batch_size": 2,
+                "parse_failures": 2,
+            },
+        )
@@ -1,6 +1,9 @@
+import dataclasses
+import pickle
 import unittest
+from collections import OrderedDict
 
-from surrortg.network import Message, MessageValidationError
+from surrortg.network import Message, MessageValidationError, get_codec
 
 
 class MessageTest(unittest.TestCase):
@@ -98,3 +101,47 @@ class MessageTest(unittest.TestCase):
                 "payload={'foo': 'bar'}, isAdmin=False)"
             ),
         )
+
+    def test_all_errors(self):
+        with self.assertRaises(MessageValidationError) as cm:
+            Message(1, "dst", src=2, seat="0")
+        self.assertEqual(
+            [error.split(" ")[0] for error in cm.exception.errors],
+            ["Message.event", "Message.src", "Message.seat"],
+        )
+        # subclasses of the field types are valid
+        Message("event", "dst", payload=OrderedDict())
+
+    def test_trusted(self):
+        msg = Message.trusted("event", "dst", seat=1)
+        self.assertEqual(msg, Message("event", "dst", seat=1))
+        self.assertEqual(msg.payload, {})
+
+    def test_encode_cache(self):
+        codec = get_codec("json")
+        msg = Message("event", "dst", payload={"foo": "bar"})
+        encoded = msg.encode(codec)
+        self.assertEqual(codec.decode(encoded), msg.to_dict())
+        self.assertIs(msg.encode(codec), encoded)
+        # assigning a field drops the cached form
+        msg.payload = {"foo": "baz"}
+        self.assertEqual(
+            codec.decode(msg.encode(codec))["payload"]["foo"], "baz"
+        )
+        self.assertIn("baz", repr(msg))
+        self.assertEqual(pickle.loads(pickle.dumps(msg)), msg)
+
+    def test_dataclass_compatible(self):
+        msg = Message("event", "dst", seat=1, payload={"foo": ["bar"]})
+        self.assertTrue(dataclasses.is_dataclass(msg))
+        self.assertEqual(
+            [f.name for f in dataclasses.fields(msg)],
+            ["event", "dst", "src", "seat", "payload", "isAdmin"],
+        )
+        self.assertEqual(dataclasses.asdict(msg), msg.to_dict())
+        self.assertIsNot(dataclasses.asdict(msg)["payload"], msg.payload)
+        replaced = dataclasses.replace(msg, seat=2)
+        self.assertEqual(replaced.seat, 2)
+        self.assertEqual(replaced.payload, msg.payload)
+        with self.assertRaises(MessageValidationError):
+            dataclasses.replace(msg, seat="2")
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import unittest
+
+from surrortg.network.message_coalescer import MessageCoalescer
+
+WINDOW = 0.05
+
+
+def msg(event, seat=0, payload={}):
+    return {
+        "event": event,
+        "dst": "gameEngine",
+        "src": None,
+        "seat": seat,
+        "payload": payload,
+        "isAdmin": False,
+    }
+
+
+class MessageCoalescerTest(unittest.TestCase):
+    def setUp(self):
+        self.sent = []
+
+    async def _send(self, msg, callback=None):
+        self.sent.append(msg)
+
+    def test_latest_progress_wins(self):
+        """Test that only the latest progress per seat is sent"""
+
+        async def main():
+            coalescer = MessageCoalescer(self._send, WINDOW)
+            coalescer.start(asyncio.get_running_loop())
+            for i in range(10):
+                coalescer.add(msg("progress", 0, {"val": i / 10}))
+                coalescer.add(msg("progress", 1, {"val": i / 20}))
+            await asyncio.sleep(0)
+            self.assertEqual(self.sent, [])
+            await asyncio.sleep(WINDOW * 2)
+            return coalescer
+
+        coalescer = asyncio.run(main())
+        self.assertEqual(
+            self.sent,
+            [
+                msg("progress", 0, {"val": 0.9}),
+                msg("progress", 1, {"val": 0.45}),
+            ],
+        )
+        self.assertEqual(
+            coalescer.stats,
+            {"received": 20, "sent": 2, "coalesced": 18, "failed": 0},
+        )
+
+    def test_scores_merged_and_flushed(self):
+        """Test that scores are merged and flushed before playingEnded"""
+
+        def scores(scores, end_game=False):
+            return {
+                "scores": scores,
+                "endGame": end_game,
+                "seatEndGame": False,
+            }
+
+        async def main():
+            coalescer = MessageCoalescer(self._send, WINDOW)
+            coalescer.start(asyncio.get_running_loop())
+            coalescer.add(msg("scoreUpdate", payload=scores({0: 1})))
+            coalescer.add(msg("scoreUpdate", payload=scores({1: 2})))
+            coalescer.add(msg("scoreUpdate", payload=scores({0: 3})))
+            coalescer.add(msg("adminLog", payload={"message": "hi"}))
+            coalescer.add(msg("playingEnded"))
+            await asyncio.sleep(0)
+
+        asyncio.run(main())
+        self.assertEqual(
+            self.sent,
+            [
+                msg("adminLog", payload={"message": "hi"}),
+                msg("scoreUpdate", payload=scores({0: 3, 1: 2})),
+                msg("playingEnded"),
+            ],
+        )
+
+    def test_threadsafe(self):
+        """Test that messages can be added from other threads"""
+
+        async def main():
+            coalescer = MessageCoalescer(self._send, WINDOW)
+            coalescer.start(asyncio.get_running_loop())
+
+            def add():
+                for i in range(100):
+                    coalescer.add(msg("progress", payload={"val": i / 100}))
+
+            thread = threading.Thread(target=add)
+            thread.start()
+            await asyncio.get_running_loop().run_in_executor(None, thread.join)
+            await coalescer.flush()
+            await asyncio.sleep(WINDOW * 2)
+
+        asyncio.run(main())
+        self.assertEqual(self.sent, [msg("progress", payload={"val": 0.99})])
+
+    def test_sent_in_order(self):
+        """Test that a slow send does not let later messages overtake it"""
+
+        async def slow_send(msg, callback=None):
+            if msg["payload"].get("val") == 0:
+                await asyncio.sleep(WINDOW)
+            self.sent.append(msg)
+
+        async def main():
+            coalescer = MessageCoalescer(slow_send, WINDOW)
+            coalescer.start(asyncio.get_running_loop())
+            coalescer.add(msg("adminLog", payload={"val": 0}))
+            coalescer.add(msg("progress", payload={"val": 1}))
+            coalescer.add(msg("adminLog", payload={"val": 2}))
+            await coalescer.flush()
+            self.assertEqual(len(self.sent), 3)
+
+        asyncio.run(main())
+        self.assertEqual(
+            [sent["payload"]["val"] for sent in self.sent], [0, 2, 1]
+        )
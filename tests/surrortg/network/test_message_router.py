@@ -0,0 +1,255 @@
+import asyncio
+import unittest
+
+from surrortg.inputs import Input, MouseJoystick
+from surrortg.network.message_router import (
+    InputBinding,
+    MessageRouter,
+    MultiSeatMessageRouter,
+    reset_bindings,
+)
+from surrortg.network.socket_handler import Message
+
+
+class ResetInput(Input):
+    def __init__(self, name, resets, delay=0):
+        self.name = name
+        self.resets = resets
+        self.delay = delay
+
+    async def _on_input(self, command, seat):
+        pass
+
+    async def reset(self, seat):
+        await asyncio.sleep(self.delay)
+        self.resets.append((self.name, seat))
+
+    def get_name(self):
+        return "ResetInput"
+
+    def _get_default_keybinds(self):
+        return {}
+
+
+class MessageRouterWatchdogTest(unittest.TestCase):
+    def test_watchdog(self):
+        """Test that the inputs are reset after their own timeouts"""
+        resets = []
+        msg = Message(
+            "gameControls",
+            "robot",
+            src="peer",
+            payload={"id": "a", "command": {}},
+        )
+
+        async def main():
+            router = MessageRouter(watchdog_timeout=0.1)
+            router.register_input("a", ResetInput("a", resets), False)
+            router.register_input("b", ResetInput("b", resets), False, 0.2)
+            for _ in range(5):
+                await router.handle_message(msg, 0, False)
+                await asyncio.sleep(0.03)
+            # kicks keep the inputs from resetting
+            self.assertEqual(resets, [])
+            await asyncio.sleep(0.1)
+            self.assertEqual(resets, [("a", 0)])
+            await asyncio.sleep(0.15)
+            self.assertEqual(resets, [("a", 0), ("b", 0)])
+            # all the deadlines handled, the timer is not running
+            self.assertIsNone(router._watchdog_handle)
+
+            router.trigger_watchdog_reset(1)
+            await router.reset_tasks[1]
+            return router.watchdog_stats
+
+        stats = asyncio.run(main())
+        self.assertEqual(resets[2:], [("a", 1), ("b", 1)])
+        self.assertEqual(stats, {"timeout_resets": 2, "triggered_resets": 1})
+
+
+class ResetBindingsTest(unittest.TestCase):
+    def test_order_and_timeout(self):
+        """Test that reset groups run in order and slow inputs time out"""
+        resets = []
+        bindings = {
+            "leds": InputBinding(
+                ResetInput("leds", resets), False, reset_order=1
+            ),
+            "motor": InputBinding(ResetInput("motor", resets, 0.02), False),
+            "slow": InputBinding(
+                ResetInput("slow", resets, 0.2), False, reset_timeout=0.05
+            ),
+        }
+
+        async def main():
+            report = await reset_bindings(bindings, [0, 1])
+            self.assertEqual(resets[-2:], [("leds", 0), ("leds", 1)])
+            await asyncio.sleep(0.2)
+            return report
+
+        report = asyncio.run(main())
+        self.assertEqual(sorted(resets[:2]), [("motor", 0), ("motor", 1)])
+        # the slow reset finished after the timeout
+        self.assertEqual(sorted(resets[4:]), [("slow", 0), ("slow", 1)])
+        self.assertEqual(report.timed_out, [("slow", 0), ("slow", 1)])
+        self.assertEqual(len(report.completed), 4)
+        self.assertEqual(report.failed, [])
+
+    def test_shutdown_not_timed_out(self):
+        """Test that shutdowns are awaited past the reset timeout"""
+        resets = []
+        bindings = {
+            "slow": InputBinding(
+                ResetInput("slow", resets, 0.1), False, reset_timeout=0.01
+            ),
+        }
+        report = asyncio.run(reset_bindings(bindings, [0], shutdown=True))
+        self.assertEqual(resets, [("slow", 0)])
+        self.assertEqual(report.completed, [("slow", 0)])
+        self.assertEqual(report.timed_out, [])
+
+
+class SlowInput(ResetInput):
+    def __init__(self, name, resets, continuous):
+        super().__init__(name, resets)
+        self.continuous = continuous
+        self.commands = []
+
+    async def _on_input(self, command, seat):
+        await asyncio.sleep(0.02)
+        self.commands.append((command["value"], seat))
+
+
+class Mouse(MouseJoystick):
+    async def reset(self, seat):
+        pass
+
+
+class MessageRouterMailboxTest(unittest.TestCase):
+    def test_mailbox(self):
+        """Test that continuous inputs skip stale commands, others don't"""
+        resets = []
+        joystick = SlowInput("joystick", resets, True)
+        switch = SlowInput("switch", resets, False)
+
+        def msg(input_id, value):
+            return Message(
+                "gameControls",
+                "robot",
+                src="peer",
+                payload={"id": input_id, "command": {"value": value}},
+            )
+
+        async def main():
+            router = MessageRouter(watchdog_timeout=None)
+            router.register_input("joystick", joystick, False, mailbox=True)
+            router.register_input("switch", switch, False, mailbox=True)
+            for value in range(4):
+                await router.handle_message(msg("joystick", value), 0, False)
+                await router.handle_message(msg("switch", value), 0, False)
+            await router.handle_message(msg("joystick", 9), 1, False)
+            # handled in the background, the burst leaves only the newest
+            self.assertEqual(joystick.commands, [])
+            await asyncio.sleep(0.1)
+            stats = router.get_mailbox_stats()
+
+            # a reset drops the waiting commands
+            for value in range(3):
+                await router.handle_message(msg("switch", value), 0, False)
+            router.trigger_watchdog_reset(0)
+            await router.reset_tasks[0]
+            await asyncio.sleep(0.05)
+            return stats
+
+        stats = asyncio.run(main())
+        self.assertEqual(joystick.commands, [(3, 0), (9, 1)])
+        self.assertEqual(
+            switch.commands, [(v, 0) for v in range(4)] + [(0, 0)]
+        )
+        self.assertEqual(stats, {"joystick": {0: 3, 1: 0}, "switch": {0: 0}})
+        self.assertEqual(resets, [("joystick", 0), ("switch", 0)])
+
+
+class StuckInput(ResetInput):
+    async def _on_input(self, command, seat):
+        await asyncio.sleep(10)
+
+
+class MailboxResetTimeoutTest(unittest.TestCase):
+    def test_stuck_command(self):
+        """Test that a stuck command does not block the reset"""
+        resets = []
+        msg = Message(
+            "gameControls",
+            "robot",
+            src="peer",
+            payload={"id": "stuck", "command": {}},
+        )
+
+        async def main():
+            router = MessageRouter(watchdog_timeout=None)
+            router.register_input(
+                "stuck",
+                StuckInput("stuck", resets),
+                False,
+                reset_timeout=0.05,
+                mailbox=True,
+            )
+            await router.handle_message(msg, 0, False)
+            await asyncio.sleep(0)
+            start = asyncio.get_running_loop().time()
+            with self.assertLogs(level="WARNING"):
+                report = await reset_bindings(router.inputs, [0])
+            duration = asyncio.get_running_loop().time() - start
+            await asyncio.sleep(0)
+            return report, duration
+
+        report, duration = asyncio.run(main())
+        self.assertLess(duration, 0.1)
+        self.assertEqual(report.timed_out, [("stuck", 0)])
+        # the reset still runs after the timeout
+        self.assertEqual(resets, [("stuck", 0)])
+
+
+class CoalesceBatchTest(unittest.TestCase):
+    def test_coalesce_batch(self):
+        """Test that only the latest continuous input commands are kept"""
+        router = MultiSeatMessageRouter(lambda msg: None)
+        router.register_input("joystick", SlowInput("joystick", [], True))
+        router.register_input("switch", SlowInput("switch", [], False))
+
+        def msg(src, input_id, value):
+            return Message(
+                "gameControls",
+                "robot",
+                src=src,
+                payload={"id": input_id, "command": {"value": value}},
+            )
+
+        messages = [
+            msg("peer", "joystick", 0),
+            msg("peer", "switch", 0),
+            msg("other", "joystick", 1),
+            msg("peer", "joystick", 2),
+            Message("ping", "robot", src="peer"),
+            msg("peer", "switch", 1),
+        ]
+        kept = router.coalesce_batch(messages)
+        self.assertEqual(kept, [messages[i] for i in (1, 2, 3, 4, 5)])
+        self.assertEqual(router.coalesced_messages, 1)
+
+    def test_mouse_not_coalesced(self):
+        """Test that relative mouse movements are never dropped"""
+        router = MultiSeatMessageRouter(lambda msg: None)
+        router.register_input("mouse", Mouse())
+        messages = [
+            Message(
+                "gameControls",
+                "robot",
+                src="peer",
+                payload={"id": "mouse", "command": {"dx": dx, "dy": 0}},
+            )
+            for dx in range(3)
+        ]
+        self.assertEqual(router.coalesce_batch(messages), messages)
+        self.assertEqual(router.coalesced_messages, 0)
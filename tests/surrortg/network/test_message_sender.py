@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import unittest
+
+from surrortg.network.message_coalescer import MessageCoalescer
+from surrortg.network.message_sender import MessageSender, SendPolicy
+
+
+class MessageSenderTest(unittest.TestCase):
+    def setUp(self):
+        self.sent = []
+        self.connected = True
+
+    async def _send(self, event, seat, src=None, payload={}, callback=None):
+        if not self.connected:
+            return False
+        self.sent.append((event, seat, payload))
+
+    def _create_sender(self, **kwargs):
+        sender = MessageSender(self._send, lambda: self.connected, **kwargs)
+        sender.start()
+        return sender
+
+    def test_policies(self):
+        """Test that the policies are applied when the queue is full"""
+
+        async def main():
+            sender = self._create_sender(queue_size=3)
+            sender.put("progress", payload={"val": 0.1})
+            sender.put("adminLog", payload={"message": "a"})
+            sender.put("adminLog", payload={"message": "b"})
+            sender.put("adminLog", payload={"message": "c"})
+            sender.put("progress", payload={"val": 0.2})
+            sender.put("scoreUpdate", payload={"scores": {0: 1}})
+            await sender.stop(1)
+            return sender.get_stats()
+
+        stats = asyncio.run(main())
+        self.assertEqual(
+            self.sent,
+            [
+                ("progress", 0, {"val": 0.2}),
+                ("adminLog", 0, {"message": "a"}),
+                ("adminLog", 0, {"message": "b"}),
+                ("scoreUpdate", 0, {"scores": {0: 1}}),
+            ],
+        )
+        self.assertEqual(stats["sent"], 4)
+        self.assertEqual(stats["dropped"], 1)
+        self.assertEqual(stats["overwritten"], 1)
+        self.assertEqual(stats["queue_depth"], 0)
+
+    def test_replay(self):
+        """Test that kept messages are sent in order after reconnecting"""
+
+        async def main():
+            sender = self._create_sender()
+            self.connected = False
+            sender.put("scoreUpdate", payload={"scores": {0: 1}})
+            sender.put("adminLog", payload={"message": "lost"})
+            sender.put("playingEnded")
+            await asyncio.sleep(0.01)
+            self.assertEqual(sender.get_stats()["replay_depth"], 2)
+
+            self.connected = True
+            sender.put("controllerReady")
+            sender.replay()
+            sender.put("scoreUpdate", payload={"scores": {0: 2}})
+            await sender.stop(1)
+            return sender.get_stats()
+
+        stats = asyncio.run(main())
+        self.assertEqual(
+            self.sent,
+            [
+                ("controllerReady", 0, {}),
+                ("scoreUpdate", 0, {"scores": {0: 1}}),
+                ("playingEnded", 0, {}),
+                ("scoreUpdate", 0, {"scores": {0: 2}}),
+            ],
+        )
+        self.assertEqual(stats["replayed"], 2)
+        self.assertEqual(stats["dropped"], 1)
+
+    def test_failed_after_coalescing(self):
+        """Test that kept messages failing in the coalescer are replayed"""
+
+        async def main():
+            sender = None
+
+            async def send_coalesced(msg, callback=None):
+                if not self.connected:
+                    return False
+                self.sent.append((msg["event"], msg["seat"], msg["payload"]))
+
+            def on_failed(msg, callback):
+                sender.send_failed(
+                    msg["event"], msg["seat"], payload=msg["payload"]
+                )
+
+            coalescer = MessageCoalescer(send_coalesced, 0.01, on_failed)
+            coalescer.start(asyncio.get_running_loop())
+
+            async def send(event, seat, src=None, payload={}, callback=None):
+                coalescer.add(
+                    {
+                        "event": event,
+                        "dst": "gameEngine",
+                        "src": src,
+                        "seat": seat,
+                        "payload": payload,
+                    }
+                )
+
+            sender = MessageSender(send, lambda: True)
+            sender.start()
+            sender.put("scoreUpdate", payload={"scores": {0: 1}})
+            sender.put("progress", payload={"val": 0.5})
+            await asyncio.sleep(0.01)
+            # the link drops before the coalescer flushes
+            self.connected = False
+            await asyncio.sleep(0.03)
+            stats = sender.get_stats()
+            self.assertEqual(
+                (stats["sent"], stats["replay_depth"], stats["dropped"]),
+                (0, 1, 1),
+            )
+
+            self.connected = True
+            sender.replay()
+            await sender.stop(1)
+            await coalescer.flush()
+
+        asyncio.run(main())
+        self.assertEqual(self.sent, [("scoreUpdate", 0, {"scores": {0: 1}})])
+
+    def test_threadsafe(self):
+        """Test that messages can be queued from other threads"""
+
+        async def main():
+            sender = self._create_sender()
+            sender.set_policy("lapDone", SendPolicy.DROP)
+            thread = threading.Thread(
+                target=lambda: [sender.put("lapDone") for _ in range(10)]
+            )
+            thread.start()
+            await asyncio.get_running_loop().run_in_executor(None, thread.join)
+            await sender.stop(1)
+
+        asyncio.run(main())
+        self.assertEqual(self.sent, [("lapDone", 0, {})] * 10)
@@ -0,0 +1,44 @@
+import asyncio
+import unittest
+
+from surrortg import event_loop
+from surrortg.event_loop import (
+    get_event_loop_options,
+    get_event_loop_policy,
+    tune_event_loop,
+)
+
+
+class EventLoopOptionsTest(unittest.TestCase):
+    def test_options(self):
+        options = get_event_loop_options(
+            {"type": "uvloop", "executor_workers": 2}, "asyncio"
+        )
+        self.assertEqual(options["type"], "asyncio")
+        self.assertEqual(options["executor_workers"], 2)
+        self.assertIsNone(options["slow_callback_duration"])
+
+        with self.assertRaises(RuntimeError):
+            get_event_loop_options({"typo": 1})
+        with self.assertRaises(RuntimeError):
+            get_event_loop_options(None, "trio")
+        with self.assertRaises(RuntimeError):
+            get_event_loop_options({"executor_workers": 0})
+
+    def test_policy(self):
+        self.assertIsNone(get_event_loop_policy("asyncio"))
+        policy = get_event_loop_policy("uvloop")
+        if event_loop.uvloop is None:
+            # falls back to the default loop
+            self.assertIsNone(policy)
+        else:
+            self.assertIsInstance(policy, event_loop.uvloop.EventLoopPolicy)
+
+    def test_tune(self):
+        async def main():
+            loop = asyncio.get_running_loop()
+            tune_event_loop(loop, 1, 0.2)
+            self.assertEqual(loop.slow_callback_duration, 0.2)
+            return await loop.run_in_executor(None, sum, [1, 2])
+
+        self.assertEqual(asyncio.run(main()), 3)
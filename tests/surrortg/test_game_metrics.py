@@ -0,0 +1,80 @@
+import asyncio
+import time
+import traceback
+import unittest
+
+from surrortg.game_metrics import (
+    AdminLogLimiter,
+    LoopLagMonitor,
+    PhaseTimer,
+    format_loop_lag,
+)
+
+
+def blocking_callback():
+    time.sleep(0.3)
+
+
+class LoopLagMonitorTest(unittest.TestCase):
+    def test_slow_callback(self):
+        """Test that a blocking callback is detected with its stack"""
+        lags = []
+        monitor = LoopLagMonitor(
+            interval=0.02,
+            threshold=0.1,
+            on_lag=lambda lag, stack: lags.append((lag, stack)),
+        )
+
+        async def main():
+            monitor.start()
+            await asyncio.sleep(0.1)
+            asyncio.get_running_loop().call_soon(blocking_callback)
+            await asyncio.sleep(0.1)
+            await monitor.stop()
+
+        asyncio.run(main())
+        stats = monitor.get_stats()
+        self.assertEqual(stats["slow"], 1)
+        self.assertGreaterEqual(stats["max_lag"], 0.2)
+        self.assertEqual(len(lags), 1)
+        self.assertEqual(lags[0][1][-1].name, "blocking_callback")
+        self.assertIn("blocking_callback", stats["slow_callbacks"][0]["stack"])
+
+    def test_format_loop_lag(self):
+        """Test that the lag message handles short and missing stacks"""
+        stack = traceback.StackSummary.from_list(
+            [("game.py", 10, "on_start", "time.sleep(1)")]
+        )
+        self.assertEqual(
+            format_loop_lag(0.5, stack),
+            "Event loop was blocked for 500 ms, in:\n"
+            'File "game.py", line 10, in on_start\ntime.sleep(1)',
+        )
+        empty = traceback.StackSummary.from_list([])
+        for stack in (None, empty):
+            self.assertEqual(
+                format_loop_lag(0.2, stack),
+                "Event loop was blocked for 200 ms",
+            )
+
+
+class PhaseTimerTest(unittest.TestCase):
+    def test_record(self):
+        timer = PhaseTimer()
+        timer.record("on_prepare", 0.5, 0.6)
+        timer.record("on_prepare", 0.2, 0.3, cancelled=True)
+        stats = timer.stats["on_prepare"]
+        self.assertEqual((stats["count"], stats["cancelled"]), (2, 1))
+        self.assertEqual(stats["max_duration"], 0.5)
+        self.assertEqual(stats["last_response_time"], 0.3)
+
+
+class AdminLogLimiterTest(unittest.TestCase):
+    def test_limit(self):
+        logged = []
+        log = AdminLogLimiter(logged.append, interval=10)
+        log("a", "first")
+        log("a", "second")
+        log("b", "third")
+        self.assertEqual(logged, ["first", "third"])
+        self.assertEqual(log.suppressed, 1)